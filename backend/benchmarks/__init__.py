@@ -0,0 +1,9 @@
+"""
+Reproducible benchmarks for the analysis pipeline.
+
+Run from backend/:
+    python -m benchmarks micro                  # parser / engine / builder
+    python -m benchmarks load --requests 200    # in-process /analyze load test
+    python -m benchmarks micro --compare        # fail on regression vs baseline.json
+    python -m benchmarks startup                # import-time breakdown, time to /ready
+"""
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import argparse
+from typing import List, Optional
+
+from benchmarks import harness
+from benchmarks.synthetic_vcf import PROFILES, write_profile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="PharmaGuard benchmarks")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    micro = sub.add_parser("micro", help="parser / rule engine / response builder")
+    micro.add_argument("--profiles", default=",".join(PROFILES), help="comma-separated VCF profiles")
+    micro.add_argument("--repeats", type=int, default=200)
+
+    load = sub.add_parser("load", help="in-process /analyze load test with a stubbed LLM")
+    load.add_argument("--profile", default="tiny", choices=sorted(PROFILES))
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--drug", default="CLOPIDOGREL")
+    load.add_argument("--llm-latency-ms", type=float, default=0.0)
+
+    startup = sub.add_parser("startup", help="import-time breakdown and time to /ready")
+    startup.add_argument("--module", default="main", help="module to profile")
+    startup.add_argument("--top", type=int, default=15, help="imports to list")
+    startup.add_argument("--out", help="write results JSON here")
+
+    generate = sub.add_parser("generate", help="write a synthetic VCF profile to disk")
+    generate.add_argument("profile", choices=sorted(PROFILES))
+    generate.add_argument("path")
+    generate.add_argument("--seed", type=int, default=42)
+
+    for suite in (micro, load):
+        suite.add_argument("--out", help="write results JSON here")
+        suite.add_argument("--save-baseline", action="store_true", help=f"merge results into {BASELINE_PATH}")
+        suite.add_argument("--compare", action="store_true", help="exit 1 on regression vs the baseline")
+        suite.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.suite == "generate":
+        size = write_profile(args.profile, args.path, args.seed)
+        print(f"Wrote {args.path} ({size / (1024 * 1024):.1f} MB)")
+        return 0
+
+    if args.suite == "startup":
+        from benchmarks import startup as suite_module
+        results = suite_module.run(args.module, args.top)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+
+    if args.suite == "micro":
+        from benchmarks import micro as suite_module
+        results = suite_module.run(args.profiles.split(","), args.repeats)
+    else:
+        from benchmarks import load as suite_module
+        results = suite_module.run(
+            args.profile, args.requests, args.concurrency, args.drug, args.llm_latency_ms
+        )
+
+    harness.print_table(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        merged = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+                merged = json.load(f)["results"]
+        merged.update(results)
+        harness.save_baseline(BASELINE_PATH, merged)
+        print(f"Baseline updated: {BASELINE_PATH}")
+
+    if args.compare:
+        regressions = harness.compare(results, BASELINE_PATH, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import gc
+import json
+import math
+import time
+import platform
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+
+# -----------------------------
+# Statistics
+# -----------------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Linear-interpolated percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies_s: List[float], wall_s: Optional[float] = None, units: int = 1) -> Dict:
+    """
+    p50/p95/p99/mean in milliseconds plus throughput (units per second).
+    `units` is the work per call, e.g. bytes parsed.
+    """
+    ordered = sorted(latencies_s)
+    wall_s = wall_s if wall_s is not None else sum(ordered)
+    return {
+        "calls": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4) if ordered else 0.0,
+        "throughput_per_s": round(len(ordered) * units / wall_s, 2) if wall_s else 0.0,
+    }
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def peak_memory_mb(fn: Callable[[], object]) -> float:
+    """
+    Peak Python heap allocated during one call (tracemalloc, so it is
+    measured separately from the timed runs).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 3)
+
+
+def measure(fn: Callable[[], object], repeats: int, warmup: int = 1, units: int = 1) -> Dict:
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    result = summarize(latencies, units=units)
+    result["peak_memory_mb"] = peak_memory_mb(fn)
+    return result
+
+
+# -----------------------------
+# Baselines
+# -----------------------------
+# Only these are compared: latency and memory; throughput is derived.
+# Value: absolute slack, so microsecond-scale jitter is not a regression.
+COMPARED_METRICS = {"p50_ms": 0.01, "p95_ms": 0.02, "peak_memory_mb": 0.5}
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def save_baseline(path: str, results: Dict[str, Dict]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Regressions worse than `tolerance` (0.25 = 25%) relative to the
+    baseline. Benchmarks missing from either side are skipped.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        for metric, slack in COMPARED_METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            if new > old * (1 + tolerance) + slack:
+                regressions.append(f"{name} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+
+    return regressions
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    header = f"{'benchmark':<36}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'throughput/s':>16}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<36}{r['p50_ms']:>12.3f}{r['p95_ms']:>12.3f}{r['p99_ms']:>12.3f}"
+            f"{r['throughput_per_s']:>16.1f}{r.get('peak_memory_mb', 0):>10.2f}"
+        )
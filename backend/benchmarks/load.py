@@ -0,0 +1,99 @@
+"""
+In-process load test: drives the FastAPI app through httpx's ASGI
+transport (no sockets, no uvicorn) with the LLM replaced by a stub, so
+the numbers reflect our own pipeline only.
+"""
+import time
+import asyncio
+import itertools
+import tracemalloc
+from typing import Dict
+
+from benchmarks.harness import summarize
+from benchmarks.synthetic_vcf import generate_profile
+
+
+class StubLLMService:
+    """
+    Stands in for PharmaGuardLLMService: fixed latency, canned answer.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_s = latency_ms / 1000
+
+    async def generate_explanation(self, rule_engine_output: Dict) -> Dict:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return {
+            "drug": rule_engine_output.get("drug"),
+            "clinical_explanation": "Stubbed explanation for benchmarking.",
+            "mechanism": "Stubbed mechanism.",
+            "confidence": "High",
+        }
+
+
+async def run_load(profile: str = "tiny", requests: int = 200, concurrency: int = 16,
+                   drug: str = "CLOPIDOGREL", llm_latency_ms: float = 0.0) -> Dict:
+    # Imported here so micro benchmarks run without the web stack installed
+    import httpx
+    import main
+
+    stub = StubLLMService(llm_latency_ms)
+    main.get_llm_service = lambda: stub
+
+    # Each request gets its own ## line: same variants, distinct sha256, so
+    # the coalescer runs every request instead of serving the first one
+    header, _, rest = generate_profile(profile).encode("utf-8").partition(b"\n")
+    sequence = itertools.count()
+    coalescer = main.get_analysis_coalescer()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses: Dict[int, int] = {}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def one_request():
+            body = b"%s\n##benchmark_request=%d\n%s" % (header, next(sequence), rest)
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/analyze",
+                    files={"file": (f"{profile}.vcf", body, "text/plain")},
+                    data={"drug": drug},
+                )
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        # Warm-up outside the measurement (lazy pools, first imports)
+        await one_request()
+        latencies.clear()
+        statuses.clear()
+        before = coalescer.stats()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+        wall = time.perf_counter() - start
+
+        result = summarize(latencies, wall_s=wall)
+        result["concurrency"] = concurrency
+        result["status_codes"] = dict(statuses)
+        after = coalescer.stats()
+        result["coalesced"] = {name: after[name] - before[name] for name in ("executed", "shared", "cached")}
+
+        # Peak heap in a separate pass: tracemalloc slows every allocation
+        # and would inflate the latencies above many times over
+        tracemalloc.start()
+        try:
+            await asyncio.gather(*(one_request() for _ in range(requests)))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result["peak_memory_mb"] = round(peak / (1024 * 1024), 3)
+    return {f"load.analyze.{profile}": result}
+
+
+def run(profile: str = "tiny", requests: int = 200, concurrency: int = 16,
+        drug: str = "CLOPIDOGREL", llm_latency_ms: float = 0.0) -> Dict:
+    return asyncio.run(run_load(profile, requests, concurrency, drug, llm_latency_ms))
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from typing import Dict, Iterable
+
+from benchmarks.harness import measure
+from benchmarks.synthetic_vcf import PROFILES, write_profile
+from services.vcf_parcer import PharmaGuardVCFParser
+from services.rule_engine import CPICRuleEngine
+from services.response_builder import PharmaGuardResponseBuilder
+
+
+# Rough budget: keep each parse benchmark to a few seconds
+PARSE_BYTES_BUDGET = 200 * 1024 * 1024
+
+
+def bench_parse_vcf(profiles: Iterable[str], repeats: int) -> Dict[str, Dict]:
+    """
+    PharmaGuardVCFParser.parse_vcf over each synthetic profile.
+    Throughput is reported in MB/s.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in profiles:
+            path = os.path.join(tmp, f"{name}.vcf")
+            size = write_profile(name, path)
+
+            runs = max(3, min(repeats, PARSE_BYTES_BUDGET // max(size, 1)))
+            result = measure(lambda: PharmaGuardVCFParser.parse_vcf(path), runs)
+
+            # calls/s -> MB/s
+            result["throughput_mb_per_s"] = round(result["throughput_per_s"] * size / (1024 * 1024), 2)
+            result["input_bytes"] = size
+            results[f"parse_vcf.{name}"] = result
+    return results
+
+
+def sample_variants():
+    return PharmaGuardVCFParser.parse_vcf(
+        os.path.join(CPICRuleEngine.BASE_DIR, "sample_patient_1.vcf")
+    )
+
+
+def bench_rule_engine(repeats: int) -> Dict[str, Dict]:
+    parsed_variants = sample_variants()
+    results = {}
+
+    for drug in sorted(CPICRuleEngine.supported_drugs()):
+        results[f"evaluate.{drug}"] = measure(
+            lambda: CPICRuleEngine.evaluate(parsed_variants, drug), repeats
+        )
+
+    all_drugs = CPICRuleEngine.resolve_drugs("ALL")
+    results["evaluate_many.ALL"] = measure(
+        lambda: CPICRuleEngine.evaluate_many(parsed_variants, all_drugs), repeats
+    )
+    return results
+
+
+def bench_response_builder(repeats: int) -> Dict[str, Dict]:
+    parsed_variants = sample_variants()
+    engine_output = CPICRuleEngine.evaluate(parsed_variants, "CLOPIDOGREL")
+    llm_output = {
+        "drug": "CLOPIDOGREL",
+        "clinical_explanation": "Benchmark explanation. " * 20,
+        "mechanism": "Benchmark mechanism. " * 10,
+        "confidence": "High",
+    }
+
+    model = PharmaGuardResponseBuilder.build_model(
+        "PATIENT_BENCH", parsed_variants, engine_output, llm_output
+    )
+
+    all_drugs = CPICRuleEngine.resolve_drugs("ALL")
+    engine_outputs = CPICRuleEngine.evaluate_many(parsed_variants, all_drugs)
+    llm_outputs = [dict(llm_output, drug=output["drug"]) for output in engine_outputs]
+
+    return {
+        "build_model": measure(
+            lambda: PharmaGuardResponseBuilder.build_model(
+                "PATIENT_BENCH", parsed_variants, engine_output, llm_output
+            ),
+            repeats,
+        ),
+        "build_multi_drug_model.ALL": measure(
+            lambda: PharmaGuardResponseBuilder.build_multi_drug_model(
+                "PATIENT_BENCH", parsed_variants, engine_outputs, llm_outputs
+            ),
+            repeats,
+        ),
+        "render_json": measure(lambda: PharmaGuardResponseBuilder.render_json(model), repeats),
+        "render_json.no_debug": measure(
+            lambda: PharmaGuardResponseBuilder.render_json(model, include_debug=False), repeats
+        ),
+    }
+
+
+def run(profiles: Iterable[str] = tuple(PROFILES), repeats: int = 200) -> Dict[str, Dict]:
+    results = {}
+    results.update(bench_parse_vcf(profiles, repeats))
+    results.update(bench_rule_engine(repeats * 10))
+    results.update(bench_response_builder(repeats * 10))
+    return results
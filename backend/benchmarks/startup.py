@@ -0,0 +1,111 @@
+"""
+Cold-start profile: where import time goes (`python -X importtime`) and
+how long the app takes to become ready, each in a fresh interpreter so
+nothing is already imported or cached.
+"""
+import os
+import sys
+import json
+import subprocess
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child: time `import main`, then the lifespan until /ready is green
+READY_SCRIPT = """
+import json, time, asyncio
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+
+async def wait_ready():
+    async with main.lifespan(main.app):
+        while not main.startup_warmup.ready and main.startup_warmup.error is None:
+            await asyncio.sleep(0.005)
+        return time.perf_counter() - start
+
+ready = asyncio.run(wait_ready())
+print(json.dumps({"import_seconds": imported, "ready_seconds": ready,
+                  "steps": main.startup_warmup.steps, "error": main.startup_warmup.error,
+                  "degraded": main.startup_warmup.degraded}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Rows of `-X importtime` output: {"module", "self_us", "cumulative_us", "depth"}.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        stripped = name.rstrip().lstrip(" ")
+        rows.append({
+            "module": stripped,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name.rstrip()) - len(stripped) - 1) // 2,
+        })
+    return rows
+
+
+def profile_imports(module: str = "main", top: int = 15) -> Dict:
+    """
+    Top-level imports of `module` ranked by cumulative import time.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    rows = parse_importtime(completed.stderr)
+    total = next((row for row in rows if row["module"] == module), None)
+
+    # Direct children of the profiled module (depth 1 under it at depth 0)
+    direct = [row for row in rows if row["depth"] <= 1 and row["module"] != module]
+    direct.sort(key=lambda row: row["cumulative_us"], reverse=True)
+
+    return {
+        "module": module,
+        "ok": completed.returncode == 0,
+        "total_ms": total["cumulative_us"] / 1000 if total else None,
+        "top": [
+            {"module": row["module"], "cumulative_ms": row["cumulative_us"] / 1000}
+            for row in direct[:top]
+        ],
+    }
+
+
+def measure_ready() -> Dict:
+    """
+    Seconds from interpreter start of `import main` to import done and
+    to warm-up done, plus the per-step warm-up breakdown.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", READY_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run(module: str = "main", top: int = 15) -> Dict:
+    imports = profile_imports(module, top)
+
+    print(f"\nImport profile of `{module}`: {imports['total_ms'] or 0:.1f} ms"
+          + ("" if imports["ok"] else " (import failed)"))
+    for row in imports["top"]:
+        print(f"  {row['cumulative_ms']:9.1f} ms  {row['module']}")
+
+    ready = measure_ready() if module == "main" else {}
+    if ready:
+        if ready.get("error"):
+            print(f"\nWarm-up failed: {ready['error']}")
+        else:
+            print(f"\nimport main: {ready['import_seconds'] * 1000:.1f} ms, "
+                  f"ready: {ready['ready_seconds'] * 1000:.1f} ms")
+            for step, seconds in ready.get("steps", {}).items():
+                print(f"  {seconds * 1000:9.1f} ms  {step}")
+
+    return {"imports": imports, "ready": ready}
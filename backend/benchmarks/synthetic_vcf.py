@@ -0,0 +1,93 @@
+import io
+import random
+from typing import Dict, List, Optional
+
+from services.vcf_parcer import PharmaGuardVCFParser
+
+
+# -----------------------------
+# Input Profiles
+# -----------------------------
+# Background (non-PGx) records per profile. A single-sample line is ~50
+# bytes, each extra sample column adds ~4.
+PROFILES: Dict[str, Dict] = {
+    "tiny": {"records": 20, "samples": 1},
+    "5mb": {"records": 100_000, "samples": 1},
+    "exome": {"records": 400_000, "samples": 1},
+    "multi_sample": {"records": 20_000, "samples": 100},
+}
+
+HEADER = [
+    "##fileformat=VCFv4.2",
+    "##source=PharmaGuard_Benchmark",
+    "##reference=GRCh38",
+    '##INFO=<ID=GENE,Number=1,Type=String,Description="Pharmacogenomic Gene Symbol">',
+    '##INFO=<ID=STAR,Number=1,Type=String,Description="Star Allele Designation">',
+    '##INFO=<ID=RS,Number=1,Type=String,Description="dbSNP Reference SNP ID">',
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+]
+
+BASES = "ACGT"
+GENOTYPES = ("0/0", "0/1", "1/1", "0|1", "1|0")
+
+
+def pgx_records() -> List[tuple]:
+    """
+    (chrom, pos, rsid, gene, star) for every star allele the parser knows.
+    """
+    records = []
+    for gene, locus in PharmaGuardVCFParser.PGX_LOCI["genes"].items():
+        for allele in locus["star_alleles"]:
+            records.append((f"chr{locus['chrom']}", allele["position"], allele["rsid"], gene, allele["star"]))
+    return records
+
+
+def generate_vcf_text(records: int, samples: int = 1, seed: int = 42,
+                      pgx_fraction: Optional[float] = None) -> str:
+    """
+    A sorted GRCh38 VCF with `records` random background variants and
+    every known PGx star allele mixed in. Deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    sample_ids = [f"SAMPLE_{i:04d}" for i in range(samples)]
+
+    rows = []
+    for _ in range(records):
+        chrom = rng.randint(1, 22)
+        pos = rng.randint(10_000, 240_000_000)
+        ref = rng.choice(BASES)
+        alt = rng.choice(BASES.replace(ref, ""))
+        rows.append((chrom, pos, ".", ref, alt, "DP=30;AF=0.5"))
+
+    pgx = pgx_records()
+    repeats = 1 if pgx_fraction is None else max(1, int(records * pgx_fraction / len(pgx)))
+    for _ in range(repeats):
+        for chrom, pos, rsid, gene, star in pgx:
+            rows.append((int(chrom[3:]), pos, rsid, "C", "T", f"GENE={gene};STAR={star};RS={rsid}"))
+
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    out = io.StringIO()
+    out.write("\n".join(HEADER))
+    out.write("\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t" + "\t".join(sample_ids) + "\n")
+
+    for chrom, pos, rsid, ref, alt, info in rows:
+        genotypes = "\t".join(rng.choice(GENOTYPES) for _ in sample_ids)
+        out.write(f"chr{chrom}\t{pos}\t{rsid}\t{ref}\t{alt}\t100\tPASS\t{info}\tGT\t{genotypes}\n")
+
+    return out.getvalue()
+
+
+def generate_profile(name: str, seed: int = 42) -> str:
+    profile = PROFILES[name]
+    return generate_vcf_text(profile["records"], profile["samples"], seed)
+
+
+def write_profile(name: str, path: str, seed: int = 42) -> int:
+    """
+    Writes a profile to disk; returns its size in bytes.
+    """
+    text = generate_profile(name, seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return len(text.encode("utf-8"))
@@ -1,17 +1,149 @@
 import os
+import json
+import shutil
+import tempfile
+import asyncio
+import zlib
 import uuid
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import logging
+import secrets
+import importlib
+import itertools
+from contextlib import ExitStack, asynccontextmanager
+from typing import List, Optional, Union
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
 
-# Load environment variables
-load_dotenv()
+from services.env import load_env
 
-from models import PharmaGuardResponse
-from services.vcf_parcer import PharmaGuardVCFParser  # ✅ fixed typo
+# Load environment variables (once per process)
+load_env()
+
+from models import PharmaGuardResponse, PharmaGuardMultiDrugResponse, JobStatusResponse
+from services.vcf_parcer import (  # ✅ fixed typo
+    PharmaGuardVCFParser, VCFStreamParser, VCFFileTooLargeError, VCFLineTooLongError
+)
+from services.tabix_reader import PharmaGuardTabixReader, BGZFError
+from services.variant_record import VariantRecord
 from services.rule_engine import CPICRuleEngine
-from services.llm_service import PharmaGuardLLMService
-from services.response_builder import PharmaGuardResponseBuilder
+from services.diplotype_caller import DiplotypeCaller
+from services.llm_service import get_llm_service, close_llm_service
+from services.explanation_cache import get_explanation_cache
+from services.explanation_precompute import load_artifact, DEFAULT_ARTIFACT_PATH
+from services.response_builder import PharmaGuardResponseBuilder, LLM_EXPLANATION_FIELDS
+from services.executor import (
+    PipelineSaturatedError,
+    get_pipeline_executor,
+    shutdown_pipeline_executor,
+)
+from services.job_queue import JobQueueFullError, get_job_manager
+from services.knowledge_base import KB_WATCH_INTERVAL_SECONDS, get_knowledge_base
+from services.startup import StartupWarmup
+from services.coalescing import file_sha256, get_analysis_coalescer
+from services.fair_scheduler import get_telegram_scheduler
+from services.report_renderer import (
+    REPORT_BATCH_MAX,
+    REPORT_RENDER_WINDOW,
+    ZipStream,
+    render_pdf,
+    report_filename,
+)
+from services.telegram_webhook import (
+    TELEGRAM_WEBHOOK_PATH,
+    TELEGRAM_WEBHOOK_URL,
+    InvalidUpdateError,
+    TelegramWebhook,
+    WebhookConfigError,
+)
+from services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Built offline by `python -m services.explanation_precompute`
+PRECOMPUTED_EXPLANATIONS_PATH = os.getenv("PRECOMPUTED_EXPLANATIONS_PATH", DEFAULT_ARTIFACT_PATH)
+
+
+# -----------------------------
+# App Lifespan
+# -----------------------------
+startup_warmup = StartupWarmup()
+
+
+async def warm_knowledge_base():
+    # Reads and compiles the CPIC files (otherwise done by the first request)
+    await get_pipeline_executor().run_in_thread(lambda: get_knowledge_base().current)
+
+
+async def warm_explanations():
+    # Known genotypes are answered from the precomputed artifact, no LLM call
+    loaded = await get_pipeline_executor().run_in_thread(
+        load_artifact, PRECOMPUTED_EXPLANATIONS_PATH, get_explanation_cache()
+    )
+    logger.info("Preloaded %d precomputed explanations", loaded)
+
+
+async def warm_llm_client():
+    # The openai import dominates construction; do it off the event loop
+    await get_pipeline_executor().run_in_thread(importlib.import_module, "openai")
+    get_llm_service()
+
+
+# Set by the lifespan when TELEGRAM_WEBHOOK_URL is configured
+telegram_webhook: Optional[TelegramWebhook] = None
+
+
+async def start_telegram_webhook():
+    global telegram_webhook
+    try:
+        webhook = TelegramWebhook.create()
+        await webhook.start()
+    except WebhookConfigError as e:
+        logger.error("Telegram webhook not started: %s", e)
+        return
+    except Exception:
+        # The API keeps serving without the bot
+        logger.exception("Telegram webhook failed to start")
+        return
+    telegram_webhook = webhook
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Slow initialization runs in the background; GET /ready reports it
+    warmup_task = asyncio.create_task(startup_warmup.run([
+        ("knowledge_base", warm_knowledge_base),
+        ("explanations", warm_explanations),
+        ("llm_client", warm_llm_client),
+    ], best_effort=("explanations", "llm_client")))
+
+    # Background workers for POST /jobs
+    get_job_manager().start()
+
+    # Pick up edited CPIC files without a redeploy; rebuilt off the loop
+    kb_watcher = None
+    if KB_WATCH_INTERVAL_SECONDS > 0:
+        kb_watcher = asyncio.create_task(
+            get_knowledge_base().watch(get_pipeline_executor().run_in_thread)
+        )
+
+    # Telegram bot served by this app (POST TELEGRAM_WEBHOOK_PATH), no polling
+    if TELEGRAM_WEBHOOK_URL:
+        await start_telegram_webhook()
+
+    yield
+    warmup_task.cancel()
+    if kb_watcher is not None:
+        kb_watcher.cancel()
+    if telegram_webhook is not None:
+        await telegram_webhook.stop()
+
+    # Release the pooled LLM connections and the pipeline worker pools
+    await get_job_manager().stop()
+    await close_llm_service()
+    shutdown_pipeline_executor()
 
 
 # -----------------------------
@@ -21,6 +153,7 @@ app = FastAPI(
     title="PharmaGuard API",
     description="AI-powered Pharmacogenomics Risk Analyzer",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # -----------------------------
@@ -56,7 +189,11 @@ if frontend_url:
 # Comment this out in production and use specific origins above
 ALLOWED_ORIGINS = ["*"]
 
-print(f"🔒 CORS Allowed Origins: {ALLOWED_ORIGINS}")
+logger.info("🔒 CORS Allowed Origins: %s", ALLOWED_ORIGINS)
+
+# Per-route latency histograms; skipped entirely when METRICS_ENABLED=0
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -67,12 +204,28 @@ app.add_middleware(
 )
 
 # -----------------------------
-# Temporary Upload Directory
+# Upload Limits
 # -----------------------------
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Parsing memory stays flat, but every byte is still received, spooled and
+# scanned per request. Raise MAX_UPLOAD_MB deliberately for WGS-sized files.
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "10"))
+MAX_FILE_SIZE = MAX_UPLOAD_MB * 1024 * 1024
 
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Compressed uploads are also bounded by the text they inflate to, so a
+# small gzip bomb can't expand without limit while it is parsed
+MAX_DECOMPRESSED_MB = int(os.getenv("MAX_DECOMPRESSED_MB", str(MAX_UPLOAD_MB * 20)))
+MAX_DECOMPRESSED_SIZE = MAX_DECOMPRESSED_MB * 1024 * 1024
+
+VCF_EXTENSIONS = (".vcf", ".vcf.gz", ".vcf.bgz")
+
+# Seconds clients are told to wait when the pipeline is saturated
+PIPELINE_RETRY_AFTER = os.getenv("PIPELINE_RETRY_AFTER", "5")
+
+
+def saturated_error(e: PipelineSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=503, detail=str(e), headers={"Retry-After": PIPELINE_RETRY_AFTER}
+    )
 
 
 # -----------------------------
@@ -83,71 +236,754 @@ def health_check():
     return {"status": "PharmaGuard API is running"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """
+    200 once the knowledge base is loaded and the caches have been warmed
+    (a failed cache step is listed under "degraded"), 503 before that.
+    """
+    return JSONResponse(
+        startup_warmup.status(), status_code=200 if startup_warmup.ready else 503
+    )
+
+
 # -----------------------------
-# Main Analysis Endpoint
+# LLM Explanation Cache Stats
 # -----------------------------
-@app.post("/analyze", response_model=PharmaGuardResponse)
-async def analyze_pharmacogenomics(file: UploadFile = File(...), drug: str = Form(...)):
+@app.get("/cache/stats")
+def explanation_cache_stats():
+    return get_explanation_cache().stats()
 
-    # Validate file extension
-    if not file.filename.endswith(".vcf"):
-        raise HTTPException(status_code=400, detail="Only .vcf files are allowed.")
 
-    # Read file to check size
-    file_content = await file.read()
+# -----------------------------
+# Pipeline Executor Stats
+# -----------------------------
+@app.get("/pipeline/stats")
+def pipeline_stats():
+    return {
+        **get_pipeline_executor().stats(),
+        "coalescing": get_analysis_coalescer().stats(),
+        "telegram": get_telegram_scheduler().stats(),
+        "telegram_webhook": telegram_webhook.stats() if telegram_webhook is not None else None,
+    }
 
-    if len(file_content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File exceeds 5MB limit.")
 
-    # Save temporarily
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}.vcf")
+# -----------------------------
+# Prometheus Metrics
+# -----------------------------
+@app.get("/metrics")
+def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# -----------------------------
+# Job Queue Stats
+# -----------------------------
+@app.get("/jobs/stats")
+def job_stats():
+    return get_job_manager().stats()
+
+
+# -----------------------------
+# Knowledge Base
+# -----------------------------
+# Empty disables the admin endpoints
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
 
-    with open(file_path, "wb") as buffer:
-        buffer.write(file_content)
+@app.get("/kb")
+def knowledge_base_stats():
+    return get_knowledge_base().stats()
+
+
+@app.post("/admin/kb/reload")
+async def reload_knowledge_base(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Reloads the CPIC files now. Requests already running finish on the
+    snapshot they started with; a file that fails validation is rejected
+    and the current snapshot stays in place.
+    """
+    if not ADMIN_TOKEN or not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+    knowledge_base = get_knowledge_base()
+    previous_version = knowledge_base.current.version
 
     try:
-        # 1️⃣ Parse VCF
-        parsed_variants = PharmaGuardVCFParser.parse_vcf(file_path)
+        snapshot, swapped = await get_pipeline_executor().run_in_thread(knowledge_base.reload, force)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Knowledge base not reloaded: {e}")
 
-        if not parsed_variants:
-            raise HTTPException(
-                status_code=400, detail="No pharmacogenomic variants detected."
-            )
+    return {
+        "previous_version": previous_version,
+        "version": snapshot.version,
+        "swapped": swapped,
+        "loaded_at": snapshot.loaded_at,
+    }
+
+
+# -----------------------------
+# Telegram Webhook
+# -----------------------------
+@app.post(TELEGRAM_WEBHOOK_PATH, include_in_schema=False)
+async def telegram_update(request: Request, x_telegram_bot_api_secret_token: Optional[str] = Header(None)):
+    """
+    Receives one Telegram update and queues it for the bot. Answers as
+    soon as the update is queued; a 503 makes Telegram redeliver later.
+    """
+    if telegram_webhook is None:
+        raise HTTPException(status_code=404, detail="Telegram webhook is not enabled.")
+    if not telegram_webhook.verify(x_telegram_bot_api_secret_token):
+        raise HTTPException(status_code=403, detail="Invalid webhook secret.")
+
+    try:
+        queued = telegram_webhook.enqueue(await request.body())
+    except InvalidUpdateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not queued:
+        raise HTTPException(status_code=503, detail="Update queue is full.", headers={"Retry-After": PIPELINE_RETRY_AFTER})
+    return {"ok": True}
+
+
+# -----------------------------
+# Upload Parsing
+# -----------------------------
+async def parse_uploaded_vcf(
+    file: UploadFile,
+    index: Optional[UploadFile] = None,
+    stream_parser: Optional[VCFStreamParser] = None,
+    with_raw_info: bool = True,
+) -> List[VariantRecord]:
+    """
+    Picks the cheapest reader for the upload:
+    - .vcf.gz + .tbi  -> tabix seeks to the PGx loci only
+    - .vcf.gz         -> streaming decompress + linear parse
+    - .vcf            -> streaming parse
+    Parsing itself runs on the pipeline executor's pools. Without
+    with_raw_info the INFO column is dropped at parse time.
+    """
+    filename = file.filename or ""
+    executor = get_pipeline_executor()
 
-        # 2️⃣ Apply Rule Engine
-        engine_output = CPICRuleEngine.evaluate(parsed_variants, drug)
+    # Validate file extension
+    if not filename.endswith(VCF_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only .vcf or .vcf.gz files are allowed.")
+
+    if index is not None and not (index.filename or "").endswith(".tbi"):
+        raise HTTPException(status_code=400, detail="Index must be a tabix .tbi file.")
+
+    # Reject early when the client already told us the size
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File exceeds {MAX_UPLOAD_MB}MB limit.")
 
-        if not engine_output.get("evaluations"):
-            raise HTTPException(
-                status_code=400, detail="Drug not supported or no relevant gene found."
+    if stream_parser is None:
+        stream_parser = executor.stream_parser(file.size, with_raw_info=with_raw_info)
+
+    try:
+        if filename.endswith(".vcf"):
+            return await PharmaGuardVCFParser.parse_upload(
+                file, max_bytes=MAX_FILE_SIZE, stream_parser=stream_parser
             )
 
-        # 3️⃣ Generate LLM Explanation
-        llm_service = PharmaGuardLLMService()
-        explanation = llm_service.generate_explanation(engine_output)
+        if index is not None:
+            # Random access over the already-received upload; blocking seeks
+            return await executor.run_in_thread(
+                PharmaGuardTabixReader.parse_indexed_vcf, file.file, index.file, with_raw_info,
+                MAX_DECOMPRESSED_SIZE
+            )
 
-        # 4️⃣ Build Final Structured Response
-        builder = PharmaGuardResponseBuilder()
+        return await PharmaGuardTabixReader.parse_gzip_upload(
+            file, max_bytes=MAX_FILE_SIZE, stream_parser=stream_parser,
+            max_inflated_bytes=MAX_DECOMPRESSED_SIZE
+        )
 
-        final_response = builder.build_final_response(
-            patient_id="PATIENT_" + file_id[:8],
-            parsed_variants=parsed_variants,
-            rule_engine_output=engine_output,
-            llm_output=explanation,
+    except VCFFileTooLargeError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File exceeds {MAX_UPLOAD_MB}MB limit "
+                   f"({MAX_DECOMPRESSED_MB}MB once decompressed).",
         )
 
-        return final_response
+    except VCFLineTooLongError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid VCF: {e}")
+
+    except (BGZFError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid compressed VCF: {e}")
+
+    finally:
+        # Don't leave blocks of a rejected upload queued on the pools
+        stream_parser.cancel()
+
+
+# -----------------------------
+# Main Analysis Endpoint
+# -----------------------------
+@app.post("/analyze", response_model=Union[PharmaGuardResponse, PharmaGuardMultiDrugResponse])
+async def analyze_pharmacogenomics(
+    file: UploadFile = File(...),
+    drug: str = Form(...),
+    index: Optional[UploadFile] = File(None),
+    include_debug: bool = Form(True),
+):
+    """
+    `drug` takes one drug, a comma-separated list or "ALL". A single drug
+    returns a PharmaGuardResponse; several return one report per drug.
+    include_debug=false leaves raw_info out of detected_variants.
+
+    The body is built from already-valid pipeline output and serialized
+    once, so it is returned as a Response and not re-validated.
+    """
+    drug_names = CPICRuleEngine.resolve_drugs(drug)
+    file_id = str(uuid.uuid4())
+    executor = get_pipeline_executor()
+
+    try:
+        # Identical concurrent requests (double-clicks, retries) share one run
+        report = await coalesced_analysis(executor, file, index, drug_names, file_id, include_debug)
+
+        with metrics.stage("serialize", metrics.drug_label(drug_names, CPICRuleEngine.supported_drugs())):
+            body = await executor.run_in_thread(
+                PharmaGuardResponseBuilder.render_json, report, include_debug
+            )
+
+        return Response(content=body, media_type="application/json")
+
+    except PipelineSaturatedError as e:
+        metrics.ERRORS.inc("api", "saturated")
+        raise saturated_error(e)
 
     # 🔥 Correct HTTP error handling
     except HTTPException as http_exc:
+        metrics.ERRORS.inc("api", str(http_exc.status_code))
         raise http_exc
 
     except Exception as e:
+        metrics.ERRORS.inc("api", type(e).__name__)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def patient_id_for(file_id: str) -> str:
+    return "PATIENT_" + file_id[:8]
+
+
+def stamp_report(report, file_id: str):
+    """
+    A coalesced report was built for another request; give this caller
+    its own patient_id and timestamp (the analysis itself is shared).
+    """
+    patient_id = patient_id_for(file_id)
+    if report.patient_id == patient_id:
+        return report
+    return PharmaGuardResponseBuilder.restamp(report, patient_id)
+
+
+async def analysis_key(file: UploadFile, index: Optional[UploadFile],
+                       drug_names: list, include_debug: bool) -> tuple:
+    """
+    Single-flight key: same VCF and index bytes, drugs, knowledge base
+    version and options produce the same report. The uploads are already
+    fully received, so they are hashed up front (on the pool) and rewound
+    for the parser.
+    """
+    executor = get_pipeline_executor()
+    digest = await executor.run_in_thread(file_sha256, file.file)
+    index_digest = await executor.run_in_thread(file_sha256, index.file) if index is not None else None
+    return (
+        digest, index_digest, tuple(drug_names), CPICRuleEngine.snapshot().version, include_debug,
+    )
+
+
+async def coalesced_analysis(executor, file: UploadFile, index: Optional[UploadFile],
+                             drug_names: list, file_id: str, include_debug: bool):
+    """
+    Runs the /analyze pipeline through the single-flight coalescer and
+    stamps the report for this caller. The shared task can outlive the
+    request that started it, so it parses its own copies of the uploads
+    and closes them when it finishes; a caller that only joins an
+    existing run closes its copies right away.
+    """
+    # Don't copy an upload that parsing would reject anyway
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File exceeds {MAX_UPLOAD_MB}MB limit.")
+
+    own_file = await spool_upload(file)
+    own_index = await spool_upload(index) if index is not None else None
+    started = False
+
+    async def close_copies():
+        await own_file.close()
+        if own_index is not None:
+            await own_index.close()
+
+    async def analyze():
+        try:
+            with executor.admit():
+                return await run_analysis(
+                    executor, own_file, own_index, drug_names, file_id, with_raw_info=include_debug
+                )
+        finally:
+            await close_copies()
+
+    def start():
+        nonlocal started
+        started = True
+        return analyze()
+
+    try:
+        key = await analysis_key(own_file, own_index, drug_names, include_debug)
+        report = await get_analysis_coalescer().run(key, start)
+    finally:
+        if not started:
+            await close_copies()
+
+    return stamp_report(report, file_id)
+
+
+async def run_analysis(executor, file: UploadFile, index: Optional[UploadFile],
+                       drug_names: list, file_id: str, with_raw_info: bool = True):
+    """
+    The /analyze pipeline; returns the response model. CPU-bound stages
+    run on the executor's pools so one large upload never stalls other
+    requests on this worker.
+    """
+    drug = metrics.drug_label(drug_names, CPICRuleEngine.supported_drugs())
+
+    # 1️⃣ Parse VCF once (streamed or index-seeked, no temp file of our own)
+    with metrics.stage("parse"):
+        parsed_variants = await parse_uploaded_vcf(file, index, with_raw_info=with_raw_info)
+
+    if not parsed_variants:
+        raise HTTPException(
+            status_code=400, detail="No pharmacogenomic variants detected."
+        )
+
+    # 2️⃣ Apply Rule Engine (gene grouping built once, shared by every drug)
+    with metrics.stage("rule_engine", drug):
+        engine_outputs = await executor.run_in_thread(
+            CPICRuleEngine.evaluate_many, parsed_variants, drug_names
+        )
+
+    unsupported = [o["drug"] for o in engine_outputs if not o.get("evaluations")]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Drug not supported or no relevant gene found: {', '.join(unsupported)}",
+        )
+
+    # 3️⃣ Generate LLM Explanations (one per drug, concurrently on the shared client)
+    llm_service = get_llm_service()
+
+    async def explain(engine_output):
+        with metrics.stage("llm", engine_output["drug"]):
+            return await llm_service.generate_explanation(engine_output)
+
+    explanations = await asyncio.gather(*(explain(output) for output in engine_outputs))
+
+    # 4️⃣ Build Final Structured Response
+    builder = PharmaGuardResponseBuilder()
+    patient_id = patient_id_for(file_id)
+
+    with metrics.stage("build", drug):
+        if len(engine_outputs) == 1:
+            return await executor.run_in_thread(
+                builder.build_model,
+                patient_id=patient_id,
+                parsed_variants=parsed_variants,
+                rule_engine_output=engine_outputs[0],
+                llm_output=explanations[0],
+            )
+
+        return await executor.run_in_thread(
+            builder.build_multi_drug_model,
+            patient_id=patient_id,
+            parsed_variants=parsed_variants,
+            rule_engine_outputs=engine_outputs,
+            llm_outputs=explanations,
+        )
+
+
+# -----------------------------
+# Streaming Analysis Endpoint (SSE)
+# -----------------------------
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def merge_explanation_streams(llm_service, engine_outputs: list):
+    """
+    Runs one explanation stream per drug concurrently and yields
+    (drug, kind, payload) in arrival order.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(engine_output):
+        drug_name = engine_output["drug"]
+        try:
+            with metrics.stage("llm", drug_name, source="stream"):
+                async for kind, payload in llm_service.stream_explanation(engine_output):
+                    await queue.put((drug_name, kind, payload))
+        finally:
+            await queue.put((drug_name, None, None))
+
+    tasks = [asyncio.create_task(pump(output)) for output in engine_outputs]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            drug_name, kind, payload = await queue.get()
+            if kind is None:
+                remaining -= 1
+                continue
+            yield drug_name, kind, payload
     finally:
-        # Cleanup file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # Client went away: stop the completions still running
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/analyze/stream")
+async def analyze_pharmacogenomics_stream(
+    file: UploadFile = File(...),
+    drug: str = Form(...),
+    index: Optional[UploadFile] = File(None),
+    include_debug: bool = Form(True),
+):
+    """
+    Same input as /analyze, answered as Server-Sent Events:
+    - `report`              one per drug, right after the rule engine, with
+                            an empty llm_generated_explanation
+    - `explanation_delta`   {drug, field, delta} as the model writes
+    - `explanation`         {drug, llm_generated_explanation} when complete
+    - `done`
+    """
+    drug_names = CPICRuleEngine.resolve_drugs(drug)
+    file_id = str(uuid.uuid4())
+    executor = get_pipeline_executor()
+    label = metrics.drug_label(drug_names, CPICRuleEngine.supported_drugs())
+
+    try:
+        with executor.admit():
+            with metrics.stage("parse", source="stream"):
+                parsed_variants = await parse_uploaded_vcf(file, index, with_raw_info=include_debug)
+
+            if not parsed_variants:
+                raise HTTPException(
+                    status_code=400, detail="No pharmacogenomic variants detected."
+                )
+
+            with metrics.stage("rule_engine", label, source="stream"):
+                engine_outputs = await executor.run_in_thread(
+                    CPICRuleEngine.evaluate_many, parsed_variants, drug_names
+                )
+
+            unsupported = [o["drug"] for o in engine_outputs if not o.get("evaluations")]
+            if unsupported:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Drug not supported or no relevant gene found: {', '.join(unsupported)}",
+                )
+
+    except PipelineSaturatedError as e:
+        metrics.ERRORS.inc("stream", "saturated")
+        raise saturated_error(e)
+
+    except HTTPException as http_exc:
+        metrics.ERRORS.inc("stream", str(http_exc.status_code))
+        raise http_exc
+
+    except Exception as e:
+        metrics.ERRORS.inc("stream", type(e).__name__)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    builder = PharmaGuardResponseBuilder()
+    patient_id = patient_id_for(file_id)
+
+    def render_report(engine_output: dict, detected_variants) -> dict:
+        report = builder.build_model(
+            patient_id=patient_id,
+            parsed_variants=parsed_variants,
+            rule_engine_output=engine_output,
+            llm_output={},
+            detected_variants=detected_variants,
+        )
 
+        # The explanation is empty until it streams in
+        exclude = None if include_debug else builder.debug_exclude(report)
+        return report.model_dump(mode="json", exclude=exclude)
+
+    async def events():
+        # 1️⃣ Deterministic part first — no waiting on the LLM (built on the pool, like /analyze)
+        detected_variants = await executor.run_in_thread(
+            builder.build_variant_models, parsed_variants
+        )
+        for engine_output in engine_outputs:
+            report = await executor.run_in_thread(render_report, engine_output, detected_variants)
+            yield sse_event("report", report)
+
+        # 2️⃣ Explanations as they are generated
+        try:
+            async for drug_name, kind, payload in merge_explanation_streams(
+                get_llm_service(), engine_outputs
+            ):
+                if kind == "delta":
+                    field, delta = payload
+                    if field in LLM_EXPLANATION_FIELDS:
+                        yield sse_event("explanation_delta", {
+                            "drug": drug_name,
+                            "field": LLM_EXPLANATION_FIELDS[field],
+                            "delta": delta,
+                        })
+                else:
+                    yield sse_event("explanation", {
+                        "drug": drug_name,
+                        "llm_generated_explanation": builder.build_explanation(payload),
+                    })
+
+        except Exception as e:
+            metrics.ERRORS.inc("stream", type(e).__name__)
+            yield sse_event("error", {"detail": str(e)})
+
+        yield sse_event("done", {"patient_id": patient_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -----------------------------
+# Cohort Batch Endpoint (NDJSON)
+# -----------------------------
+@app.post("/analyze/batch")
+async def analyze_cohort(file: UploadFile = File(...), drugs: str = Form("ALL")):
+    """
+    One pass over a multi-sample VCF, then a sample x drug matrix of
+    rule-engine results streamed as NDJSON (one line per sample).
+    No LLM calls are made in batch mode.
+    """
+    drug_names = CPICRuleEngine.resolve_drugs(drugs)
+    supported = CPICRuleEngine.supported_drugs()
+    unsupported = [name for name in drug_names if name not in supported]
+
+    if unsupported:
+        raise HTTPException(
+            status_code=400, detail=f"Drug not supported: {', '.join(unsupported)}"
+        )
+
+    executor = get_pipeline_executor()
+    stream_parser = executor.stream_parser(file.size, with_genotypes=True, with_raw_info=False)
+
+    # The rule engine runs while the response is written, so the pipeline
+    # slot is held until the last row is streamed (or the client goes away)
+    slot = ExitStack()
+
+    try:
+        try:
+            slot.enter_context(executor.admit())
+
+            with metrics.stage("parse", source="batch"):
+                parsed_variants = await parse_uploaded_vcf(file, stream_parser=stream_parser)
+
+            if not stream_parser.sample_ids:
+                raise HTTPException(status_code=400, detail="VCF has no sample columns.")
+
+            with metrics.stage("diplotype", source="batch"):
+                cohort_calls = await executor.run_in_thread(
+                    DiplotypeCaller.call_cohort, parsed_variants, stream_parser.sample_ids
+                )
+
+        except PipelineSaturatedError as e:
+            metrics.ERRORS.inc("batch", "saturated")
+            raise saturated_error(e)
+
+        except HTTPException as http_exc:
+            metrics.ERRORS.inc("batch", str(http_exc.status_code))
+            raise http_exc
+
+        except Exception as e:
+            metrics.ERRORS.inc("batch", type(e).__name__)
+            raise HTTPException(status_code=500, detail=str(e))
+
+    except BaseException:
+        # Nothing will be streamed; give the slot back now
+        slot.close()
+        raise
+
+    # Starlette iterates sync generators on its threadpool, off the loop
+    def ndjson_rows():
+        with slot:
+            for row in CPICRuleEngine.evaluate_batch(cohort_calls, drug_names):
+                yield json.dumps(row) + "\n"
+
+    # A stream that never starts still gives the slot back (close is idempotent)
+    return StreamingResponse(
+        ndjson_rows(), media_type="application/x-ndjson", background=BackgroundTask(slot.close)
+    )
+
+
+# -----------------------------
+# Asynchronous Jobs
+# -----------------------------
+# Uploads up to this size are copied into memory for a job or a shared
+# analysis, larger ones spill to a temp file (the request's own upload is
+# closed on response).
+JOB_SPOOL_MAX_MEMORY = int(os.getenv("JOB_SPOOL_MAX_MEMORY_MB", "16")) * 1024 * 1024
+
+
+async def spool_upload(upload: UploadFile) -> UploadFile:
+    """
+    Copies an upload into a file owned by the job or shared analysis.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=JOB_SPOOL_MAX_MEMORY)
+    await get_pipeline_executor().run_in_thread(shutil.copyfileobj, upload.file, spool)
+    spool.seek(0)
+    return UploadFile(file=spool, size=upload.size, filename=upload.filename)
+
+
+@app.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def submit_analysis_job(
+    file: UploadFile = File(...),
+    drug: str = Form(...),
+    index: Optional[UploadFile] = File(None),
+    include_debug: bool = Form(True),
+):
+    """
+    Queues the /analyze pipeline and returns a job id right away; poll
+    GET /jobs/{job_id} for the result.
+    """
+    drug_names = CPICRuleEngine.resolve_drugs(drug)
+    supported = CPICRuleEngine.supported_drugs()
+    unsupported = [name for name in drug_names if name not in supported]
+
+    if unsupported:
+        raise HTTPException(
+            status_code=400, detail=f"Drug not supported: {', '.join(unsupported)}"
+        )
+
+    if not (file.filename or "").endswith(VCF_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Only .vcf or .vcf.gz files are allowed.")
+
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail=f"File exceeds {MAX_UPLOAD_MB}MB limit.")
+
+    job_file = await spool_upload(file)
+    job_index = await spool_upload(index) if index is not None else None
+    file_id = str(uuid.uuid4())
+
+    async def run_job():
+        # Same admission as /analyze: a saturated pipeline requeues the job
+        report = await coalesced_analysis(
+            get_pipeline_executor(), job_file, job_index, drug_names, file_id, include_debug
+        )
+        # Serialized once here; polls return these bytes as they are
+        return await get_pipeline_executor().run_in_thread(
+            PharmaGuardResponseBuilder.render_json, report, include_debug
+        )
+
+    async def close_uploads():
+        await job_file.close()
+        if job_index is not None:
+            await job_index.close()
+
+    try:
+        job = get_job_manager().submit(run_job, meta={"drugs": drug_names}, cleanup=close_uploads)
+
+    except JobQueueFullError as e:
+        await close_uploads()
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": PIPELINE_RETRY_AFTER}
+        )
+
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_analysis_job(job_id: str):
+    """
+    The finished result was rendered when the job completed (without
+    raw_info unless include_debug was set) and is not re-validated here.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return Response(content=job.to_json(), media_type="application/json")
+
+
+# -----------------------------
+# Report Rendering (PDF / JSON)
+# -----------------------------
+def attachment(filename: str) -> dict:
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+@app.post("/reports/pdf")
+async def render_pdf_report(report: PharmaGuardResponse):
+    """
+    report.pdf for a built report (e.g. the body /analyze returned),
+    rendered in memory and sent as-is.
+    """
+    data = report.model_dump()
+    drug_label = metrics.drug_label([report.drug], CPICRuleEngine.supported_drugs())
+
+    with metrics.stage("render_pdf", drug_label, source="reports"):
+        pdf = await get_pipeline_executor().run_in_thread(render_pdf, [data])
+
+    return Response(pdf, media_type="application/pdf", headers=attachment(report_filename(data)))
+
+
+@app.post("/reports/json")
+def render_json_report(report: PharmaGuardResponse, include_debug: bool = True):
+    """
+    report.json for a built report; include_debug=false drops raw_info.
+    """
+    body = PharmaGuardResponseBuilder.render_json(report, include_debug)
+    name = report_filename({"patient_id": report.patient_id, "drug": report.drug}, extension="json")
+    return Response(body, media_type="application/json", headers=attachment(name))
+
+
+@app.post("/reports/batch")
+async def render_report_batch(reports: Union[PharmaGuardMultiDrugResponse, List[PharmaGuardResponse]]):
+    """
+    One PDF per report, zipped. PDFs are rendered on the process pool
+    (REPORT_RENDER_WINDOW ahead of the writer) and the archive is streamed
+    as each entry completes; nothing touches disk.
+    """
+    if isinstance(reports, PharmaGuardMultiDrugResponse):
+        reports = reports.reports
+    if not reports:
+        raise HTTPException(status_code=422, detail="No reports to render.")
+    if len(reports) > REPORT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {REPORT_BATCH_MAX} reports per batch.")
+
+    dumps = [report.model_dump() for report in reports]
+    executor = get_pipeline_executor()
+
+    async def zip_chunks():
+        archive = ZipStream()
+        pending = iter(enumerate(dumps))
+        window = []
+
+        def fill():
+            for index, data in itertools.islice(pending, REPORT_RENDER_WINDOW - len(window)):
+                future = asyncio.wrap_future(executor.submit_process(render_pdf, [data]))
+                window.append((report_filename(data, index), future))
+
+        fill()
+        try:
+            while window:
+                name, future = window.pop(0)
+                pdf = await future
+                fill()
+                yield archive.add(name, pdf)
+            yield archive.close()
+        finally:
+            # Client went away: drop renders that have not started
+            for _, future in window:
+                future.cancel()
+
+    return StreamingResponse(
+        zip_chunks(), media_type="application/zip", headers=attachment("reports.zip")
+    )
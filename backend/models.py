@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 
 
 # -----------------------------
@@ -72,3 +72,32 @@ class PharmaGuardResponse(BaseModel):
     clinical_recommendation: ClinicalRecommendation
     llm_generated_explanation: LLMGeneratedExplanation
     quality_metrics: QualityMetrics
+
+    # CPIC knowledge base snapshot the rule engine evaluated against
+    knowledge_base_version: Optional[str] = None
+
+
+# -----------------------------
+# Multi-Drug Response (one report per drug)
+# -----------------------------
+class PharmaGuardMultiDrugResponse(BaseModel):
+    patient_id: str
+    timestamp: str
+    drugs: List[str]
+    reports: List[PharmaGuardResponse]
+
+
+# -----------------------------
+# Asynchronous Job Status
+# -----------------------------
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued | running | succeeded | failed")
+    drugs: List[str]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Union[PharmaGuardResponse, PharmaGuardMultiDrugResponse]] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = Field(None, description="Seconds to wait before resubmitting a job rejected with 503")
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Hashable, Optional, Tuple
+
+from services import metrics
+
+
+# -----------------------------
+# Coalescing Configuration (env overridable)
+# -----------------------------
+# Finished analyses are served to identical requests for this long
+COALESCE_RESULT_TTL_SECONDS = float(os.getenv("COALESCE_RESULT_TTL_SECONDS", "30"))
+COALESCE_MAX_RESULTS = int(os.getenv("COALESCE_MAX_RESULTS", "256"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file: BinaryIO) -> str:
+    """
+    sha256 of an already-received upload, rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution: the first
+    caller starts it as a task, later callers await the same task.
+    Successful results are then served for result_ttl seconds; failures
+    are never cached, so the next caller retries.
+
+    The shared task is shielded: a caller that disconnects does not
+    cancel the work the others are waiting on. Use an instance from one
+    event loop only (tasks cannot be awaited across loops).
+    """
+
+    def __init__(self, name: str, result_ttl: float = COALESCE_RESULT_TTL_SECONDS,
+                 max_results: int = COALESCE_MAX_RESULTS):
+        self.name = name
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.executed = 0
+        self.shared = 0
+        self.cached = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, result = cached
+            if expires_at > time.monotonic():
+                self.cached += 1
+                metrics.COALESCED.inc(self.name, "cached")
+                return result
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            metrics.COALESCED.inc(self.name, "shared")
+        else:
+            self.executed += 1
+            metrics.COALESCED.inc(self.name, "executed")
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.result_ttl <= 0:
+            return
+
+        self._results[key] = (time.monotonic() + self.result_ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._inflight),
+            "results": len(self._results),
+            "executed": self.executed,
+            "shared": self.shared,
+            "cached": self.cached,
+        }
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_analyses: Optional[SingleFlight] = None
+_analyses_lock = threading.Lock()
+
+
+def get_analysis_coalescer() -> SingleFlight:
+    """
+    Shared single-flight for /analyze and /jobs, keyed by
+    (VCF sha256, drugs, knowledge base version, options).
+    """
+    global _analyses
+    if _analyses is None:
+        with _analyses_lock:
+            if _analyses is None:
+                _analyses = SingleFlight("analysis")
+    return _analyses
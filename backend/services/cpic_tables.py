@@ -0,0 +1,277 @@
+import sys
+import json
+import hashlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Canonical diplotype: two star alleles in sort order, e.g. ("*1", "*17")
+Diplotype = Tuple[str, str]
+
+KNOWN_PHENOTYPES = {"PM", "IM", "NM", "RM", "URM"}
+REQUIRED_GUIDELINE_FIELDS = ("risk_label", "severity", "recommendation")
+
+MAX_UNMATCHED_ENTRIES = 4096
+
+NO_GUIDELINE = {
+    "risk_label": "Unknown",
+    "severity": "low",
+    "recommendation": "No CPIC guideline available for this genotype.",
+}
+
+NO_CALL_GUIDELINE = {
+    "risk_label": "Unknown",
+    "severity": "low",
+    "recommendation": "Genotype not called for this gene (no-call in VCF); re-genotype before prescribing.",
+}
+
+
+class CPICTableError(RuntimeError):
+    """
+    Raised when the CPIC JSON files are incomplete or inconsistent.
+    """
+
+
+def star_sort_key(star: str) -> float:
+    """
+    Numeric part of a star allele, so *1/*17 sorts before *17/*1
+    (not the raw alphabetical order).
+    """
+    # Strip leading '*' and extract numeric prefix for sorting
+    numeric = ''.join(filter(lambda c: c.isdigit() or c == '.', star.lstrip('*')))
+    try:
+        return float(numeric) if numeric else 0
+    except ValueError:
+        return 0
+
+
+def knowledge_base_digest(drug_gene_map: Dict, phenotype_map: Dict, drug_guidelines: Dict) -> str:
+    """
+    Short content hash of the three CPIC files (formatting-insensitive).
+    """
+    canonical = json.dumps(
+        [drug_gene_map, phenotype_map, drug_guidelines], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class CompiledCPICTables:
+    """
+    Load-time compilation of drug_gene_map.json, gene_phenotypes.json and
+    drug_guidelines.json into one flat table:
+
+        (drug, gene, canonical diplotype) -> finished evaluation dict
+
+    All keys are interned strings / tuples, so evaluating a gene is a
+    couple of dict lookups. Returned evaluation dicts are shared between
+    calls and must be treated as read-only.
+    """
+
+    def __init__(self, drug_gene_map: Dict, phenotype_map: Dict, drug_guidelines: Dict):
+        self.problems = self.validate(drug_gene_map, phenotype_map, drug_guidelines)
+        if self.problems:
+            raise CPICTableError(
+                "Inconsistent CPIC data files:\n- " + "\n- ".join(self.problems)
+            )
+
+        intern = sys.intern
+        self._star_keys: Dict[str, Tuple[float, str]] = {}
+
+        # drug -> genes it depends on
+        self.drug_genes: Dict[str, Tuple[str, ...]] = {
+            intern(drug): tuple(intern(gene) for gene in genes)
+            for drug, genes in drug_gene_map.items()
+        }
+
+        # gene -> canonical diplotype -> (diplotype string as published, phenotype)
+        self.phenotypes: Dict[str, Dict[Diplotype, Tuple[str, str]]] = {}
+        for gene, diplotypes in phenotype_map.items():
+            compiled = {}
+            for diplotype_str, phenotype in diplotypes.items():
+                canonical = self.canonical_diplotype(diplotype_str.split("/"))
+                canonical_str = f"{canonical[0]}/{canonical[1]}"
+
+                # Prefer the canonical spelling when the file has both orders
+                published = canonical_str if canonical_str in diplotypes else diplotype_str
+                compiled[canonical] = (intern(published), intern(phenotype))
+            self.phenotypes[intern(gene)] = compiled
+
+        self.evaluations: Dict[Tuple[str, str, Diplotype], Dict] = {}
+        self.no_variant: Dict[Tuple[str, str], Dict] = {}
+        self.no_call: Dict[Tuple[str, str], Dict] = {}
+
+        for drug, genes in self.drug_genes.items():
+            guidelines = drug_guidelines.get(drug, {})
+            for gene in genes:
+                self.no_variant[(drug, gene)] = {
+                    "gene": gene,
+                    "diplotype": "Unknown",
+                    "phenotype": "Unknown",
+                    "drug": drug,
+                    "risk_label": "Unknown",
+                    "recommendation": "No variant detected for this gene.",
+                }
+                self.no_call[(drug, gene)] = self._evaluation(
+                    drug, gene, "Unknown", "Unknown", NO_CALL_GUIDELINE
+                )
+
+                for canonical, (published, phenotype) in self.phenotypes[gene].items():
+                    self.evaluations[(drug, gene, canonical)] = self._evaluation(
+                        drug, gene, published, phenotype, guidelines.get(phenotype, NO_GUIDELINE)
+                    )
+
+        # Raw drug input -> canonical key, grows as new spellings are seen
+        # (bounded: casing/spacing variants come straight from requests)
+        self._drug_keys: Dict[str, str] = {drug: drug for drug in self.drug_genes}
+
+        # Diplotypes missing from gene_phenotypes.json, filled on demand
+        self._unmatched: Dict[Tuple[str, str, Diplotype], Dict] = {}
+
+    # -----------------------------
+    # Validation
+    # -----------------------------
+    @staticmethod
+    def validate(drug_gene_map: Dict, phenotype_map: Dict, drug_guidelines: Dict) -> List[str]:
+        """
+        Returns every completeness/consistency problem found (empty = OK).
+        """
+        problems = []
+
+        for gene, diplotypes in phenotype_map.items():
+            seen: Dict[Diplotype, Tuple[str, str]] = {}
+            for diplotype_str, phenotype in diplotypes.items():
+                alleles = diplotype_str.split("/")
+                if len(alleles) != 2 or not all(alleles):
+                    problems.append(f"{gene}: malformed diplotype '{diplotype_str}'")
+                    continue
+
+                if phenotype not in KNOWN_PHENOTYPES:
+                    problems.append(f"{gene} {diplotype_str}: unknown phenotype '{phenotype}'")
+
+                canonical = CompiledCPICTables.canonical_diplotype(alleles)
+                previous = seen.get(canonical)
+                if previous is not None and previous[1] != phenotype:
+                    problems.append(
+                        f"{gene}: {previous[0]} is {previous[1]} but {diplotype_str} is {phenotype}"
+                    )
+                seen[canonical] = (diplotype_str, phenotype)
+
+        for drug, genes in drug_gene_map.items():
+            guidelines = drug_guidelines.get(drug)
+            if guidelines is None:
+                problems.append(f"{drug}: no entry in drug_guidelines.json")
+                continue
+
+            for gene in genes:
+                if gene not in phenotype_map:
+                    problems.append(f"{drug}: gene {gene} missing from gene_phenotypes.json")
+                    continue
+
+                for phenotype in sorted(set(phenotype_map[gene].values())):
+                    if phenotype not in guidelines:
+                        problems.append(f"{drug}: no guideline for {gene} phenotype {phenotype}")
+
+            for phenotype, guideline in guidelines.items():
+                missing = [field for field in REQUIRED_GUIDELINE_FIELDS if field not in guideline]
+                if missing:
+                    problems.append(f"{drug} {phenotype}: guideline missing {', '.join(missing)}")
+
+        for drug in drug_guidelines:
+            if drug not in drug_gene_map:
+                problems.append(f"{drug}: guideline has no entry in drug_gene_map.json")
+
+        return problems
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def star_order(self, star: str) -> Tuple[float, str]:
+        key = self._star_keys.get(star)
+        if key is None:
+            if len(self._star_keys) >= MAX_UNMATCHED_ENTRIES:
+                self._star_keys.clear()
+            key = self._star_keys[star] = (star_sort_key(star), star)
+        return key
+
+    @staticmethod
+    def canonical_diplotype(stars: Sequence[str]) -> Diplotype:
+        """
+        First two alleles in (numeric, alphabetical) order; a single allele
+        is treated as homozygous.
+        """
+        if len(stars) == 1:
+            return (stars[0], stars[0])
+
+        ordered = sorted(stars, key=lambda s: (star_sort_key(s), s))
+        return (ordered[0], ordered[1])
+
+    def normalize_drug(self, drug_name: str) -> str:
+        drug_key = self._drug_keys.get(drug_name)
+        if drug_key is None:
+            drug_key = drug_name.upper().strip()
+            if drug_key in self.drug_genes:
+                if len(self._drug_keys) >= MAX_UNMATCHED_ENTRIES:
+                    self._drug_keys = {drug: drug for drug in self.drug_genes}
+                self._drug_keys[drug_name] = drug_key
+        return drug_key
+
+    def lookup(self, drug: str, gene: str, stars: Optional[Sequence[str]]) -> Dict:
+        """
+        Evaluation for one (drug, gene) given the star alleles found.
+        """
+        if not stars:
+            return self.no_variant[(drug, gene)]
+
+        if len(stars) == 1:
+            diplotype = (stars[0], stars[0])
+        elif len(stars) == 2:
+            a, b = stars
+            diplotype = (a, b) if self.star_order(a) <= self.star_order(b) else (b, a)
+        else:
+            first, second = sorted(stars, key=self.star_order)[:2]
+            diplotype = (first, second)
+
+        key = (drug, gene, diplotype)
+        evaluation = self.evaluations.get(key)
+        if evaluation is None:
+            evaluation = self._unmatched.get(key)
+            if evaluation is None:
+                # Star names come from uploads — keep this memo bounded
+                if len(self._unmatched) >= MAX_UNMATCHED_ENTRIES:
+                    self._unmatched.clear()
+                evaluation = self._unmatched[key] = self._evaluation(
+                    drug, gene, f"{diplotype[0]}/{diplotype[1]}", "Unknown", NO_GUIDELINE
+                )
+        return evaluation
+
+    def ambiguous(self, drug: str, gene: str, stars: Tuple[str, ...]) -> Dict:
+        """
+        Evaluation for a gene whose star alleles don't fit two haplotypes.
+        """
+        key = (drug, gene, stars)
+        evaluation = self._unmatched.get(key)
+        if evaluation is None:
+            if len(self._unmatched) >= MAX_UNMATCHED_ENTRIES:
+                self._unmatched.clear()
+            evaluation = self._unmatched[key] = self._evaluation(
+                drug, gene, "Indeterminate", "Unknown", {
+                    "risk_label": "Unknown",
+                    "severity": "low",
+                    "recommendation": (
+                        f"Star alleles {', '.join(stars)} cannot be resolved to a "
+                        "diplotype; review the genotype manually."
+                    ),
+                }
+            )
+        return evaluation
+
+    @staticmethod
+    def _evaluation(drug: str, gene: str, diplotype: str, phenotype: str, drug_info: Dict) -> Dict:
+        return {
+            "gene": gene,
+            "diplotype": diplotype,
+            "phenotype": phenotype,
+            "drug": drug,
+            "risk_label": drug_info.get("risk_label", "Unknown"),
+            "severity": drug_info.get("severity", "low"),
+            "recommendation": drug_info.get("recommendation"),
+        }
@@ -0,0 +1,230 @@
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from services.cpic_tables import star_sort_key
+from services.variant_record import VariantRecord
+
+
+# -----------------------------
+# GT Codes
+# -----------------------------
+# A GT string is reduced to a bitmask over the two haplotypes, so the
+# calls of every row of a gene combine with a plain OR:
+#   HAP0 / HAP1   phased het, alternate allele on the first / second haplotype
+#   HOM           alternate allele on both haplotypes
+#   HET           unphased het, haplotype unknown
+#   UNTYPED       star tag without any GT (sites-only VCF)
+#   NO_CALL       './.' — the site was not genotyped
+#   REF           '0/0' — the site was called and carries no alternate allele
+HAP0 = 1
+HAP1 = 2
+HOM = HAP0 | HAP1
+HET = 4
+UNTYPED = 8
+NO_CALL = 16
+REF = 32
+
+ALT_BITS = HOM | HET | UNTYPED
+
+# Distinct GT strings in a file are few; bounded in case a VCF is odd
+MAX_GT_CACHE_ENTRIES = 1024
+
+REFERENCE_STAR = "*1"
+
+# GeneCall statuses
+CALLED = "called"
+NOT_CALLED = "no_call"
+AMBIGUOUS = "ambiguous"
+
+
+class GeneCall(NamedTuple):
+    """
+    Diplotype call for one gene. `diplotype` is set only when CALLED;
+    `stars` lists every star allele carried, for review of AMBIGUOUS calls.
+    """
+
+    status: str
+    diplotype: Optional[Tuple[str, str]]
+    stars: Tuple[str, ...]
+
+
+NO_CALL_RESULT = GeneCall(NOT_CALLED, None, ())
+
+
+class DiplotypeCaller:
+    """
+    Genotype-aware star-allele diplotype caller.
+
+    Every star-tagged row of a gene is folded into a per-star bitmask in a
+    single pass, then resolved once per gene:
+    - homozygous (1/1) alleles sit on both haplotypes, 0/0 rows count as
+      called reference, './.' rows carry no information
+    - phased hets ('0|1') go to their haplotype; unphased hets fill the
+      emptier haplotype (assumed in trans)
+    - an empty haplotype is the reference star (*1)
+    - more than one star on a haplotype has no published allele here, so
+      the gene is reported AMBIGUOUS rather than silently truncated
+
+    Phased GTs of a gene are assumed to share one phase set. GT parsing
+    and resolution are memoized, so cohorts cost a few dict lookups per
+    sample and row.
+    """
+
+    _gt_codes: Dict[str, int] = {}
+    _resolved: Dict[Tuple, GeneCall] = {}
+
+    # -----------------------------
+    # GT Parsing
+    # -----------------------------
+    @staticmethod
+    def parse_gt(genotype: Optional[str]) -> int:
+        """
+        GT string -> code ('0/1' -> HET, '1|0' -> HAP0, '1/1' -> HOM,
+        '0/0' -> REF, './.' -> NO_CALL, None -> UNTYPED).
+        """
+        if genotype is None:
+            return UNTYPED
+
+        codes = DiplotypeCaller._gt_codes
+        code = codes.get(genotype)
+        if code is not None:
+            return code
+
+        phased = '|' in genotype
+        alleles = genotype.replace('|', '/').split('/')
+        carried = [allele not in ('0', '.', '') for allele in alleles]
+
+        if all(allele in ('.', '') for allele in alleles):
+            code = NO_CALL
+        elif not any(carried):
+            code = REF
+        elif len(alleles) == 1 or all(carried):
+            # Haploid alt calls are read as homozygous, like untyped tags
+            code = HOM
+        elif phased:
+            code = HAP0 if carried[0] else HAP1
+        else:
+            code = HET
+
+        if len(codes) >= MAX_GT_CACHE_ENTRIES:
+            codes.clear()
+        codes[genotype] = code
+        return code
+
+    # -----------------------------
+    # Calling
+    # -----------------------------
+    @staticmethod
+    def call_sample(variants: Iterable[VariantRecord]) -> Dict[str, GeneCall]:
+        """
+        gene -> GeneCall for one sample, from each record's own GT
+        (`genotype`, None for sites-only input).
+        """
+        parse_gt = DiplotypeCaller.parse_gt
+        genes: Dict[str, Dict[str, int]] = {}
+
+        for variant in variants:
+            star = variant.star_allele
+            if not star:
+                continue
+
+            states = genes.get(variant.primary_gene)
+            if states is None:
+                states = genes[variant.primary_gene] = {}
+            states[star] = states.get(star, 0) | parse_gt(variant.genotype)
+
+        resolve = DiplotypeCaller.resolve
+        return {gene: resolve(states) for gene, states in genes.items()}
+
+    @staticmethod
+    def call_cohort(
+        variants: Iterable[VariantRecord], sample_ids: Sequence[str]
+    ) -> Dict[str, Dict[str, GeneCall]]:
+        """
+        sample_id -> gene -> GeneCall for records parsed with_genotypes,
+        in one pass over the rows (no per-sample record copies).
+        """
+        parse_gt = DiplotypeCaller.parse_gt
+        sample_count = len(sample_ids)
+
+        # gene -> per-sample {star: mask}
+        genes: Dict[str, List[Dict[str, int]]] = {}
+
+        for variant in variants:
+            star = variant.star_allele
+            if not star or not variant.genotypes:
+                continue
+
+            per_sample = genes.get(variant.primary_gene)
+            if per_sample is None:
+                per_sample = genes[variant.primary_gene] = [{} for _ in range(sample_count)]
+
+            for states, genotype in zip(per_sample, variant.genotypes):
+                states[star] = states.get(star, 0) | parse_gt(genotype)
+
+        resolve = DiplotypeCaller.resolve
+        calls = {sample_id: {} for sample_id in sample_ids}
+
+        for gene, per_sample in genes.items():
+            for sample_id, states in zip(sample_ids, per_sample):
+                if states:
+                    calls[sample_id][gene] = resolve(states)
+
+        return calls
+
+    # -----------------------------
+    # Resolution
+    # -----------------------------
+    @staticmethod
+    def resolve(states: Dict[str, int]) -> GeneCall:
+        """
+        Diplotype from one gene's star -> OR-ed GT code map.
+        """
+        key = tuple(sorted(states.items()))
+        call = DiplotypeCaller._resolved.get(key)
+        if call is None:
+            if len(DiplotypeCaller._resolved) >= MAX_GT_CACHE_ENTRIES:
+                DiplotypeCaller._resolved.clear()
+            call = DiplotypeCaller._resolved[key] = DiplotypeCaller._resolve(key)
+        return call
+
+    @staticmethod
+    def _resolve(states: Tuple[Tuple[str, int], ...]) -> GeneCall:
+        ordered = sorted(states, key=lambda item: (star_sort_key(item[0]), item[0]))
+        carried = tuple(sys.intern(star) for star, mask in ordered if mask & ALT_BITS)
+
+        if not carried:
+            # Only 0/0 and './.' rows: reference if any site was called
+            if any(mask & REF for _, mask in ordered):
+                return GeneCall(CALLED, (REFERENCE_STAR, REFERENCE_STAR), ())
+            return NO_CALL_RESULT
+
+        # Sites-only input: the legacy reading of tags (one tag = homozygous)
+        if all(mask & ALT_BITS == UNTYPED for _, mask in ordered if mask & ALT_BITS):
+            if len(carried) == 1:
+                return GeneCall(CALLED, (carried[0], carried[0]), carried)
+            if len(carried) == 2:
+                return GeneCall(CALLED, (carried[0], carried[1]), carried)
+            return GeneCall(AMBIGUOUS, None, carried)
+
+        haplotypes: Tuple[List[str], List[str]] = ([], [])
+        floating = []
+
+        for star, mask in ordered:
+            if mask & HAP0:
+                haplotypes[0].append(star)
+            if mask & HAP1:
+                haplotypes[1].append(star)
+            if not mask & HOM and mask & (HET | UNTYPED):
+                floating.append(star)
+
+        for star in floating:
+            shorter = 0 if len(haplotypes[0]) <= len(haplotypes[1]) else 1
+            haplotypes[shorter].append(star)
+
+        if len(haplotypes[0]) > 1 or len(haplotypes[1]) > 1:
+            return GeneCall(AMBIGUOUS, None, carried)
+
+        first = sys.intern(haplotypes[0][0]) if haplotypes[0] else REFERENCE_STAR
+        second = sys.intern(haplotypes[1][0]) if haplotypes[1] else REFERENCE_STAR
+        return GeneCall(CALLED, (first, second), carried)
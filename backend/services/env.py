@@ -0,0 +1,27 @@
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """
+    Loads .env into os.environ once per process (the first found from the
+    working directory up, else backend/.env); later calls are no-ops.
+    Existing environment variables always win.
+    """
+    global _loaded
+    if _loaded:
+        return
+
+    with _lock:
+        if _loaded:
+            return
+
+        from dotenv import find_dotenv, load_dotenv
+
+        load_dotenv(find_dotenv(usecwd=True) or os.path.join(BASE_DIR, ".env"))
+        _loaded = True
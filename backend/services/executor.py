@@ -0,0 +1,213 @@
+import os
+import asyncio
+import threading
+import functools
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from services.vcf_parcer import VCFStreamParser, PooledVCFStreamParser
+
+
+# -----------------------------
+# Pool Configuration (env overridable, per uvicorn worker)
+# -----------------------------
+# Pools belong to one uvicorn worker process, so total capacity is
+# workers x pool size — tune `uvicorn --workers` and these independently.
+PIPELINE_THREADS = int(os.getenv("PIPELINE_THREADS", "8"))
+
+# 0 disables the process pool; blocks are then parsed on the thread pool
+PIPELINE_PROCESSES = int(os.getenv("PIPELINE_PROCESSES", str(min(2, os.cpu_count() or 1))))
+
+# Requests allowed inside the pipeline at once; more get HTTP 503
+PIPELINE_MAX_PENDING = int(os.getenv("PIPELINE_MAX_PENDING", "64"))
+
+# Uploads at least this large are parsed in worker processes
+PROCESS_PARSE_THRESHOLD_BYTES = int(os.getenv("PROCESS_PARSE_THRESHOLD_MB", "8")) * 1024 * 1024
+
+PARSE_BLOCK_BYTES = int(os.getenv("PARSE_BLOCK_KB", "1024")) * 1024
+
+# Parse blocks in flight per upload before reading more of it
+PARSE_WINDOW = int(os.getenv("PARSE_WINDOW", "4"))
+
+
+class PipelineSaturatedError(RuntimeError):
+    """
+    Raised when PIPELINE_MAX_PENDING requests are already being processed.
+    """
+
+
+class PipelineExecutor:
+    """
+    Runs the blocking pipeline stages (VCF parsing, rule engine, response
+    building) off the event loop:
+
+    - a thread pool for short CPU work and blocking I/O (tabix seeks)
+    - a process pool for parsing large uploads, which would otherwise
+      hold the GIL for the whole file
+
+    Pools are created on first use. admit() bounds how many requests are
+    in the pipeline; past that callers are rejected instead of queued.
+    """
+
+    def __init__(
+        self,
+        threads: int = PIPELINE_THREADS,
+        processes: int = PIPELINE_PROCESSES,
+        max_pending: int = PIPELINE_MAX_PENDING,
+    ):
+        self.threads = threads
+        self.processes = processes
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Admission Control
+    # -----------------------------
+    @contextmanager
+    def admit(self):
+        """
+        Holds one pipeline slot for the duration of the block.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PipelineSaturatedError(
+                    f"Server busy: {self.pending} analyses in progress, retry shortly."
+                )
+            self.pending += 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    # -----------------------------
+    # Pools
+    # -----------------------------
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.threads, thread_name_prefix="pipeline"
+                    )
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.processes <= 0:
+            return None
+
+        if self._process_pool is None:
+            with self._lock:
+                if self._process_pool is None:
+                    # spawn: forking a process that runs an event loop and
+                    # open sockets is unsafe
+                    self._process_pool = ProcessPoolExecutor(
+                        max_workers=self.processes,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._process_pool
+
+    def submit_thread(self, fn: Callable, *args) -> Future:
+        return self.thread_pool.submit(fn, *args)
+
+    def submit_process(self, fn: Callable, *args) -> Future:
+        """
+        Runs a picklable, module-level fn in a worker process (or on the
+        thread pool when processes are disabled).
+        """
+        pool = self.process_pool
+        if pool is None:
+            return self.submit_thread(fn, *args)
+        return pool.submit(fn, *args)
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, functools.partial(fn, *args, **kwargs))
+
+    async def run_in_process(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit_process(fn, *args))
+
+    # -----------------------------
+    # Parsing
+    # -----------------------------
+    def stream_parser(self, upload_size: Optional[int] = None, **kwargs) -> VCFStreamParser:
+        """
+        Stream parser whose data lines are parsed on the pools: worker
+        processes for uploads past PROCESS_PARSE_THRESHOLD_BYTES (or of
+        unknown size), the thread pool otherwise.
+        """
+        large = upload_size is None or upload_size >= PROCESS_PARSE_THRESHOLD_BYTES
+        submit = self.submit_process if large else self.submit_thread
+
+        return PooledVCFStreamParser(
+            submit, block_bytes=PARSE_BLOCK_BYTES, window=PARSE_WINDOW, **kwargs
+        )
+
+    # -----------------------------
+    # Introspection / Shutdown
+    # -----------------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "threads": self.threads,
+                "processes": self.processes,
+                "process_pool_started": self._process_pool is not None,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+            process_pool, self._process_pool = self._process_pool, None
+
+        if thread_pool is not None:
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+        if process_pool is not None:
+            process_pool.shutdown(wait=True, cancel_futures=True)
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_executor: Optional[PipelineExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_pipeline_executor() -> PipelineExecutor:
+    """
+    Shared executor configured from PIPELINE_* environment variables.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = PipelineExecutor()
+    return _executor
+
+
+def shutdown_pipeline_executor() -> None:
+    """
+    Stops the worker pools (call on shutdown).
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
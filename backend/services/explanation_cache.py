@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+# -----------------------------
+# Cache Configuration (env overridable)
+# -----------------------------
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Empty path keeps the cache memory-only
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "")
+LLM_CACHE_MAX_DB_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DB_ENTRIES", "100000"))
+
+# Only these fields reach the prompt, so only they define the key
+KEY_EVALUATION_FIELDS = ("gene", "diplotype", "phenotype", "risk_label", "recommendation")
+
+
+class ExplanationCache:
+    """
+    Content-addressed cache for LLM explanations.
+
+    Tier 0: preloaded (precomputed) entries — never evicted or expired.
+    Tier 1: in-process LRU (OrderedDict) with TTL.
+    Tier 2: optional SQLite file that survives restarts, pruned by TTL and
+            by row count (least recently used rows go first).
+
+    Thread-safe; values are JSON-serializable dicts.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = None,
+        max_db_entries: int = LLM_CACHE_MAX_DB_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_db_entries = max_db_entries
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._static: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.static_hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db = None
+        self._db_writes = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS explanations ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_explanations_accessed ON explanations(accessed_at)"
+            )
+            self._db.commit()
+
+    # -----------------------------
+    # Key Derivation
+    # -----------------------------
+    @staticmethod
+    def make_key(rule_engine_output: Dict, model: str, temperature: float, prompt_version: str) -> str:
+        """
+        SHA-256 over a canonical JSON of everything the prompt depends on.
+        """
+        payload = {
+            "drug": rule_engine_output.get("drug"),
+            "evaluations": [
+                {field: evaluation.get(field) for field in KEY_EVALUATION_FIELDS}
+                for evaluation in rule_engine_output.get("evaluations", [])
+            ],
+            "model": model,
+            "temperature": temperature,
+            "prompt_version": prompt_version,
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    # -----------------------------
+    # Get / Set
+    # -----------------------------
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+
+        with self._lock:
+            static = self._static.get(key)
+            if static is not None:
+                self.hits += 1
+                self.static_hits += 1
+                return dict(static)
+
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return dict(value)
+
+                del self._memory[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM explanations WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is not None:
+                    value_json, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._db.execute(
+                            "UPDATE explanations SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+
+                        value = json.loads(value_json)
+                        self._remember(key, value, created_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return dict(value)
+
+                    self._db.execute("DELETE FROM explanations WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict) -> None:
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, dict(value), now)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO explanations (key, value, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now),
+                )
+                self._db_writes += 1
+
+                # Pruning is a table scan — amortize it over many writes
+                if self._db_writes % 256 == 0:
+                    self._prune_db(now)
+                self._db.commit()
+
+    def preload(self, entries: Dict[str, Dict]) -> int:
+        """
+        Installs precomputed explanations (key -> explanation) that stay
+        resident for the life of the process. Returns the count loaded.
+        """
+        with self._lock:
+            self._static.update(entries)
+            return len(entries)
+
+    def _remember(self, key: str, value: Dict, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_db(self, now: float) -> None:
+        self._db.execute("DELETE FROM explanations WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM explanations WHERE key IN ("
+            " SELECT key FROM explanations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_db_entries,),
+        )
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "static_hits": self.static_hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "static_entries": len(self._static),
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM explanations")
+                self._db.commit()
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_cache: Optional[ExplanationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_explanation_cache() -> ExplanationCache:
+    """
+    Shared cache configured from LLM_CACHE_* environment variables.
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExplanationCache(db_path=LLM_CACHE_DB or None)
+    return _cache
@@ -0,0 +1,189 @@
+"""
+Offline precomputation of LLM explanations.
+
+Walks every (drug, gene, diplotype, phenotype) combination reachable from
+the CPIC data files, generates the explanation for each with bounded
+concurrency and writes a versioned artifact the backend preloads at
+startup, so known genotypes never hit the LLM on the request path.
+
+Usage (from backend/):
+    python -m services.explanation_precompute --concurrency 4
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import itertools
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from services.rule_engine import CPICRuleEngine
+from services.explanation_cache import ExplanationCache
+from services.llm_service import PharmaGuardLLMService, PROMPT_VERSION
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+DEFAULT_ARTIFACT_PATH = os.path.join(CPICRuleEngine.DATA_DIR, "precomputed_explanations.json")
+
+
+# -----------------------------
+# Combination Enumeration
+# -----------------------------
+def iter_engine_outputs() -> Iterator[Dict]:
+    """
+    Every rule-engine output evaluate() can produce for a supported drug:
+    the cartesian product, over the drug's genes, of each known diplotype
+    plus the "no variant detected" and "no-call" rows.
+    """
+    tables = CPICRuleEngine.snapshot().tables
+
+    for drug, genes in tables.drug_genes.items():
+        per_gene_rows = []
+        for gene in genes:
+            rows = [
+                evaluation
+                for (row_drug, row_gene, _), evaluation in tables.evaluations.items()
+                if row_drug == drug and row_gene == gene
+            ]
+            rows.append(tables.no_variant[(drug, gene)])
+            rows.append(tables.no_call[(drug, gene)])
+            per_gene_rows.append(rows)
+
+        for combination in itertools.product(*per_gene_rows):
+            yield {"drug": drug, "evaluations": list(combination)}
+
+
+# -----------------------------
+# Generation
+# -----------------------------
+async def precompute(service: PharmaGuardLLMService, concurrency: int, attempts: int = 3) -> Dict[str, Dict]:
+    """
+    Generates explanations for every combination; returns cache key ->
+    explanation. Combinations that never yield valid JSON are left out
+    (they fall back to live generation at request time).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    engine_outputs = list(iter_engine_outputs())
+
+    async def generate(engine_output: Dict) -> Optional[Dict]:
+        async with semaphore:
+            for attempt in range(1, attempts + 1):
+                try:
+                    content = await service.request_completion(
+                        engine_output["drug"], engine_output["evaluations"]
+                    )
+                except Exception as e:
+                    logger.warning("LLM error for %s (attempt %d): %s", engine_output["drug"], attempt, e)
+                    continue
+
+                parsed = service.parse_structured(content)
+                if parsed is not None:
+                    return parsed
+            return None
+
+    results = await asyncio.gather(*(generate(output) for output in engine_outputs))
+
+    entries = {}
+    for engine_output, explanation in zip(engine_outputs, results):
+        if explanation is None:
+            genes = ", ".join(f"{e['gene']} {e['diplotype']}" for e in engine_output["evaluations"])
+            logger.warning("Skipped %s (%s): no valid explanation", engine_output["drug"], genes)
+            continue
+        entries[service.cache_key(engine_output)] = explanation
+
+    logger.info("Generated %d/%d explanations", len(entries), len(engine_outputs))
+    return entries
+
+
+def write_artifact(path: str, entries: Dict[str, Dict], service: PharmaGuardLLMService) -> None:
+    """
+    Atomically writes the versioned artifact.
+    """
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "generated_at": datetime.utcnow().isoformat(),
+        "knowledge_base_version": CPICRuleEngine.snapshot().version,
+        "model": service.model,
+        "temperature": service.temperature,
+        "prompt_version": PROMPT_VERSION,
+        "entries": entries,
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# -----------------------------
+# Startup Loading
+# -----------------------------
+def load_artifact(path: str, cache: ExplanationCache) -> int:
+    """
+    Preloads a precomputed artifact into the cache; returns the number of
+    entries loaded. Entries are keyed by the full cache key (model,
+    temperature and prompt version included), so entries from a stale
+    artifact simply never match.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            artifact = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("Could not read precomputed explanations at %s: %s", path, e)
+        return 0
+
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        logger.warning("Ignoring precomputed explanations with unknown format %s", artifact.get("format"))
+        return 0
+
+    if artifact.get("knowledge_base_version") != CPICRuleEngine.snapshot().version:
+        logger.info("Precomputed explanations were built for another knowledge base version")
+
+    return cache.preload(artifact.get("entries", {}))
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=DEFAULT_ARTIFACT_PATH, help="artifact path")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel LLM requests")
+    parser.add_argument("--attempts", type=int, default=3, help="tries per combination")
+    parser.add_argument("--dry-run", action="store_true", help="only list the combinations")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+
+    if args.dry_run:
+        for engine_output in iter_engine_outputs():
+            rows = ", ".join(f"{e['gene']} {e['diplotype']} ({e['phenotype']})" for e in engine_output["evaluations"])
+            print(f"{engine_output['drug']}: {rows}")
+        return 0
+
+    async def run() -> int:
+        service = PharmaGuardLLMService(max_concurrency=args.concurrency, cache=ExplanationCache(max_entries=0))
+        if service.client is None:
+            logger.error(service.client_error)
+            return 1
+
+        try:
+            entries = await precompute(service, args.concurrency, args.attempts)
+        finally:
+            await service.aclose()
+
+        write_artifact(args.out, entries, service)
+        logger.info("Wrote %s", args.out)
+        return 0
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+
+# -----------------------------
+# Telegram Scheduling (env overridable, per bot process)
+# -----------------------------
+# Analyses running at once across all chats
+TELEGRAM_MAX_RUNNING = int(os.getenv("TELEGRAM_MAX_RUNNING", "8"))
+
+# Analyses one user may have running / waiting at once
+TELEGRAM_MAX_RUNNING_PER_USER = int(os.getenv("TELEGRAM_MAX_RUNNING_PER_USER", "1"))
+TELEGRAM_MAX_QUEUED_PER_USER = int(os.getenv("TELEGRAM_MAX_QUEUED_PER_USER", "1"))
+
+# Analyses waiting across all chats; more are turned away
+TELEGRAM_MAX_QUEUED = int(os.getenv("TELEGRAM_MAX_QUEUED", "500"))
+
+
+class SchedulerFullError(RuntimeError):
+    """
+    Raised when the global queue or the caller's own quota is full.
+    """
+
+
+class FairScheduler:
+    """
+    Bounded concurrency with round-robin fairness between owners (users,
+    chats): at most max_running slots overall and max_running_per_owner
+    per owner. Freed slots go to the next owner in rotation that is under
+    its cap, so one user queuing several analyses cannot starve the rest;
+    each owner's own requests are served in order.
+
+    Waiters are futures on the caller's event loop — use an instance from
+    one loop only.
+    """
+
+    def __init__(
+        self,
+        max_running: int = TELEGRAM_MAX_RUNNING,
+        max_running_per_owner: int = TELEGRAM_MAX_RUNNING_PER_USER,
+        max_queued: int = TELEGRAM_MAX_QUEUED,
+        max_queued_per_owner: int = TELEGRAM_MAX_QUEUED_PER_USER,
+    ):
+        self.max_running = max_running
+        self.max_running_per_owner = max_running_per_owner
+        self.max_queued = max_queued
+        self.max_queued_per_owner = max_queued_per_owner
+
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        self.completed = 0
+
+        self._running: Dict[Hashable, int] = {}
+        # Rotation order: owners with waiters, next to be served first
+        self._waiting: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+    # -----------------------------
+    # Acquire / Release
+    # -----------------------------
+    @asynccontextmanager
+    async def slot(self, owner: Hashable, on_queued: Optional[Callable[[int], Awaitable]] = None):
+        """
+        Holds one slot for `owner` for the duration of the block. When the
+        caller has to wait, on_queued(ahead) is awaited first with the
+        number of analyses queued before it.
+        """
+        await self.acquire(owner, on_queued)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+    async def acquire(self, owner: Hashable, on_queued: Optional[Callable[[int], Awaitable]] = None) -> None:
+        if owner not in self._waiting and self._can_run(owner):
+            self._start(owner)
+            return
+
+        waiters = self._waiting.get(owner)
+        own = self._running.get(owner, 0) + (len(waiters) if waiters else 0)
+        if own >= self.max_running_per_owner + self.max_queued_per_owner:
+            self.rejected += 1
+            raise SchedulerFullError("You already have an analysis in progress. Please wait for it to finish.")
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise SchedulerFullError(f"Server busy: {self.queued} analyses waiting, retry shortly.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(owner, deque()).append(waiter)
+        ahead = self.queued
+        self.queued += 1
+
+        try:
+            if on_queued is not None:
+                await on_queued(ahead)
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Granted while we were being cancelled: hand the slot on
+                self.release(owner)
+            else:
+                waiter.cancel()
+                self._discard(owner, waiter)
+            raise
+
+    def release(self, owner: Hashable) -> None:
+        self.running -= 1
+        self.completed += 1
+        remaining = self._running[owner] - 1
+        if remaining:
+            self._running[owner] = remaining
+        else:
+            del self._running[owner]
+        self._dispatch()
+
+    # -----------------------------
+    # Internals
+    # -----------------------------
+    def _can_run(self, owner: Hashable) -> bool:
+        return (
+            self.running < self.max_running
+            and self._running.get(owner, 0) < self.max_running_per_owner
+        )
+
+    def _start(self, owner: Hashable) -> None:
+        self.running += 1
+        self._running[owner] = self._running.get(owner, 0) + 1
+
+    def _dispatch(self) -> None:
+        """
+        Grants free slots to waiting owners in round-robin order.
+        """
+        while self.running < self.max_running:
+            owner = next((owner for owner in self._waiting if self._can_run(owner)), None)
+            if owner is None:
+                return
+
+            waiters = self._waiting.pop(owner)
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                # Back of the rotation: everyone else goes first next time
+                self._waiting[owner] = waiters
+
+            if waiter.cancelled():
+                # Caller went away; acquire() finds it already dequeued
+                continue
+            self._start(owner)
+            waiter.set_result(None)
+
+    def _discard(self, owner: Hashable, waiter: asyncio.Future) -> None:
+        waiters = self._waiting.get(owner)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        self.queued -= 1
+        if not waiters:
+            del self._waiting[owner]
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "max_running": self.max_running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "waiting_owners": len(self._waiting),
+            "rejected": self.rejected,
+            "completed": self.completed,
+        }
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_telegram_scheduler: Optional[FairScheduler] = None
+
+
+def get_telegram_scheduler() -> FairScheduler:
+    """
+    Shared scheduler for bot analyses, configured from TELEGRAM_*
+    environment variables.
+    """
+    global _telegram_scheduler
+    if _telegram_scheduler is None:
+        _telegram_scheduler = FairScheduler()
+    return _telegram_scheduler
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from services.executor import PipelineSaturatedError
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Job Configuration (env overridable, per uvicorn worker)
+# -----------------------------
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# Jobs waiting for a worker; more get HTTP 503
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "256"))
+
+# Finished jobs are kept for polling until either bound is hit
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "1000"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+# Jobs that hit a saturated pipeline go back to the queue after a backoff
+# (doubling up to the max); past the retries they fail with a retryable 503
+JOB_SATURATED_RETRIES = int(os.getenv("JOB_SATURATED_RETRIES", "5"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "1"))
+JOB_RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_MAX_SECONDS", "30"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFullError(RuntimeError):
+    """
+    Raised when JOB_MAX_QUEUED jobs are already waiting.
+    """
+
+
+class Job:
+    """
+    One submitted analysis. `runner` is called by a worker and returns the
+    finished result: JSON-serializable, or bytes of already-serialized
+    JSON that to_json passes through untouched. It may be called again
+    when the pipeline was saturated. `cleanup` runs once the job is finished.
+    """
+
+    __slots__ = (
+        "job_id", "status", "runner", "cleanup", "result", "error", "status_code",
+        "retry_after", "attempts", "created_at", "started_at", "finished_at", "meta",
+    )
+
+    def __init__(self, runner: Callable[[], Awaitable[Union[Dict, bytes]]], meta: Optional[Dict] = None,
+                 cleanup: Optional[Callable[[], Awaitable]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.runner = runner
+        self.cleanup = cleanup
+        self.result: Union[Dict, bytes, None] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.meta = meta or {}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+            "retry_after": self.retry_after,
+            **self.meta,
+        }
+
+    def to_json(self) -> bytes:
+        """
+        to_dict as JSON bytes for polling. A serialized result is spliced
+        in as-is instead of being decoded and re-encoded on every poll.
+        """
+        status = self.to_dict()
+        result = status.pop("result")
+        if not isinstance(result, bytes):
+            result = json.dumps(result).encode("utf-8")
+        return json.dumps(status)[:-1].encode("utf-8") + b', "result": ' + result + b"}"
+
+
+class JobManager:
+    """
+    In-process job queue: an asyncio.Queue drained by a fixed number of
+    worker tasks on the app's event loop. Jobs live in memory only, so a
+    restart drops them; clients should resubmit on 404.
+
+    Retention is bounded by count and by age, finished jobs first.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_MAX_QUEUED,
+        max_retained: int = JOB_MAX_RETAINED,
+        ttl_seconds: float = JOB_TTL_SECONDS,
+        saturated_retries: int = JOB_SATURATED_RETRIES,
+    ):
+        self.workers = workers
+        self.max_retained = max_retained
+        self.ttl_seconds = ttl_seconds
+        self.saturated_retries = saturated_retries
+
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=max_queued)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self._backoffs: Set[asyncio.Task] = set()
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks + list(self._backoffs), []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -----------------------------
+    # Submit / Poll
+    # -----------------------------
+    def submit(self, runner: Callable[[], Awaitable[Union[Dict, bytes]]], meta: Optional[Dict] = None,
+               cleanup: Optional[Callable[[], Awaitable]] = None) -> Job:
+        self._prune()
+
+        job = Job(runner, meta, cleanup)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(
+                f"Job queue is full ({self._queue.maxsize} waiting), retry shortly."
+            )
+
+        self._jobs[job.job_id] = job
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    # -----------------------------
+    # Workers
+    # -----------------------------
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.attempts += 1
+
+            try:
+                job.result = await job.runner()
+                job.status = SUCCEEDED
+                self.succeeded += 1
+
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Server shut down before the job finished."
+                job.runner = job.cleanup = None
+                job.finished_at = time.time()
+                self._queue.task_done()
+                raise
+
+            except PipelineSaturatedError as e:
+                # Rejected before any work started: wait and try again
+                delay = min(
+                    JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1),
+                    JOB_RETRY_BACKOFF_MAX_SECONDS,
+                )
+                if job.attempts <= self.saturated_retries:
+                    self._queue.task_done()
+                    self._retry_later(job, delay)
+                    continue
+                self._fail(job, str(e), 503, retry_after=delay)
+
+            except Exception as e:
+                # HTTPException from the pipeline keeps its status and detail
+                status_code = getattr(e, "status_code", 500)
+                if status_code >= 500:
+                    logger.exception("Job %s failed", job.job_id)
+                self._fail(job, str(getattr(e, "detail", e)), status_code)
+
+            self._queue.task_done()
+            await self._close(job)
+
+    def _fail(self, job: Job, error: str, status_code: int, retry_after: Optional[float] = None) -> None:
+        job.status = FAILED
+        job.error = error
+        job.status_code = status_code
+        job.retry_after = retry_after
+        self.failed += 1
+
+    async def _close(self, job: Job) -> None:
+        # Drop the upload and closures as soon as the job is done
+        cleanup, job.cleanup, job.runner = job.cleanup, None, None
+        job.finished_at = time.time()
+
+        if cleanup is not None:
+            try:
+                await cleanup()
+            except Exception:
+                logger.exception("Cleanup of job %s failed", job.job_id)
+
+    def _retry_later(self, job: Job, delay: float) -> None:
+        job.status = QUEUED
+        job.started_at = None
+        self.retried += 1
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self._fail(job, "Server busy and the job queue is full, resubmit shortly.", 503, retry_after=delay)
+                await self._close(job)
+
+        task = asyncio.create_task(requeue())
+        self._backoffs.add(task)
+        task.add_done_callback(self._backoffs.discard)
+
+    # -----------------------------
+    # Retention
+    # -----------------------------
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+        # Over the cap: evict the oldest finished jobs (never queued/running ones)
+        excess = len(self._jobs) - self.max_retained
+        if excess > 0:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+                del self._jobs[job_id]
+
+    # -----------------------------
+    # Introspection
+    # -----------------------------
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queued": self._queue.maxsize,
+            "retained": len(self._jobs),
+            "workers": len(self._tasks),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "backing_off": len(self._backoffs),
+        }
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """
+    Shared manager configured from JOB_* environment variables.
+    """
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
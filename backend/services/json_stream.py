@@ -0,0 +1,201 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+# -----------------------------
+# Parser States
+# -----------------------------
+_START = 0        # before the opening '{' (skips fences / preamble)
+_KEY_OR_END = 1
+_KEY = 2
+_COLON = 3
+_VALUE = 4
+_STRING = 5
+_ESCAPE = 6
+_UNICODE = 7
+_SCALAR = 8
+_NESTED = 9
+_DONE = 10
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for the flat JSON object the LLM is asked to
+    return. Fed arbitrary text chunks, it reports the decoded contents of
+    each top-level string field as soon as the characters arrive:
+
+        stream = JSONFieldStream()
+        stream.feed('{"mechanism": "CYP2C')   -> [("mechanism", "CYP2C")]
+        stream.feed('19 \\u2192 ...')         -> [("mechanism", "19 → ...")]
+
+    Scalars (numbers, true/false/null) are reported whole once complete;
+    nested objects and arrays are skipped. Anything before the first '{'
+    (e.g. a ```json fence) and after the closing '}' is ignored.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, object] = {}
+        self.done = False
+
+        self._state = _START
+        self._key: List[str] = []
+        self._field: Optional[str] = None
+        self._hex: List[str] = []
+        self._high_surrogate: Optional[int] = None
+        self._scalar: List[str] = []
+
+        # Nested value skipping
+        self._depth = 0
+        self._nested_in_string = False
+        self._nested_escape = False
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Consumes a chunk; returns (field, decoded text) deltas in order,
+        consecutive characters of one field merged.
+        """
+        deltas: List[Tuple[str, str]] = []
+        buffer: List[str] = []
+
+        def flush():
+            if buffer:
+                piece = "".join(buffer)
+                buffer.clear()
+                self.fields[self._field] = self.fields.get(self._field, "") + piece
+                if deltas and deltas[-1][0] == self._field:
+                    deltas[-1] = (self._field, deltas[-1][1] + piece)
+                else:
+                    deltas.append((self._field, piece))
+
+        for ch in text:
+            state = self._state
+
+            if state == _STRING:
+                if ch == '"':
+                    flush()
+                    self._state = _KEY_OR_END
+                elif ch == '\\':
+                    self._state = _ESCAPE
+                else:
+                    buffer.append(ch)
+
+            elif state == _ESCAPE:
+                if ch == 'u':
+                    self._hex = []
+                    self._state = _UNICODE
+                else:
+                    buffer.append(_ESCAPES.get(ch, ch))
+                    self._state = _STRING
+
+            elif state == _UNICODE:
+                self._hex.append(ch)
+                if len(self._hex) == 4:
+                    self._state = _STRING
+                    decoded = self._decode_unicode("".join(self._hex))
+                    if decoded:
+                        buffer.append(decoded)
+
+            elif state == _START:
+                if ch == '{':
+                    self._state = _KEY_OR_END
+
+            elif state == _KEY_OR_END:
+                if ch == '"':
+                    self._key = []
+                    self._state = _KEY
+                elif ch == '}':
+                    self._finish()
+
+            elif state == _KEY:
+                if ch == '"':
+                    self._state = _COLON
+                else:
+                    self._key.append(ch)
+
+            elif state == _COLON:
+                if ch == ':':
+                    self._state = _VALUE
+
+            elif state == _VALUE:
+                if ch.isspace():
+                    continue
+                self._field = "".join(self._key)
+                if ch == '"':
+                    self.fields.setdefault(self._field, "")
+                    self._state = _STRING
+                elif ch in '{[':
+                    self._depth = 1
+                    self._nested_in_string = False
+                    self._state = _NESTED
+                else:
+                    self._scalar = [ch]
+                    self._state = _SCALAR
+
+            elif state == _SCALAR:
+                if ch == ',' or ch == '}' or ch.isspace():
+                    deltas.append(self._finish_scalar())
+                    if ch == '}':
+                        self._finish()
+                    else:
+                        self._state = _KEY_OR_END
+                else:
+                    self._scalar.append(ch)
+
+            elif state == _NESTED:
+                self._skip_nested(ch)
+
+            else:  # _DONE
+                break
+
+        if self._state in (_STRING, _ESCAPE, _UNICODE):
+            flush()
+        return deltas
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def _decode_unicode(self, hex_digits: str) -> str:
+        try:
+            code = int(hex_digits, 16)
+        except ValueError:
+            return ""
+
+        # Surrogate pairs arrive as two \uXXXX escapes
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _finish_scalar(self) -> Tuple[str, str]:
+        raw = "".join(self._scalar)
+        try:
+            self.fields[self._field] = json.loads(raw)
+        except json.JSONDecodeError:
+            self.fields[self._field] = raw
+        return (self._field, raw)
+
+    def _skip_nested(self, ch: str) -> None:
+        if self._nested_in_string:
+            if self._nested_escape:
+                self._nested_escape = False
+            elif ch == '\\':
+                self._nested_escape = True
+            elif ch == '"':
+                self._nested_in_string = False
+        elif ch == '"':
+            self._nested_in_string = True
+        elif ch in '{[':
+            self._depth += 1
+        elif ch in '}]':
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = _KEY_OR_END
+
+    def _finish(self) -> None:
+        self._state = _DONE
+        self.done = True
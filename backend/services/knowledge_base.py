@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.cpic_tables import CompiledCPICTables, knowledge_base_digest
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Knowledge Base Configuration (env overridable)
+# -----------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KB_DATA_DIR = os.getenv("KB_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Seconds between mtime checks of the CPIC files (0 = no watcher)
+KB_WATCH_INTERVAL_SECONDS = float(os.getenv("KB_WATCH_INTERVAL_SECONDS", "30"))
+
+# Versions kept in the reload history shown by GET /kb
+KB_HISTORY_SIZE = int(os.getenv("KB_HISTORY_SIZE", "10"))
+
+KB_FILES = ("drug_gene_map.json", "gene_phenotypes.json", "drug_guidelines.json")
+
+# (mtime_ns, size) per file — cheap to compare on every watcher tick
+Signature = Tuple[Tuple[int, int], ...]
+
+
+class KnowledgeBaseSnapshot:
+    """
+    One fully loaded and compiled version of the CPIC data files.
+    Never mutated after construction: requests hold on to the snapshot
+    they started with, whatever gets swapped in meanwhile.
+    """
+
+    __slots__ = (
+        "version",
+        "loaded_at",
+        "data_dir",
+        "signature",
+        "drug_gene_map",
+        "phenotype_map",
+        "drug_guidelines",
+        "tables",
+    )
+
+    def __init__(self, data_dir: str, signature: Signature, drug_gene_map: Dict,
+                 phenotype_map: Dict, drug_guidelines: Dict):
+        self.data_dir = data_dir
+        self.signature = signature
+        self.drug_gene_map = drug_gene_map
+        self.phenotype_map = phenotype_map
+        self.drug_guidelines = drug_guidelines
+
+        # Validated, precomputed diplotype -> phenotype -> guideline table
+        self.tables = CompiledCPICTables(drug_gene_map, phenotype_map, drug_guidelines)
+        self.version = knowledge_base_digest(drug_gene_map, phenotype_map, drug_guidelines)
+        self.loaded_at = time.time()
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "drugs": len(self.drug_gene_map),
+            "genes": len(self.phenotype_map),
+        }
+
+
+class KnowledgeBase:
+    """
+    Holds the current KnowledgeBaseSnapshot and replaces it as a whole.
+
+    A reload reads, validates and compiles a new snapshot on the calling
+    thread, then publishes it with a single reference assignment, so a
+    request sees either the old or the new knowledge base, never a mix.
+    A reload that fails (bad JSON, CPICTableError) keeps the old one.
+    """
+
+    def __init__(self, data_dir: str = KB_DATA_DIR):
+        self.data_dir = data_dir
+        self._current: Optional[KnowledgeBaseSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._history: List[Dict] = []
+        self._signature: Optional[Signature] = None
+        self._failed_signature: Optional[Signature] = None
+        self.last_error: Optional[str] = None
+
+    # -----------------------------
+    # Loading
+    # -----------------------------
+    def paths(self) -> List[str]:
+        return [os.path.join(self.data_dir, name) for name in KB_FILES]
+
+    def signature(self) -> Signature:
+        stats = [os.stat(path) for path in self.paths()]
+        return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    def load_snapshot(self) -> KnowledgeBaseSnapshot:
+        """
+        Reads and compiles the data files; raises on any problem.
+        """
+        signature = self.signature()
+        documents = []
+        for path in self.paths():
+            with open(path, "r") as f:
+                documents.append(json.load(f))
+
+        return KnowledgeBaseSnapshot(self.data_dir, signature, *documents)
+
+    @property
+    def current(self) -> KnowledgeBaseSnapshot:
+        snapshot = self._current
+        if snapshot is None:
+            snapshot, _ = self.reload()
+        return snapshot
+
+    def reload(self, force: bool = False) -> Tuple[KnowledgeBaseSnapshot, bool]:
+        """
+        Loads the files again and swaps the snapshot in when its content
+        changed (or when forced). Returns (current snapshot, swapped).
+        """
+        with self._reload_lock:
+            try:
+                snapshot = self.load_snapshot()
+            except Exception as e:
+                self.last_error = str(e)
+                try:
+                    self._failed_signature = self.signature()
+                except OSError:
+                    self._failed_signature = None
+                if self._current is None:
+                    raise RuntimeError(f"Failed to load CPIC data files: {e}") from e
+                raise
+
+            self.last_error = None
+            self._failed_signature = None
+            self._signature = snapshot.signature
+            previous = self._current
+
+            # Touched but identical content: keep the snapshot in use
+            if previous is not None and previous.version == snapshot.version and not force:
+                return previous, False
+
+            self._current = snapshot
+            self._history.append(snapshot.describe())
+            del self._history[:-KB_HISTORY_SIZE]
+
+        if previous is not None:
+            logger.info("Knowledge base %s -> %s", previous.version, snapshot.version)
+        return snapshot, True
+
+    # -----------------------------
+    # File Watcher
+    # -----------------------------
+    def files_changed(self) -> bool:
+        try:
+            signature = self.signature()
+        except OSError:
+            # Mid-replace (file briefly missing) — look again next tick
+            return False
+
+        if signature == self._failed_signature:
+            return False
+        return signature != self._signature
+
+    async def watch(self, run_in_thread: Callable[..., Awaitable],
+                    interval: float = KB_WATCH_INTERVAL_SECONDS) -> None:
+        """
+        Polls the file mtimes and reloads on change; the rebuild runs via
+        run_in_thread so compiling never blocks the event loop.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if not self.files_changed():
+                continue
+
+            try:
+                await run_in_thread(self.reload)
+            except Exception as e:
+                logger.error("Knowledge base reload failed, keeping %s: %s", self.current.version, e)
+
+    def stats(self) -> Dict:
+        return {
+            **self.current.describe(),
+            "data_dir": self.data_dir,
+            "last_error": self.last_error,
+            "history": list(self._history),
+        }
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_knowledge_base: Optional[KnowledgeBase] = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_knowledge_base() -> KnowledgeBase:
+    """
+    Shared knowledge base over KB_DATA_DIR.
+    """
+    global _knowledge_base
+    if _knowledge_base is None:
+        with _knowledge_base_lock:
+            if _knowledge_base is None:
+                _knowledge_base = KnowledgeBase()
+    return _knowledge_base
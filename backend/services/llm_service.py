@@ -1,11 +1,37 @@
 import os
 import json
-from typing import Dict
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
+import weakref
+from typing import AsyncIterator, Dict, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+from services.env import load_env
+from services.coalescing import SingleFlight
+from services.explanation_cache import ExplanationCache, get_explanation_cache
+from services.json_stream import JSONFieldStream
+from services import metrics
+
+# Load environment variables (once per process)
+load_env()
+
+
+# -----------------------------
+# Client Configuration (env overridable)
+# -----------------------------
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")  # Active Groq model
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+
+# Bump whenever build_prompt changes so cached explanations are not reused
+PROMPT_VERSION = "1"
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# In-flight completions per process; extra callers wait on the semaphore
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
 
 
 class PharmaGuardLLMService:
@@ -15,14 +41,32 @@ class PharmaGuardLLMService:
     - Rule engine determines medical logic.
     - LLM ONLY explains biological reasoning.
     - Safe JSON parsing with fallback handling.
+
+    One instance owns a pooled AsyncOpenAI client; get it through
+    get_llm_service() instead of constructing one per request.
     """
 
-    def __init__(self):
-        # Load environment variables at initialization
-        load_dotenv()
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = LLM_BASE_URL,
+        model: str = LLM_MODEL,
+        temperature: float = LLM_TEMPERATURE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        cache: Optional[ExplanationCache] = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache if cache is not None else get_explanation_cache()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Answers are cached in self.cache; this only joins in-flight calls
+        self._inflight = SingleFlight("llm", result_ttl=0)
+
         # Accept multiple key names to avoid deployment typos
         api_key_candidates = ["GROQ_API_KEY", "GROQ_KEY", "GROQAPI_KEY"]
-        api_key = next((os.getenv(key) for key in api_key_candidates if os.getenv(key)), None)
+        api_key = api_key or next((os.getenv(key) for key in api_key_candidates if os.getenv(key)), None)
 
         if not api_key:
             # Keep running with a graceful fallback when the key is missing
@@ -30,33 +74,37 @@ class PharmaGuardLLMService:
             self.client_error = "GROQ API key missing. Set GROQ_API_KEY in the environment."
             return
 
+        # Deferred: openai/httpx are the slowest imports of the backend
+        import httpx
+        from openai import AsyncOpenAI
+
         self.client_error = None
-        self.client = OpenAI(
+        self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url="https://api.groq.com/openai/v1"
+            base_url=base_url,
+            max_retries=LLM_MAX_RETRIES,
+            timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+            ),
         )
 
-    def generate_explanation(self, rule_engine_output: Dict) -> Dict:
+    async def aclose(self) -> None:
         """
-        Takes rule engine result and returns structured explanation JSON.
+        Closes the pooled HTTP connections.
         """
+        if self.client is not None:
+            await self.client.close()
 
-        drug = rule_engine_output.get("drug")
-        evaluations = rule_engine_output.get("evaluations", [])
-
+    @staticmethod
+    def build_prompt(drug: str, evaluations: list) -> str:
         clinical_facts = json.dumps(evaluations, indent=2)
 
-        # If the key is missing, return a safe fallback instead of throwing
-        if not self.client:
-            return {
-                "drug": drug,
-                "clinical_explanation": "LLM disabled: missing GROQ API key (set GROQ_API_KEY).",
-                "mechanism": "LLM unavailable due to configuration.",
-                "confidence": "Low",
-                "error": self.client_error,
-            }
-
-        prompt = f"""
+        return f"""
 You are a clinical pharmacogenomics expert.
 
 STRICT RULES:
@@ -81,40 +129,214 @@ Return EXACT JSON format:
 }}
 """
 
+    @staticmethod
+    def parse_content(content: str, drug: str) -> Dict:
+        """
+        Turns the raw completion text into the explanation dict.
+        """
+        parsed = PharmaGuardLLMService.parse_structured(content)
+        if parsed is not None:
+            return parsed
+
+        # Fallback: Return explanation as raw text safely
+        return {
+            "drug": drug,
+            "clinical_explanation": PharmaGuardLLMService.strip_fences(content),
+            "mechanism": "Unable to parse structured mechanism separately.",
+            "confidence": "Medium"
+        }
+
+    @staticmethod
+    def strip_fences(content: str) -> str:
+        content = content.strip()
+
+        # Remove markdown code blocks if model accidentally adds them
+        if content.startswith("```"):
+            content = content.replace("```json", "").replace("```", "").strip()
+        return content
+
+    @staticmethod
+    def parse_structured(content: str) -> Optional[Dict]:
+        """
+        The completion as a JSON object, or None if it is not valid JSON.
+        """
         try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",  # Active Groq model
-                temperature=0.2,
-                messages=[
-                    {"role": "system", "content": "You are an expert in pharmacogenomics."},
-                    {"role": "user", "content": prompt}
-                ],
+            parsed = json.loads(PharmaGuardLLMService.strip_fences(content))
+        except json.JSONDecodeError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
+    def cache_key(self, rule_engine_output: Dict) -> str:
+        return ExplanationCache.make_key(
+            rule_engine_output, self.model, self.temperature, PROMPT_VERSION
+        )
+
+    def missing_key_fallback(self, drug: str) -> Dict:
+        return {
+            "drug": drug,
+            "clinical_explanation": "LLM disabled: missing GROQ API key (set GROQ_API_KEY).",
+            "mechanism": "LLM unavailable due to configuration.",
+            "confidence": "Low",
+            "error": self.client_error,
+        }
+
+    @staticmethod
+    def error_fallback(drug: str, error: Exception) -> Dict:
+        return {
+            "drug": drug,
+            "clinical_explanation": "LLM generation failed.",
+            "mechanism": "Error during explanation generation.",
+            "confidence": "Low",
+            "error": str(error)
+        }
+
+    def build_messages(self, drug: str, evaluations: list) -> list:
+        return [
+            {"role": "system", "content": "You are an expert in pharmacogenomics."},
+            {"role": "user", "content": self.build_prompt(drug, evaluations)}
+        ]
+
+    async def request_completion(self, drug: str, evaluations: list) -> str:
+        """
+        Raw completion text for one prompt (no cache, no fallback).
+        """
+        async with self._semaphore:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
+                messages=self.build_messages(drug, evaluations),
             )
 
-            content = response.choices[0].message.content.strip()
+        return response.choices[0].message.content
 
-            # Remove markdown code blocks if model accidentally adds them
-            if content.startswith("```"):
-                content = content.replace("```json", "").replace("```", "").strip()
+    async def generate_explanation(self, rule_engine_output: Dict) -> Dict:
+        """
+        Takes rule engine result and returns structured explanation JSON.
+        Awaits the completion without blocking the event loop.
+        """
 
-            try:
-                return json.loads(content)
+        drug = rule_engine_output.get("drug")
+        evaluations = rule_engine_output.get("evaluations", [])
 
-            except json.JSONDecodeError:
-                # Fallback: Return explanation as raw text safely
-                return {
-                    "drug": drug,
-                    "clinical_explanation": content,
-                    "mechanism": "Unable to parse structured mechanism separately.",
-                    "confidence": "Medium"
-                }
+        # Identical rule-engine output -> identical prompt -> reuse the answer
+        key = self.cache_key(rule_engine_output)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # If the key is missing, return a safe fallback instead of throwing
+        if not self.client:
+            metrics.LLM_FALLBACKS.inc("missing_key")
+            return self.missing_key_fallback(drug)
+
+        # Concurrent identical requests share one completion
+        return await self._inflight.run(key, lambda: self._generate(key, drug, evaluations))
+
+    async def _generate(self, key: str, drug: str, evaluations: list) -> Dict:
+        try:
+            content = await self.request_completion(drug, evaluations)
+            parsed = self.parse_structured(content)
+
+            # Only well-formed answers are cached; fallbacks get retried next time
+            if parsed is None:
+                metrics.LLM_FALLBACKS.inc("unparsed")
+                return self.parse_content(content, drug)
+
+            self.cache.set(key, parsed)
+            return parsed
 
         except Exception as e:
             # Full fail-safe for API errors
-            return {
-                "drug": drug,
-                "clinical_explanation": "LLM generation failed.",
-                "mechanism": "Error during explanation generation.",
-                "confidence": "Low",
-                "error": str(e)
-            }
+            metrics.LLM_FALLBACKS.inc("api_error")
+            return self.error_fallback(drug, e)
+
+    async def stream_explanation(self, rule_engine_output: Dict) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Streaming variant of generate_explanation. Yields
+            ("delta", (field, text))  as the model writes each JSON field
+            ("done", explanation)     once, with the same dict
+                                      generate_explanation would return
+        Cached and fallback explanations arrive as a single "done".
+        """
+        drug = rule_engine_output.get("drug")
+        evaluations = rule_engine_output.get("evaluations", [])
+
+        key = self.cache_key(rule_engine_output)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield "done", cached
+            return
+
+        if not self.client:
+            metrics.LLM_FALLBACKS.inc("missing_key")
+            yield "done", self.missing_key_fallback(drug)
+            return
+
+        fields = JSONFieldStream()
+        chunks = []
+
+        try:
+            async with self._semaphore:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    temperature=self.temperature,
+                    messages=self.build_messages(drug, evaluations),
+                    stream=True,
+                )
+
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if not text:
+                        continue
+
+                    chunks.append(text)
+                    for delta in fields.feed(text):
+                        yield "delta", delta
+
+        except Exception as e:
+            metrics.LLM_FALLBACKS.inc("api_error")
+            yield "done", self.error_fallback(drug, e)
+            return
+
+        content = "".join(chunks)
+        parsed = self.parse_structured(content)
+
+        if parsed is None:
+            metrics.LLM_FALLBACKS.inc("unparsed")
+            yield "done", self.parse_content(content, drug)
+            return
+
+        self.cache.set(key, parsed)
+        yield "done", parsed
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+# Keyed by event loop: pooled connections cannot be shared across loops
+# (main_telegram.py runs uvicorn and the bot on separate loops).
+_services: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PharmaGuardLLMService]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_llm_service() -> PharmaGuardLLMService:
+    """
+    Shared service for the running event loop, created on first use.
+    """
+    loop = asyncio.get_running_loop()
+    service = _services.get(loop)
+    if service is None:
+        service = _services[loop] = PharmaGuardLLMService()
+    return service
+
+
+async def close_llm_service() -> None:
+    """
+    Closes the running loop's shared client (call on shutdown).
+    """
+    service = _services.pop(asyncio.get_running_loop(), None)
+    if service is not None:
+        await service.aclose()
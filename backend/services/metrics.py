@@ -0,0 +1,242 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# -----------------------------
+# Metrics Configuration (env overridable)
+# -----------------------------
+# Disabled: every recording call returns immediately and /metrics is 404
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Seconds; spans from sub-millisecond rule lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# -----------------------------
+# Metric Types
+# -----------------------------
+class Counter:
+    """
+    Monotonic counter with positional label values.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, values)} {value:g}" for values, value in items]
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus semantics) per label set.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues: str):
+        """
+        Context manager observing the elapsed wall time of its block.
+        """
+        if not METRICS_ENABLED:
+            return nullcontext()
+        return _Timer(self, labelvalues)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram: Histogram, labelvalues: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# PharmaGuard Metrics
+# -----------------------------
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "pharmaguard_stage_duration_seconds",
+    "Time spent in each analysis pipeline stage.",
+    ("source", "stage", "drug"),
+))
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "pharmaguard_http_request_duration_seconds",
+    "HTTP request latency including response validation and serialization.",
+    ("method", "route", "status"),
+))
+
+LLM_FALLBACKS = REGISTRY.register(Counter(
+    "pharmaguard_llm_fallbacks_total",
+    "LLM explanations replaced by a fallback, by reason.",
+    ("reason",),
+))
+
+COALESCED = REGISTRY.register(Counter(
+    "pharmaguard_coalesced_requests_total",
+    "Single-flight outcomes: executed, shared with an in-flight call, or served cached.",
+    ("scope", "outcome"),
+))
+
+ERRORS = REGISTRY.register(Counter(
+    "pharmaguard_errors_total",
+    "Failed analyses, by entry point and error kind.",
+    ("source", "kind"),
+))
+
+
+def stage(name: str, drug: str = "", source: str = "api"):
+    """
+    Times one pipeline stage:
+
+        with metrics.stage("parse"):
+            ...
+    """
+    if not METRICS_ENABLED:
+        return nullcontext()
+    return _Timer(STAGE_SECONDS, (source, name, drug))
+
+
+def drug_label(drug_names: List[str], known: Optional[Iterable[str]] = None) -> str:
+    """
+    Bounded-cardinality drug label: the drug itself for single-drug
+    requests on a supported drug, otherwise MULTI / OTHER.
+    """
+    if len(drug_names) != 1:
+        return "MULTI"
+    if known is not None and drug_names[0] not in known:
+        return "OTHER"
+    return drug_names[0]
+
+
+# -----------------------------
+# ASGI Middleware
+# -----------------------------
+class MetricsMiddleware:
+    """
+    Records REQUEST_SECONDS per route template (not raw path, so job ids
+    do not explode cardinality) until the last body chunk is sent.
+    Only added to the app when metrics are enabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, status[0])
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,449 @@
+"""
+Server-side report rendering: `report.pdf` from built PharmaGuardResponse
+dicts, with no third-party PDF dependency.
+
+Reports use the PDF base-14 Helvetica fonts, so nothing is embedded. The
+invariant parts of every document are compiled once per process:
+- the file header, catalog and font objects;
+- the glyph width tables used for line wrapping;
+- the wrapped disclaimer.
+Rendering a report then only lays out its own text.
+"""
+import os
+import zlib
+import zipfile
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# -----------------------------
+# Rendering Configuration (env overridable)
+# -----------------------------
+# Reports per batch request (each becomes one PDF in the zip)
+REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "500"))
+
+# PDFs rendered ahead of the zip writer during a batch
+REPORT_RENDER_WINDOW = int(os.getenv("REPORT_RENDER_WINDOW", "8"))
+
+
+# -----------------------------
+# Page Geometry (A4, points)
+# -----------------------------
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+FOOTER_HEIGHT = 60
+
+REGULAR = "F1"
+BOLD = "F2"
+
+# Glyph widths (1/1000 em) for character codes 32-126, from the Adobe AFM files
+_HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+
+RISK_COLORS = {
+    "Safe": (0.18, 0.55, 0.34),
+    "Adjust Dosage": (0.85, 0.55, 0.10),
+    "Toxic": (0.78, 0.16, 0.16),
+    "Ineffective": (0.50, 0.20, 0.45),
+}
+UNKNOWN_COLOR = (0.45, 0.45, 0.45)
+MUTED = (0.40, 0.40, 0.40)
+BLACK = (0.0, 0.0, 0.0)
+
+DISCLAIMER = (
+    "This analysis is for informational purposes only. It is not a medical diagnosis; "
+    "always consult qualified healthcare professionals before making clinical decisions."
+)
+
+
+def _encode(text) -> bytes:
+    # WinAnsiEncoding; characters outside it (e.g. emoji) become "?"
+    return str(text).replace("\r", "").encode("cp1252", errors="replace")
+
+
+def _escape(encoded: bytes) -> bytes:
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class _Page:
+    """
+    Content-stream operators for one page, drawn top-down from self.y.
+    """
+
+    __slots__ = ("ops", "y")
+
+    def __init__(self):
+        self.ops: List[bytes] = []
+        self.y = PAGE_HEIGHT - MARGIN
+
+
+class PDFReportRenderer:
+    """
+    Lays out PharmaGuardResponse dicts (model_dump() output) as an A4 PDF,
+    one report after another, each starting on a new page. Get the
+    per-process instance through get_report_renderer().
+    """
+
+    def __init__(self):
+        self.widths = {
+            REGULAR: self._width_table(_HELVETICA_WIDTHS),
+            BOLD: self._width_table(_HELVETICA_BOLD_WIDTHS),
+        }
+        self.disclaimer = self.wrap(DISCLAIMER, REGULAR, 8, TEXT_WIDTH)
+        self.template, self.template_offsets = self._compile_template()
+
+    # -----------------------------
+    # Template (compiled once)
+    # -----------------------------
+    @staticmethod
+    def _width_table(widths: Tuple[int, ...]) -> List[int]:
+        table = [556] * 256
+        table[32:127] = widths
+        return table
+
+    @staticmethod
+    def _compile_template() -> Tuple[bytes, Dict[int, int]]:
+        """
+        Header plus the objects every document shares: 1 catalog,
+        3 Helvetica, 4 Helvetica-Bold (2, the page tree, is per document).
+        """
+        parts = [b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"]
+        offsets = {}
+        shared = {
+            1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+            4: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+        }
+        for number, body in shared.items():
+            offsets[number] = sum(len(part) for part in parts)
+            parts.append(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        return b"".join(parts), offsets
+
+    # -----------------------------
+    # Text Measurement
+    # -----------------------------
+    def text_width(self, encoded: bytes, font: str, size: float) -> float:
+        widths = self.widths[font]
+        return sum(widths[byte] for byte in encoded) * size / 1000
+
+    def wrap(self, text, font: str, size: float, width: float) -> List[bytes]:
+        """
+        Encoded lines no wider than `width`; explicit newlines are kept.
+        """
+        space = self.text_width(b" ", font, size)
+        lines = []
+
+        for paragraph in _encode(text).split(b"\n"):
+            line, line_width = [], 0.0
+            for word in paragraph.split(b" "):
+                word_width = self.text_width(word, font, size)
+
+                # A single word wider than the line is cut where it overflows
+                while word_width > width:
+                    cut = len(word) - 1
+                    while cut > 1 and self.text_width(word[:cut], font, size) > width:
+                        cut -= 1
+                    if line:
+                        lines.append(b" ".join(line))
+                        line, line_width = [], 0.0
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_width = self.text_width(word, font, size)
+
+                needed = word_width if not line else line_width + space + word_width
+                if line and needed > width:
+                    lines.append(b" ".join(line))
+                    line, line_width = [word], word_width
+                else:
+                    line.append(word)
+                    line_width = needed
+            lines.append(b" ".join(line))
+
+        return lines
+
+    # -----------------------------
+    # Layout
+    # -----------------------------
+    def _ensure(self, pages: List[_Page], height: float) -> _Page:
+        page = pages[-1]
+        if page.y - height < MARGIN + FOOTER_HEIGHT:
+            page = _Page()
+            pages.append(page)
+        return page
+
+    def _line(self, pages: List[_Page], encoded: bytes, font: str = REGULAR, size: float = 10,
+              color: Tuple[float, float, float] = BLACK, x: float = MARGIN) -> None:
+        leading = size * 1.35
+        page = self._ensure(pages, leading)
+        page.y -= leading
+        page.ops.append(
+            b"BT %.2f %.2f %.2f rg /%s %.1f Tf %.2f %.2f Td (%s) Tj ET\n"
+            % (*color, font.encode(), size, x, page.y, _escape(encoded))
+        )
+
+    def _paragraph(self, pages: List[_Page], text, font: str = REGULAR, size: float = 10,
+                   color: Tuple[float, float, float] = BLACK, indent: float = 0) -> None:
+        for encoded in self.wrap(text, font, size, TEXT_WIDTH - indent):
+            self._line(pages, encoded, font, size, color, MARGIN + indent)
+
+    def _heading(self, pages: List[_Page], text: str) -> None:
+        # Keep a heading on the same page as the first lines under it
+        page = self._ensure(pages, 60)
+        page.y -= 10
+        self._line(pages, _encode(text), BOLD, 13)
+        page = pages[-1]
+        page.y -= 4
+        page.ops.append(b"0.8 0.8 0.8 RG 0.5 w %d %.2f m %d %.2f l S\n"
+                        % (MARGIN, page.y, PAGE_WIDTH - MARGIN, page.y))
+        page.y -= 2
+
+    def _field(self, pages: List[_Page], label: str, value) -> None:
+        label_bytes = _encode(f"{label}: ")
+        indent = self.text_width(label_bytes, BOLD, 10)
+        lines = self.wrap(value if value not in (None, "") else "-", REGULAR, 10, TEXT_WIDTH - indent)
+
+        self._line(pages, label_bytes, BOLD, 10)
+        page = pages[-1]
+        # First value line shares the label's baseline
+        page.ops.append(
+            b"BT 0 0 0 rg /%s 10.0 Tf %.2f %.2f Td (%s) Tj ET\n"
+            % (REGULAR.encode(), MARGIN + indent, page.y, _escape(lines[0]))
+        )
+        for encoded in lines[1:]:
+            self._line(pages, encoded, x=MARGIN + indent)
+
+    def _risk_badge(self, pages: List[_Page], risk: Dict) -> None:
+        label = risk.get("risk_label") or "Unknown"
+        color = RISK_COLORS.get(label, UNKNOWN_COLOR)
+        encoded = _encode(label)
+
+        page = self._ensure(pages, 30)
+        width = self.text_width(encoded, BOLD, 12) + 20
+        page.y -= 24
+        page.ops.append(b"%.2f %.2f %.2f rg %d %.2f %.2f 20 re f\n" % (*color, MARGIN, page.y, width))
+        page.ops.append(
+            b"BT 1 1 1 rg /%s 12.0 Tf %.2f %.2f Td (%s) Tj ET\n"
+            % (BOLD.encode(), MARGIN + 10, page.y + 6, _escape(encoded))
+        )
+        page.y -= 4
+
+    def layout(self, report: Dict) -> List[_Page]:
+        """
+        Pages for one report dict.
+        """
+        pages = [_Page()]
+        risk = report.get("risk_assessment") or {}
+        profile = report.get("pharmacogenomic_profile") or {}
+        recommendation = report.get("clinical_recommendation") or {}
+        explanation = report.get("llm_generated_explanation") or {}
+        quality = report.get("quality_metrics") or {}
+
+        self._line(pages, b"PharmaGuard Pharmacogenomic Report", BOLD, 18)
+        meta = f"Patient {report.get('patient_id', '-')}   |   Drug {report.get('drug', '-')}   |   {report.get('timestamp', '')}"
+        if report.get("knowledge_base_version"):
+            meta += f"   |   KB {report['knowledge_base_version']}"
+        self._paragraph(pages, meta, size=9, color=MUTED)
+
+        self._heading(pages, "Risk Assessment")
+        self._risk_badge(pages, risk)
+        confidence = risk.get("confidence_score")
+        self._field(pages, "Confidence", f"{confidence:.0%}" if isinstance(confidence, (int, float)) else confidence)
+        self._field(pages, "Severity", str(risk.get("severity", "-")).upper())
+
+        self._heading(pages, "Genetic Profile")
+        self._field(pages, "Gene", profile.get("primary_gene"))
+        self._field(pages, "Diplotype", profile.get("diplotype"))
+        self._field(pages, "Phenotype", profile.get("phenotype"))
+
+        variants = profile.get("detected_variants") or []
+        self._field(pages, "Detected variants", len(variants) if variants else "none")
+        for i, variant in enumerate(variants, 1):
+            parts = [variant.get("primary_gene") or ""]
+            if variant.get("star_allele"):
+                parts.append(variant["star_allele"])
+            if variant.get("rsid"):
+                parts.append(variant["rsid"])
+            if variant.get("chromosome") and variant.get("position"):
+                parts.append(f"chr{str(variant['chromosome']).replace('chr', '')}:{variant['position']}")
+            self._paragraph(pages, f"{i}. " + "   ".join(parts), indent=12)
+
+        self._heading(pages, "Clinical Recommendation")
+        self._paragraph(pages, recommendation.get("recommendation_text") or "-")
+
+        self._heading(pages, "AI Explanation")
+        self._field(pages, "Summary", explanation.get("summary"))
+        self._field(pages, "Mechanism", explanation.get("mechanism"))
+        self._field(pages, "Confidence", explanation.get("confidence"))
+
+        self._heading(pages, "Quality Metrics")
+        for label, key in (
+            ("VCF parsing", "vcf_parsing_success"),
+            ("Gene detection", "gene_detected"),
+            ("Rule engine", "rule_engine_applied"),
+            ("LLM explanation", "llm_explanation_generated"),
+        ):
+            self._field(pages, label, "Yes" if quality.get(key) else "No")
+
+        return pages
+
+    def _footer(self, number: int, total: int) -> bytes:
+        ops = []
+        y = MARGIN + 8 * 1.35 * len(self.disclaimer)
+        for encoded in self.disclaimer:
+            ops.append(b"BT %.2f %.2f %.2f rg /%s 8.0 Tf %d %.2f Td (%s) Tj ET\n"
+                       % (*MUTED, REGULAR.encode(), MARGIN, y, _escape(encoded)))
+            y -= 8 * 1.35
+        label = _encode(f"Page {number} of {total}")
+        ops.append(b"BT %.2f %.2f %.2f rg /%s 8.0 Tf %.2f %d Td (%s) Tj ET\n"
+                   % (*MUTED, REGULAR.encode(), PAGE_WIDTH - MARGIN - self.text_width(label, REGULAR, 8),
+                      MARGIN - 20, label))
+        return b"".join(ops)
+
+    # -----------------------------
+    # Document
+    # -----------------------------
+    def render(self, reports: Iterable[Dict]) -> bytes:
+        """
+        One PDF document containing every report.
+        """
+        pages = [page for report in reports for page in self.layout(report)]
+        if not pages:
+            pages = [_Page()]
+
+        out = [self.template]
+        size = len(self.template)
+        offsets = dict(self.template_offsets)
+        kids = []
+
+        def add(number: int, body: bytes) -> None:
+            nonlocal size
+            chunk = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+            offsets[number] = size
+            out.append(chunk)
+            size += len(chunk)
+
+        for i, page in enumerate(pages):
+            page_number, content_number = 5 + 2 * i, 6 + 2 * i
+            stream = zlib.compress(b"".join(page.ops) + self._footer(i + 1, len(pages)), 6)
+            add(content_number, b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream"
+                % (len(stream), stream))
+            add(page_number, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                % (PAGE_WIDTH, PAGE_HEIGHT, content_number))
+            kids.append(b"%d 0 R" % page_number)
+
+        add(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids)))
+        info_number = 5 + 2 * len(pages)
+        add(info_number, b"<< /Producer (PharmaGuard) /CreationDate (D:%s) >>"
+            % datetime.utcnow().strftime("%Y%m%d%H%M%SZ").encode())
+
+        count = info_number + 1
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % count]
+        xref.extend(b"%010d 00000 n \n" % offsets[number] for number in range(1, count))
+        out.append(b"".join(xref))
+        out.append(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (count, info_number, size))
+        return b"".join(out)
+
+
+class ZipStream:
+    """
+    Zip archive written to memory piecewise: every add() returns the bytes
+    completed so far, so a response can stream the archive while later
+    entries are still being rendered. Entries are stored (PDF content is
+    already deflated).
+    """
+
+    def __init__(self):
+        self._buffer = _ChunkBuffer()
+        self._archive = zipfile.ZipFile(self._buffer, "w", zipfile.ZIP_STORED)
+
+    def add(self, name: str, data: bytes) -> bytes:
+        self._archive.writestr(name, data)
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        self._archive.close()
+        return self._buffer.drain()
+
+
+class _ChunkBuffer:
+    """
+    Write-only, unseekable sink for zipfile (which then uses data
+    descriptors instead of seeking back).
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def report_filename(report: Dict, index: Optional[int] = None, extension: str = "pdf") -> str:
+    """
+    Download name such as `PATIENT_001_CLOPIDOGREL.pdf` (index-prefixed in batches).
+    """
+    stem = f"{report.get('patient_id', 'report')}_{report.get('drug', '')}".strip("_")
+    stem = "".join(char if char.isalnum() or char in "-_" else "_" for char in stem)
+    if index is not None:
+        stem = f"{index:04d}_{stem}"
+    return f"{stem}.{extension}"
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_renderer: Optional[PDFReportRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_report_renderer() -> PDFReportRenderer:
+    """
+    Renderer with the template compiled once per process (API worker or
+    pool process alike).
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = PDFReportRenderer()
+    return _renderer
+
+
+def render_pdf(reports: List[Dict]) -> bytes:
+    """
+    Module-level so batches can be shipped to worker processes.
+    """
+    return get_report_renderer().render(reports)
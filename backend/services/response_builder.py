@@ -1,74 +1,201 @@
+import json
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from models import (
+    ClinicalRecommendation,
+    DetectedVariant,
+    LLMGeneratedExplanation,
+    PharmaGuardMultiDrugResponse,
+    PharmaGuardResponse,
+    PharmacogenomicProfile,
+    QualityMetrics,
+    RiskAssessment,
+)
+from services.variant_record import VariantRecord
+
+
+# LLM JSON field -> report field in llm_generated_explanation
+LLM_EXPLANATION_FIELDS = {
+    "clinical_explanation": "summary",
+    "mechanism": "mechanism",
+    "confidence": "confidence",
+}
+
+# Map phenotype wording to required short codes
+PHENOTYPE_CODES = {
+    "Poor Metabolizer": "PM",
+    "Intermediate Metabolizer": "IM",
+    "Normal Metabolizer": "NM",
+    "Rapid Metabolizer": "RM",
+    "Ultra-rapid Metabolizer": "URM",
+    "Unknown": "Unknown"
+}
+
+# Severity mapping (example logic)
+SEVERITY_BY_RISK = {
+    "Safe": "none",
+    "Adjust Dosage": "moderate",
+    "Ineffective": "high",
+    "Toxic": "critical",
+    "Unknown": "low"
+}
+
+CONFIDENCE_SCORE = 0.95
+
+# Debug-only DetectedVariant fields, left out of the wire payload on request
+DEBUG_VARIANT_FIELDS = {"raw_info"}
+_SINGLE_DEBUG_EXCLUDE = {"pharmacogenomic_profile": {"detected_variants": {"__all__": DEBUG_VARIANT_FIELDS}}}
+_MULTI_DEBUG_EXCLUDE = {"reports": {"__all__": _SINGLE_DEBUG_EXCLUDE}}
 
 
 class PharmaGuardResponseBuilder:
 
     @staticmethod
-    def build_final_response(
+    def build_explanation(llm_output: Dict) -> Dict[str, str]:
+        """
+        Report explanation fields from the LLM JSON. The model decides the
+        shape of that JSON, so every field is coerced to a string: missing
+        -> "", objects and numbers -> their JSON text.
+        """
+        explanation = {}
+        for llm_field, report_field in LLM_EXPLANATION_FIELDS.items():
+            value = llm_output.get(llm_field) if isinstance(llm_output, dict) else None
+            if value is None:
+                value = ""
+            elif not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+            explanation[report_field] = value
+        return explanation
+
+    # -----------------------------
+    # Model Fast Path
+    # -----------------------------
+    # Parser and rule-engine output is ours, so those parts are assembled
+    # with model_construct (no validation). The LLM explanation is not, and
+    # is coerced and validated. Models are serialized once by pydantic-core
+    # in render_json.
+
+    @staticmethod
+    def build_variant_models(parsed_variants: List[VariantRecord]) -> List[DetectedVariant]:
+        """
+        DetectedVariant models for a parse; build once and share between
+        the reports of a multi-drug response.
+        """
+        construct = DetectedVariant.model_construct
+        return [
+            construct(
+                primary_gene=variant.primary_gene,
+                star_allele=variant.star_allele,
+                rsid=variant.rsid,
+                chromosome=variant.chromosome,
+                position=str(variant.position) if variant.position is not None else None,
+                raw_info=variant.raw_info,
+            )
+            for variant in parsed_variants
+        ]
+
+    @staticmethod
+    def build_model(
         patient_id: str,
-        parsed_variants: List[Dict],
+        parsed_variants: List[VariantRecord],
         rule_engine_output: Dict,
-        llm_output: Dict
-    ) -> Dict:
-
+        llm_output: Dict,
+        detected_variants: Optional[List[DetectedVariant]] = None,
+        timestamp: Optional[str] = None,
+    ) -> PharmaGuardResponse:
+        """
+        The single-drug report. llm_output may be any JSON the model
+        returned; an empty explanation marks llm_explanation_generated false.
+        """
         evaluation = rule_engine_output["evaluations"][0]
+        risk_label = evaluation["risk_label"]
 
-        # Map phenotype wording to required short codes
-        phenotype_map = {
-            "Poor Metabolizer": "PM",
-            "Intermediate Metabolizer": "IM",
-            "Normal Metabolizer": "NM",
-            "Rapid Metabolizer": "RM",
-            "Ultra-rapid Metabolizer": "URM",
-            "Unknown": "Unknown"
-        }
-
-        # Severity mapping (example logic)
-        severity_map = {
-            "Safe": "none",
-            "Adjust Dosage": "moderate",
-            "Ineffective": "high",
-            "Toxic": "critical",
-            "Unknown": "low"
-        }
+        if detected_variants is None:
+            detected_variants = PharmaGuardResponseBuilder.build_variant_models(parsed_variants)
 
-        risk_label = evaluation["risk_label"]
+        explanation = LLMGeneratedExplanation.model_validate(
+            PharmaGuardResponseBuilder.build_explanation(llm_output)
+        )
+
+        return PharmaGuardResponse.model_construct(
+            patient_id=patient_id,
+            drug=rule_engine_output["drug"],
+            timestamp=timestamp or datetime.utcnow().isoformat(),
+            risk_assessment=RiskAssessment.model_construct(
+                risk_label=risk_label,
+                confidence_score=CONFIDENCE_SCORE,
+                severity=SEVERITY_BY_RISK.get(risk_label, "low"),
+            ),
+            pharmacogenomic_profile=PharmacogenomicProfile.model_construct(
+                primary_gene=evaluation["gene"],
+                diplotype=evaluation["diplotype"],
+                phenotype=PHENOTYPE_CODES.get(evaluation["phenotype"], "Unknown"),
+                detected_variants=detected_variants,
+            ),
+            clinical_recommendation=ClinicalRecommendation.model_construct(
+                recommendation_text=evaluation["recommendation"],
+            ),
+            llm_generated_explanation=explanation,
+            quality_metrics=QualityMetrics.model_construct(
+                vcf_parsing_success=True,
+                gene_detected=True,
+                rule_engine_applied=True,
+                llm_explanation_generated=bool(explanation.summary),
+            ),
+            knowledge_base_version=rule_engine_output.get("knowledge_base_version"),
+        )
+
+    @staticmethod
+    def build_multi_drug_model(
+        patient_id: str,
+        parsed_variants: List[VariantRecord],
+        rule_engine_outputs: List[Dict],
+        llm_outputs: List[Dict]
+    ) -> PharmaGuardMultiDrugResponse:
+        detected_variants = PharmaGuardResponseBuilder.build_variant_models(parsed_variants)
+        timestamp = datetime.utcnow().isoformat()
+
+        reports = [
+            PharmaGuardResponseBuilder.build_model(
+                patient_id, parsed_variants, engine_output, llm_output,
+                detected_variants=detected_variants, timestamp=timestamp,
+            )
+            for engine_output, llm_output in zip(rule_engine_outputs, llm_outputs)
+        ]
 
-        return {
-            "patient_id": patient_id,
-            "drug": rule_engine_output["drug"],
-            "timestamp": datetime.utcnow().isoformat(),
-
-            "risk_assessment": {
-                "risk_label": risk_label,
-                "confidence_score": 0.95,
-                "severity": severity_map.get(risk_label, "low")
-            },
-
-            "pharmacogenomic_profile": {
-                "primary_gene": evaluation["gene"],
-                "diplotype": evaluation["diplotype"],
-                "phenotype": phenotype_map.get(
-                    evaluation["phenotype"], "Unknown"
-                ),
-                "detected_variants": parsed_variants
-            },
-
-            "clinical_recommendation": {
-                "recommendation_text": evaluation["recommendation"]
-            },
-
-            "llm_generated_explanation": {
-                "summary": llm_output.get("clinical_explanation"),
-                "mechanism": llm_output.get("mechanism"),
-                "confidence": llm_output.get("confidence")
-            },
-
-            "quality_metrics": {
-                "vcf_parsing_success": True,
-                "gene_detected": True,
-                "rule_engine_applied": True,
-                "llm_explanation_generated": True
-            }
-        }
+        return PharmaGuardMultiDrugResponse.model_construct(
+            patient_id=patient_id,
+            timestamp=timestamp,
+            drugs=[report.drug for report in reports],
+            reports=reports,
+        )
+
+    @staticmethod
+    def restamp(model, patient_id: str, timestamp: Optional[str] = None):
+        """
+        Shallow copy of a built response (e.g. one shared by coalesced
+        requests) carrying another caller's patient_id and timestamp.
+        """
+        stamp = {"patient_id": patient_id, "timestamp": timestamp or datetime.utcnow().isoformat()}
+        if isinstance(model, PharmaGuardMultiDrugResponse):
+            reports = [report.model_copy(update=stamp) for report in model.reports]
+            return model.model_copy(update=dict(stamp, reports=reports))
+        return model.model_copy(update=stamp)
+
+    @staticmethod
+    def debug_exclude(model) -> Optional[Dict]:
+        """
+        `exclude` argument that drops DEBUG_VARIANT_FIELDS from a model dump.
+        """
+        if isinstance(model, PharmaGuardMultiDrugResponse):
+            return _MULTI_DEBUG_EXCLUDE
+        return _SINGLE_DEBUG_EXCLUDE
+
+    @staticmethod
+    def render_json(model, include_debug: bool = True) -> bytes:
+        """
+        JSON bytes for a built response model, ready to send as-is.
+        """
+        exclude = None if include_debug else PharmaGuardResponseBuilder.debug_exclude(model)
+        return model.model_dump_json(exclude=exclude).encode("utf-8")
@@ -1,130 +1,173 @@
-import os
-import json
-from collections import defaultdict
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from services.variant_record import VariantRecord
+from services.diplotype_caller import CALLED, NOT_CALLED, DiplotypeCaller, GeneCall
+from services.cpic_tables import CompiledCPICTables
+from services.knowledge_base import (
+    BASE_DIR,
+    KB_DATA_DIR,
+    KnowledgeBaseSnapshot,
+    get_knowledge_base,
+)
 
 
 class CPICRuleEngine:
     """
     Data-driven Pharmacogenomics Rule Engine.
-    Loads CPIC mappings from backend/data folder.
+    Evaluates against the current knowledge base snapshot (CPIC mappings
+    from the backend/data folder, hot-reloaded by services.knowledge_base).
     """
 
+    BASE_DIR = BASE_DIR
+    DATA_DIR = KB_DATA_DIR
+
+    @staticmethod
+    def snapshot() -> KnowledgeBaseSnapshot:
+        """
+        Current knowledge base, loaded on first use (the app warms it up
+        in the background at startup). Evaluation reads one snapshot per
+        call so a request never mixes two versions.
+        """
+        return get_knowledge_base().current
+
+    @classmethod
+    def supported_drugs(cls) -> Dict[str, List[str]]:
+        """
+        drug -> genes of the current knowledge base.
+        """
+        return cls.snapshot().drug_gene_map
+
     # -----------------------------
-    # Load JSON Data (Deployment Safe)
+    # DRUG SELECTION
     # -----------------------------
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DATA_DIR = os.path.join(BASE_DIR, "data")
+    @classmethod
+    def resolve_drugs(cls, drugs: str) -> List[str]:
+        """
+        Normalizes a comma-separated drug list. Empty or "ALL" selects
+        every supported drug. Order is preserved, duplicates dropped.
+        """
+        names = [name.upper().strip() for name in (drugs or "").split(",")]
+        names = [name for name in names if name]
 
-    try:
-        with open(os.path.join(DATA_DIR, "drug_gene_map.json"), "r") as f:
-            DRUG_GENE_MAP = json.load(f)
+        if not names or names == ["ALL"]:
+            return list(cls.snapshot().drug_gene_map)
 
-        with open(os.path.join(DATA_DIR, "gene_phenotypes.json"), "r") as f:
-            PHENOTYPE_MAP = json.load(f)
+        return list(dict.fromkeys(names))
 
-        with open(os.path.join(DATA_DIR, "drug_guidelines.json"), "r") as f:
-            DRUG_GUIDELINES = json.load(f)
+    # -----------------------------
+    # COHORT (MULTI-SAMPLE) EVALUATION
+    # -----------------------------
+    @classmethod
+    def evaluate_batch(
+        cls, cohort_calls: Dict[str, Dict[str, GeneCall]], drug_names: Iterable[str]
+    ) -> Iterator[Dict]:
+        """
+        Lazily yields one sample x drug row per sample of
+        DiplotypeCaller.call_cohort output:
+        {"sample_id": ..., "knowledge_base_version": ..., "results": {DRUG: [evaluations...]}}
+        """
+        snapshot = cls.snapshot()
+        tables = snapshot.tables
+        drug_names = [tables.normalize_drug(name) for name in drug_names]
+        drug_genes = tables.drug_genes
+
+        for sample_id, gene_calls in cohort_calls.items():
+            results = {
+                drug_name: [
+                    cls.lookup_call(drug_name, gene, gene_calls.get(gene), tables)
+                    for gene in drug_genes.get(drug_name, ())
+                ]
+                for drug_name in drug_names
+            }
 
-    except Exception as e:
-        raise RuntimeError(f"Failed to load CPIC data files: {e}")
+            yield {
+                "sample_id": sample_id,
+                "knowledge_base_version": snapshot.version,
+                "results": results,
+            }
 
     # -----------------------------
-    # MAIN EVALUATION FUNCTION
+    # SHARED DIPLOTYPE CALLING
     # -----------------------------
     @classmethod
-    def evaluate(cls, parsed_variants: List[Dict], drug_name: str) -> Dict:
+    def call_genes(cls, parsed_variants: List[VariantRecord]) -> Dict[str, GeneCall]:
+        """
+        Calls gene -> diplotype once for every gene any drug needs,
+        so a multi-drug request can reuse the calls across drugs.
+        """
+        return DiplotypeCaller.call_sample(parsed_variants)
 
-        drug_name = drug_name.upper().strip()
+    @classmethod
+    def lookup_call(cls, drug_name: str, gene: str, call: Optional[GeneCall],
+                    tables: CompiledCPICTables) -> Dict:
+        """
+        Evaluation for one (drug, gene) given its diplotype call.
+        """
+        if call is None:
+            return tables.no_variant[(drug_name, gene)]
+        if call.status == CALLED:
+            return tables.lookup(drug_name, gene, call.diplotype)
+        if call.status == NOT_CALLED:
+            return tables.no_call[(drug_name, gene)]
+        return tables.ambiguous(drug_name, gene, call.stars)
+
+    # -----------------------------
+    # MULTI-DRUG EVALUATION
+    # -----------------------------
+    @classmethod
+    def evaluate_many(cls, parsed_variants: List[VariantRecord], drug_names: Iterable[str]) -> List[Dict]:
+        """
+        Evaluates several drugs against one parsed VCF. Variants are
+        called once, and every drug sees the same knowledge base snapshot.
+        """
+        gene_calls = cls.call_genes(parsed_variants)
+        snapshot = cls.snapshot()
+        return [
+            cls.evaluate(parsed_variants, drug_name, gene_calls=gene_calls, snapshot=snapshot)
+            for drug_name in drug_names
+        ]
+
+    # -----------------------------
+    # MAIN EVALUATION FUNCTION
+    # -----------------------------
+    @classmethod
+    def evaluate(
+        cls,
+        parsed_variants: List[VariantRecord],
+        drug_name: str,
+        gene_calls: Optional[Dict[str, GeneCall]] = None,
+        snapshot: Optional[KnowledgeBaseSnapshot] = None,
+    ) -> Dict:
+
+        # One snapshot for the whole evaluation, even across a reload
+        if snapshot is None:
+            snapshot = cls.snapshot()
+        tables = snapshot.tables
+        drug_name = tables.normalize_drug(drug_name)
 
         # Validate drug
-        if drug_name not in cls.DRUG_GENE_MAP:
+        if drug_name not in tables.drug_genes:
             return {
                 "drug": drug_name,
                 "evaluations": [],
                 "message": "Drug not supported by CPIC rule engine.",
+                "knowledge_base_version": snapshot.version,
             }
 
-        relevant_genes = cls.DRUG_GENE_MAP[drug_name]
-
-        # Group star alleles by gene
-        gene_star_map = defaultdict(list)
-
-        for variant in parsed_variants:
-            gene = variant.get("primary_gene")
-            star = variant.get("star_allele")
-
-            if gene in relevant_genes and star:
-                gene_star_map[gene].append(star)
-
-        results = []
-
-        # Evaluate each relevant gene
-        for gene in relevant_genes:
-            stars = sorted(gene_star_map.get(gene, []))
-
-            if not stars:
-                results.append(
-                    {
-                        "gene": gene,
-                        "diplotype": "Unknown",
-                        "phenotype": "Unknown",
-                        "drug": drug_name,
-                        "risk_label": "Unknown",
-                        "recommendation": "No variant detected for this gene.",
-                    }
-                )
-                continue
-
-            # Construct diplotype — sort canonically by numeric value so
-            # *1/*17 is built correctly (not *17/*1 from raw alphabetical sort)
-            def star_sort_key(s):
-                # Strip leading '*' and extract numeric prefix for sorting
-                numeric = ''.join(filter(lambda c: c.isdigit() or c == '.', s.lstrip('*')))
-                try:
-                    return float(numeric) if numeric else 0
-                except ValueError:
-                    return 0
-
-            stars_sorted = sorted(stars, key=star_sort_key)
-
-            if len(stars_sorted) == 1:
-                diplotype = f"{stars_sorted[0]}/{stars_sorted[0]}"
-            else:
-                diplotype = f"{stars_sorted[0]}/{stars_sorted[1]}"
-
-            # Map to phenotype (short codes PM/IM/NM/etc.)
-            # Try both orderings to handle any remaining key mismatches
-            gene_map = cls.PHENOTYPE_MAP.get(gene, {})
-            phenotype = gene_map.get(diplotype)
-            if phenotype is None and len(stars_sorted) > 1:
-                # Try reversed order
-                diplotype_rev = f"{stars_sorted[1]}/{stars_sorted[0]}"
-                phenotype = gene_map.get(diplotype_rev)
-                if phenotype is not None:
-                    diplotype = diplotype_rev
-            phenotype = phenotype or "Unknown"
-
-            # Map phenotype to drug recommendation
-            drug_info = cls.DRUG_GUIDELINES.get(drug_name, {}).get(
-                phenotype,
-                {
-                    "risk_label": "Unknown",
-                    "severity": "low",
-                    "recommendation": "No CPIC guideline available for this genotype.",
-                },
-            )
-
-            results.append(
-                {
-                    "gene": gene,
-                    "diplotype": diplotype,
-                    "phenotype": phenotype,
-                    "drug": drug_name,
-                    "risk_label": drug_info.get("risk_label", "Unknown"),
-                    "severity": drug_info.get("severity", "low"),
-                    "recommendation": drug_info.get("recommendation"),
-                }
-            )
-
-        return {"drug": drug_name, "evaluations": results}
+        relevant_genes = tables.drug_genes[drug_name]
+
+        # Call diplotypes per gene (skipped when the calls are shared)
+        if gene_calls is None:
+            gene_calls = cls.call_genes(parsed_variants)
+
+        # Evaluate each relevant gene — precompiled (drug, gene, diplotype) lookups
+        results = [
+            cls.lookup_call(drug_name, gene, gene_calls.get(gene), tables)
+            for gene in relevant_genes
+        ]
+
+        return {
+            "drug": drug_name,
+            "evaluations": results,
+            "knowledge_base_version": snapshot.version,
+        }
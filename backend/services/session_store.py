@@ -0,0 +1,295 @@
+import os
+import abc
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from services.variant_record import VariantRecord
+
+
+# -----------------------------
+# Session Configuration (env overridable)
+# -----------------------------
+# "memory" (one process) or "sqlite" (shared by processes on one host, survives restarts)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+
+# Sessions not touched for this long are dropped (every write renews them)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+# In-process store: least recently used sessions are evicted past this
+SESSION_MEMORY_BUDGET_BYTES = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024
+
+# Reports per session whose pages stay navigable (oldest dropped first)
+SESSION_MAX_REPORTS = int(os.getenv("SESSION_MAX_REPORTS", "5"))
+
+SESSION_SQLITE_PATH = os.getenv(
+    "SESSION_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sessions.sqlite3"),
+)
+
+
+class VCFSession:
+    """
+    A pre-parsed upload the user picks drugs for: the detected variants
+    only, never the VCF itself. Also holds the drugs currently selected
+    on the keyboard and the pages of recent reports keyed by report id,
+    so any process can answer the next button press under any of them.
+    """
+
+    __slots__ = ("file_id", "file_name", "variants", "created_at", "drugs", "pages")
+
+    def __init__(self, file_id: str, file_name: str, variants: List[VariantRecord],
+                 created_at: Optional[float] = None, drugs: Optional[List[str]] = None,
+                 pages: Optional[Dict[str, List[str]]] = None):
+        self.file_id = file_id
+        self.file_name = file_name
+        self.variants = variants
+        self.created_at = created_at if created_at is not None else time.time()
+        self.drugs = drugs or []
+        self.pages = pages if isinstance(pages, dict) else {}
+
+    def add_pages(self, report_id: str, pages: List[str],
+                  max_reports: int = SESSION_MAX_REPORTS) -> None:
+        self.pages[report_id] = pages
+        while len(self.pages) > max_reports:
+            del self.pages[next(iter(self.pages))]
+
+    # Blob layout version; blobs of any other version are treated as missing
+    FORMAT_VERSION = 1
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact JSON: each variant is a list of its slot values. Plain data
+        only, so a tampered store can't run code when a blob is loaded.
+        """
+        return json.dumps(
+            {
+                "v": self.FORMAT_VERSION,
+                "file_id": self.file_id,
+                "file_name": self.file_name,
+                "variants": [
+                    [getattr(variant, slot) for slot in VariantRecord.__slots__]
+                    for variant in self.variants
+                ],
+                "created_at": self.created_at,
+                "drugs": self.drugs,
+                "pages": self.pages,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "VCFSession":
+        """
+        Raises ValueError for anything that isn't a current session blob
+        (including pickled ones written by older versions).
+        """
+        try:
+            blob = json.loads(data)
+            if blob.get("v") != cls.FORMAT_VERSION:
+                raise ValueError(f"unsupported session format {blob.get('v')!r}")
+            return cls(
+                blob["file_id"],
+                blob["file_name"],
+                [VariantRecord(*row) for row in blob["variants"]],
+                blob["created_at"],
+                blob["drugs"],
+                blob["pages"],
+            )
+        except (UnicodeDecodeError, AttributeError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid session blob: {e}") from e
+
+
+class SessionStore(abc.ABC):
+    """
+    Sessions keyed by user id, serialized with VCFSession.to_bytes so
+    every backend stores the same compact blob. Backends implement the
+    raw _get / _put / _delete and stats.
+    """
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: int) -> Optional[VCFSession]:
+        data = self._get(str(key), time.time())
+        if data is None:
+            return None
+        try:
+            return VCFSession.from_bytes(data)
+        except ValueError:
+            # Unreadable (e.g. written by an older version): start over
+            self._delete(str(key))
+            return None
+
+    def put(self, key: int, session: VCFSession) -> None:
+        self._put(str(key), session.to_bytes(), time.time() + self.ttl_seconds)
+
+    def pop(self, key: int) -> Optional[VCFSession]:
+        session = self.get(key)
+        if session is not None:
+            self.delete(key)
+        return session
+
+    def delete(self, key: int) -> None:
+        self._delete(str(key))
+
+    @abc.abstractmethod
+    def _get(self, key: str, now: float) -> Optional[bytes]:
+        """
+        The blob stored under key, or None if missing or expired at now.
+        """
+
+    @abc.abstractmethod
+    def _put(self, key: str, data: bytes, expires_at: float) -> None:
+        """
+        Stores (or replaces) the blob under key until expires_at.
+        """
+
+    @abc.abstractmethod
+    def _delete(self, key: str) -> None:
+        """
+        Removes key if present.
+        """
+
+    @abc.abstractmethod
+    def stats(self) -> Dict:
+        """
+        Backend name and size counters for the stats endpoint.
+        """
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process LRU bounded by TTL and by the total size of the stored
+    blobs. Lost on restart and not shared between workers.
+    """
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 budget_bytes: int = SESSION_MEMORY_BUDGET_BYTES):
+        super().__init__(ttl_seconds)
+        self.budget_bytes = budget_bytes
+        self.bytes = 0
+        self.evicted = 0
+        self._sessions: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Optional[bytes]:
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._remove(key)
+                return None
+            self._sessions.move_to_end(key)
+            return entry[1]
+
+    def _put(self, key: str, data: bytes, expires_at: float) -> None:
+        with self._lock:
+            self._remove(key)
+            self._sessions[key] = (expires_at, data)
+            self.bytes += len(data)
+            self._evict(time.time())
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._sessions.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def _evict(self, now: float) -> None:
+        for key in [key for key, (expires_at, _) in self._sessions.items() if expires_at <= now]:
+            self._remove(key)
+
+        # Over budget: least recently used first (the newest one always stays)
+        while self.bytes > self.budget_bytes and len(self._sessions) > 1:
+            key = next(iter(self._sessions))
+            self._remove(key)
+            self.evicted += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self.bytes,
+                "budget_bytes": self.budget_bytes,
+                "evicted": self.evicted,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file (WAL): shared by every process on the host
+    and kept across restarts. Expired rows are purged on write.
+    """
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+
+    def _get(self, key: str, now: float) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM sessions WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def _put(self, key: str, data: bytes, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, expires_at, data) VALUES (?, ?, ?)",
+                (key, expires_at, data),
+            )
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchone()
+        return {"backend": "sqlite", "path": self.path, "sessions": count, "bytes": size}
+
+
+# -----------------------------
+# Process-wide Instance
+# -----------------------------
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """
+    Shared store selected by SESSION_STORE.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_STORE == "sqlite":
+                    _store = SQLiteSessionStore()
+                elif SESSION_STORE == "memory":
+                    _store = InMemorySessionStore()
+                else:
+                    raise ValueError(f"Unknown SESSION_STORE '{SESSION_STORE}' (use memory or sqlite)")
+    return _store
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Warm-up Retries (env overridable)
+# -----------------------------
+# A failed required step is retried after this delay, doubling up to the max
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "1"))
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "60"))
+
+
+class StartupWarmup:
+    """
+    Readiness behind GET /ready: the lifespan runs the slow startup steps
+    (knowledge base, explanation artifact, LLM client) as a background
+    task, so the server accepts connections — and answers GET / — as soon
+    as the app module is imported.
+
+    Required steps are retried with backoff until they pass; best-effort
+    steps only warm caches the request path can fill itself, so their
+    failures are recorded in `degraded` and do not hold readiness back.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self.degraded: Dict[str, str] = {}
+        self.attempts: Dict[str, int] = {}
+
+    async def run(self, steps: List[Tuple[str, Callable[[], Awaitable]]],
+                  best_effort: Iterable[str] = ()) -> None:
+        """
+        Runs the steps in order, recording seconds per step. `error`
+        holds the failure a required step is currently being retried for.
+        """
+        best_effort = set(best_effort)
+
+        for name, step in steps:
+            delay = STARTUP_RETRY_SECONDS
+            while True:
+                self.attempts[name] = self.attempts.get(name, 0) + 1
+                start = time.perf_counter()
+                try:
+                    await step()
+                except Exception as e:
+                    logger.exception("Startup step %s failed", name)
+                    if name in best_effort:
+                        self.degraded[name] = str(e)
+                        break
+                    self.error = f"{name}: {e}"
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, STARTUP_RETRY_MAX_SECONDS)
+                    continue
+
+                self.error = None
+                self.steps[name] = round(time.perf_counter() - start, 4)
+                break
+
+        self.finished_at = time.time()
+        self.ready = True
+        logger.info("Ready in %.2fs %s", self.finished_at - self.started_at, self.steps)
+
+    def status(self) -> Dict:
+        return {
+            "status": "ready" if self.ready else "starting",
+            "error": self.error,
+            "degraded": dict(self.degraded),
+            "attempts": dict(self.attempts),
+            "steps": dict(self.steps),
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 4),
+        }
@@ -0,0 +1,543 @@
+import io
+import os
+import zlib
+import struct
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from services.vcf_parcer import PharmaGuardVCFParser, VCFStreamParser, VCFFileTooLargeError
+from services.variant_record import VariantRecord
+
+
+# -----------------------------
+# BGZF Constants
+# -----------------------------
+BGZF_HEADER_SIZE = 18
+BGZF_FOOTER_SIZE = 8
+
+# Max uncompressed payload per block (htslib uses the same value)
+BGZF_BLOCK_DATA_SIZE = 0xFF00
+
+# Standard 28-byte empty block that terminates every BGZF file
+BGZF_EOF = bytes.fromhex(
+    "1f8b08040000000000ff0600424302001b0003000000000000000000"
+)
+
+# Tabix linear index window (16 kb)
+TABIX_LINEAR_SHIFT = 14
+
+
+class BGZFError(ValueError):
+    """
+    Raised for malformed BGZF blocks or tabix indexes.
+    """
+
+
+# -----------------------------
+# UCSC Binning Scheme (SAM/tabix spec)
+# -----------------------------
+def reg2bin(beg: int, end: int) -> int:
+    """
+    Smallest bin fully containing the 0-based, half-open interval [beg, end).
+    """
+    end -= 1
+    if beg >> 14 == end >> 14:
+        return ((1 << 15) - 1) // 7 + (beg >> 14)
+    if beg >> 17 == end >> 17:
+        return ((1 << 12) - 1) // 7 + (beg >> 17)
+    if beg >> 20 == end >> 20:
+        return ((1 << 9) - 1) // 7 + (beg >> 20)
+    if beg >> 23 == end >> 23:
+        return ((1 << 6) - 1) // 7 + (beg >> 23)
+    if beg >> 26 == end >> 26:
+        return ((1 << 3) - 1) // 7 + (beg >> 26)
+    return 0
+
+
+def reg2bins(beg: int, end: int) -> List[int]:
+    """
+    Every bin that may hold records overlapping [beg, end).
+    """
+    end -= 1
+    bins = [0]
+    for shift, offset in ((26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)):
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+    return bins
+
+
+# -----------------------------
+# BGZF Block Reader
+# -----------------------------
+class BGZFReader:
+    """
+    Random-access reader over a BGZF file using virtual offsets
+    (compressed block offset << 16 | offset inside the block).
+    Only the blocks that are actually visited get decompressed.
+    """
+
+    def __init__(self, fileobj: BinaryIO, cache_blocks: int = 8):
+        self.fileobj = fileobj
+        self.cache_blocks = cache_blocks
+        self.blocks_decompressed = 0
+
+        # coffset -> (uncompressed data, compressed block size)
+        self._cache: "OrderedDict[int, Tuple[bytes, int]]" = OrderedDict()
+
+    def read_block(self, coffset: int) -> Tuple[bytes, int]:
+        """
+        Returns (uncompressed data, compressed size) of the block at coffset.
+        """
+        cached = self._cache.get(coffset)
+        if cached is not None:
+            self._cache.move_to_end(coffset)
+            return cached
+
+        self.fileobj.seek(coffset)
+        header = self.fileobj.read(BGZF_HEADER_SIZE)
+        if not header:
+            return b"", 0
+        if len(header) < BGZF_HEADER_SIZE or header[:4] != b"\x1f\x8b\x08\x04":
+            raise BGZFError(f"Not a BGZF block at offset {coffset}.")
+
+        xlen = struct.unpack_from("<H", header, 10)[0]
+        extra = header[12:] + self.fileobj.read(xlen - 6)
+
+        block_size = None
+        pos = 0
+        while pos + 4 <= len(extra):
+            si1, si2, slen = extra[pos], extra[pos + 1], struct.unpack_from("<H", extra, pos + 2)[0]
+            if si1 == 66 and si2 == 67 and slen == 2:
+                block_size = struct.unpack_from("<H", extra, pos + 4)[0] + 1
+                break
+            pos += 4 + slen
+
+        if block_size is None:
+            raise BGZFError(f"Missing BGZF BC field at offset {coffset}.")
+
+        cdata_size = block_size - xlen - 12 - BGZF_FOOTER_SIZE
+        cdata = self.fileobj.read(cdata_size)
+        footer = self.fileobj.read(BGZF_FOOTER_SIZE)
+        crc, isize = struct.unpack("<II", footer)
+
+        # Never inflate past the declared size (at most 64 KB per block)
+        data = zlib.decompressobj(-15).decompress(cdata, isize + 1) if isize else b""
+        if len(data) != isize or zlib.crc32(data) != crc:
+            raise BGZFError(f"Corrupt BGZF block at offset {coffset}.")
+
+        self.blocks_decompressed += 1
+        self._cache[coffset] = (data, block_size)
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+
+        return data, block_size
+
+    def iter_lines(self, voffset: int) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yields (virtual offset of line start, line bytes) from voffset on.
+        Lines may span block boundaries.
+        """
+        coffset, uoffset = voffset >> 16, voffset & 0xFFFF
+        pending = b""
+        line_start = voffset
+
+        while True:
+            data, block_size = self.read_block(coffset)
+            if block_size == 0:
+                break
+
+            while uoffset < len(data):
+                newline = data.find(b"\n", uoffset)
+                if newline < 0:
+                    pending += data[uoffset:]
+                    break
+
+                yield line_start, pending + data[uoffset:newline]
+                pending = b""
+                uoffset = newline + 1
+
+                # The next line starts right after the newline
+                if uoffset < len(data):
+                    line_start = (coffset << 16) | uoffset
+                else:
+                    line_start = (coffset + block_size) << 16
+
+            coffset += block_size
+            uoffset = 0
+
+        if pending:
+            yield line_start, pending
+
+    def read_all(self) -> Iterator[bytes]:
+        """
+        Sequentially yields the uncompressed payload of every block.
+        """
+        coffset = 0
+        while True:
+            data, block_size = self.read_block(coffset)
+            if block_size == 0:
+                return
+            if data:
+                yield data
+            coffset += block_size
+
+
+# -----------------------------
+# Tabix Index
+# -----------------------------
+class TabixIndex:
+    """
+    Parsed .tbi index: per-reference bins of chunks plus the 16 kb
+    linear index used to skip chunks that end before the query.
+    """
+
+    def __init__(self, names: List[str], bins: List[Dict[int, List[Tuple[int, int]]]],
+                 linear: List[List[int]], meta_char: str = "#"):
+        self.names = names
+        self.bins = bins
+        self.linear = linear
+        self.meta_char = meta_char
+        self.name_to_rid = {name: rid for rid, name in enumerate(names)}
+
+    @classmethod
+    def load(cls, fileobj: BinaryIO) -> "TabixIndex":
+        """
+        Reads a BGZF-compressed .tbi index from a binary file object.
+        """
+        raw = b"".join(BGZFReader(fileobj, cache_blocks=1).read_all())
+        if raw[:4] != b"TBI\x01":
+            raise BGZFError("Not a tabix index (bad magic).")
+
+        n_ref, _fmt, _col_seq, _col_beg, _col_end, meta, _skip, l_nm = struct.unpack_from("<8i", raw, 4)
+        pos = 36
+        names = raw[pos:pos + l_nm].rstrip(b"\x00").decode("utf-8").split("\x00") if l_nm else []
+        pos += l_nm
+
+        bins, linear = [], []
+        for _ in range(n_ref):
+            (n_bin,) = struct.unpack_from("<i", raw, pos)
+            pos += 4
+
+            ref_bins = {}
+            for _ in range(n_bin):
+                bin_id, n_chunk = struct.unpack_from("<Ii", raw, pos)
+                pos += 8
+                chunks = list(struct.iter_unpack("<QQ", raw[pos:pos + 16 * n_chunk]))
+                pos += 16 * n_chunk
+                ref_bins[bin_id] = chunks
+
+            (n_intv,) = struct.unpack_from("<i", raw, pos)
+            pos += 4
+            ioffs = list(struct.unpack_from(f"<{n_intv}Q", raw, pos))
+            pos += 8 * n_intv
+
+            bins.append(ref_bins)
+            linear.append(ioffs)
+
+        return cls(names, bins, linear, chr(meta))
+
+    def resolve(self, chrom: str) -> Optional[int]:
+        """
+        Reference id for a chromosome, tolerating the "chr" prefix mismatch.
+        """
+        for candidate in (chrom, f"chr{chrom}", chrom[3:] if chrom.lower().startswith("chr") else None):
+            if candidate is not None and candidate in self.name_to_rid:
+                return self.name_to_rid[candidate]
+        return None
+
+    def chunks(self, rid: int, beg: int, end: int) -> List[Tuple[int, int]]:
+        """
+        Merged, sorted virtual-offset chunks that may overlap [beg, end).
+        """
+        ref_bins = self.bins[rid]
+        ioffs = self.linear[rid]
+        window = beg >> TABIX_LINEAR_SHIFT
+        min_offset = ioffs[window] if window < len(ioffs) else (ioffs[-1] if ioffs else 0)
+
+        candidates = sorted(
+            chunk
+            for bin_id in reg2bins(beg, end)
+            for chunk in ref_bins.get(bin_id, ())
+            if chunk[1] > min_offset
+        )
+
+        merged: List[Tuple[int, int]] = []
+        for chunk_beg, chunk_end in candidates:
+            if merged and chunk_beg <= merged[-1][1]:
+                if chunk_end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], chunk_end)
+            else:
+                merged.append((chunk_beg, chunk_end))
+
+        return merged
+
+
+# -----------------------------
+# Indexed VCF Reader
+# -----------------------------
+class PharmaGuardTabixReader:
+    """
+    Reads bgzip-compressed VCFs. With a tabix index it seeks straight to
+    the PGx loci and decompresses only the overlapping blocks; without
+    one it falls back to a streaming decompress + linear parse.
+    """
+
+    @staticmethod
+    def _open(source: Union[str, BinaryIO]) -> Tuple[BinaryIO, bool]:
+        if isinstance(source, (str, os.PathLike)):
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"File not found at: {source}")
+            return open(source, "rb"), True
+        return source, False
+
+    @staticmethod
+    def query(reader: BGZFReader, index: TabixIndex, chrom: str, start: int, end: int) -> Iterator[str]:
+        """
+        Yields VCF lines whose POS (1-based) lies in [start, end].
+        """
+        rid = index.resolve(chrom)
+        if rid is None:
+            return
+
+        beg0, end0 = start - 1, end
+        for chunk_beg, chunk_end in index.chunks(rid, beg0, end0):
+            for voffset, raw_line in reader.iter_lines(chunk_beg):
+                if voffset >= chunk_end:
+                    break
+
+                line = raw_line.decode("utf-8")
+                if line.startswith(index.meta_char):
+                    continue
+
+                fields = line.split("\t", 2)
+                if len(fields) < 3:
+                    continue
+
+                pos = int(fields[1])
+                if pos > end:
+                    break
+                if pos >= start:
+                    yield line
+
+    @staticmethod
+    def read_header(reader: BGZFReader) -> List[str]:
+        """
+        The leading '#' lines of the file (stops at the first record).
+        """
+        header = []
+        for _, raw_line in reader.iter_lines(0):
+            line = raw_line.decode("utf-8")
+            if not line.startswith("#"):
+                break
+            header.append(line)
+        return header
+
+    @staticmethod
+    def parse_indexed_vcf(vcf_source: Union[str, BinaryIO],
+                          index_source: Union[str, BinaryIO, None] = None,
+                          with_raw_info: bool = True,
+                          max_inflated_bytes: Optional[int] = None) -> List[VariantRecord]:
+        """
+        Parses a .vcf.gz using its tabix index (defaults to "<vcf>.tbi"),
+        returning the same VariantRecords as PharmaGuardVCFParser.
+        max_inflated_bytes bounds the full-scan fallback for other builds.
+        """
+        if index_source is None:
+            if not isinstance(vcf_source, (str, os.PathLike)):
+                raise ValueError("A tabix index is required for file-object input.")
+            index_source = f"{vcf_source}.tbi"
+
+        vcf_file, close_vcf = PharmaGuardTabixReader._open(vcf_source)
+        index_file, close_index = PharmaGuardTabixReader._open(index_source)
+
+        try:
+            index = TabixIndex.load(index_file)
+            reader = BGZFReader(vcf_file)
+
+            # Region lookups assume GRCh38 — other builds need a full scan
+            header = PharmaGuardTabixReader.read_header(reader)
+            if any(PharmaGuardVCFParser.declares_other_build(line) for line in header):
+                stream_parser = VCFStreamParser(
+                    max_bytes=max_inflated_bytes, use_positions=False, with_raw_info=with_raw_info
+                )
+                for block in reader.read_all():
+                    stream_parser.feed(block)
+                return stream_parser.close()
+
+            flank = PharmaGuardVCFParser.PGX_LOCI.get("flank", 0)
+            detected_variants = []
+
+            for gene, locus in PharmaGuardVCFParser.PGX_LOCI["genes"].items():
+                region_lines = PharmaGuardTabixReader.query(
+                    reader, index, locus["chrom"],
+                    max(1, locus["start"] - flank), locus["end"] + flank,
+                )
+                detected_variants.extend(PharmaGuardVCFParser.parse_lines(
+                    region_lines, with_raw_info=with_raw_info
+                ))
+
+            return detected_variants
+
+        finally:
+            if close_vcf:
+                vcf_file.close()
+            if close_index:
+                index_file.close()
+
+    @staticmethod
+    async def parse_gzip_upload(upload, max_bytes: Optional[int] = None,
+                                chunk_size: int = PharmaGuardVCFParser.STREAM_CHUNK_SIZE,
+                                stream_parser: Optional[VCFStreamParser] = None,
+                                max_inflated_bytes: Optional[int] = None) -> List[VariantRecord]:
+        """
+        Streams a (b)gzip upload through the VCF stream parser without an
+        index. max_bytes applies to the compressed upload and
+        max_inflated_bytes to the text it expands to, so a small gzip bomb
+        is rejected as it inflates. A stream that ends mid-member is
+        rejected as truncated.
+        """
+        if stream_parser is None:
+            stream_parser = VCFStreamParser()
+        stream_parser.max_bytes = max_inflated_bytes
+
+        decompressor = zlib.decompressobj(wbits=31)
+        in_member = False
+        received = 0
+
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+
+            received += len(chunk)
+            if max_bytes is not None and received > max_bytes:
+                raise VCFFileTooLargeError(f"VCF upload exceeds the {max_bytes} byte limit.")
+
+            # Inflate at most chunk_size at a time; the parser counts every
+            # inflated byte against max_inflated_bytes
+            while chunk:
+                in_member = True
+                await stream_parser.afeed(decompressor.decompress(chunk, chunk_size))
+                if decompressor.eof:
+                    # BGZF is a series of gzip members — restart at each boundary
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=31)
+                    in_member = False
+                else:
+                    chunk = decompressor.unconsumed_tail
+
+        if in_member:
+            raise BGZFError("Compressed VCF is truncated (gzip stream ended early).")
+
+        return await stream_parser.aclose()
+
+
+# -----------------------------
+# Fixture Generation (bgzip / tabix -p vcf equivalents)
+# -----------------------------
+def _bgzf_block(data: bytes) -> bytes:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    cdata = compressor.compress(data) + compressor.flush()
+    block_size = len(cdata) + BGZF_HEADER_SIZE + BGZF_FOOTER_SIZE
+
+    header = struct.pack(
+        "<BBBBIBBHBBHH", 0x1F, 0x8B, 8, 4, 0, 0, 0xFF, 6, 66, 67, 2, block_size - 1
+    )
+    footer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + cdata + footer
+
+
+def write_bgzf_vcf(lines: List[str], fileobj: BinaryIO) -> Tuple[List[Tuple[str, int, int, int]], int]:
+    """
+    Writes VCF lines as BGZF. Returns (chrom, pos, ref_len, voffset) for
+    every record plus the virtual offset just past the last record, which
+    is what build_tabix_index needs.
+    """
+    records = []
+    buffer = bytearray()
+    coffset = 0
+
+    def flush():
+        nonlocal coffset, buffer
+        block = _bgzf_block(bytes(buffer))
+        fileobj.write(block)
+        coffset += len(block)
+        buffer = bytearray()
+
+    for line in lines:
+        encoded = (line.rstrip("\n") + "\n").encode("utf-8")
+        if len(buffer) + len(encoded) > BGZF_BLOCK_DATA_SIZE and buffer:
+            flush()
+
+        if not line.startswith("#"):
+            fields = line.split("\t", 4)
+            records.append((fields[0], int(fields[1]), len(fields[3]), (coffset << 16) | len(buffer)))
+
+        # Very long lines span blocks, exactly like bgzip
+        while len(buffer) + len(encoded) > BGZF_BLOCK_DATA_SIZE:
+            room = BGZF_BLOCK_DATA_SIZE - len(buffer)
+            buffer += encoded[:room]
+            encoded = encoded[room:]
+            flush()
+        buffer += encoded
+
+    if buffer:
+        flush()
+    fileobj.write(BGZF_EOF)
+    return records, coffset << 16
+
+
+def build_tabix_index(records: List[Tuple[str, int, int, int]], end_voffset: int) -> bytes:
+    """
+    Builds a VCF-preset .tbi (BGZF-compressed) from write_bgzf_vcf records.
+    end_voffset is the virtual offset just past the last record.
+    """
+    names: List[str] = []
+    bins: List[Dict[int, List[List[int]]]] = []
+    linear: List[List[int]] = []
+
+    for i, (chrom, pos, ref_len, voffset) in enumerate(records):
+        next_voffset = records[i + 1][3] if i + 1 < len(records) else end_voffset
+        if not names or names[-1] != chrom:
+            names.append(chrom)
+            bins.append({})
+            linear.append([])
+
+        beg, end = pos - 1, pos - 1 + max(ref_len, 1)
+        chunks = bins[-1].setdefault(reg2bin(beg, end), [])
+        if chunks and chunks[-1][1] == voffset:
+            chunks[-1][1] = next_voffset
+        else:
+            chunks.append([voffset, next_voffset])
+
+        ioffs = linear[-1]
+        for window in range(beg >> TABIX_LINEAR_SHIFT, ((end - 1) >> TABIX_LINEAR_SHIFT) + 1):
+            while len(ioffs) <= window:
+                ioffs.append(0)
+            if ioffs[window] == 0:
+                ioffs[window] = voffset
+
+    # Empty windows inherit the previous offset
+    for ioffs in linear:
+        for window in range(1, len(ioffs)):
+            if ioffs[window] == 0:
+                ioffs[window] = ioffs[window - 1]
+
+    name_blob = b"".join(name.encode("utf-8") + b"\x00" for name in names)
+    out = bytearray(b"TBI\x01")
+    out += struct.pack("<8i", len(names), 2, 1, 2, 0, ord("#"), 0, len(name_blob))
+    out += name_blob
+
+    for ref_bins, ioffs in zip(bins, linear):
+        out += struct.pack("<i", len(ref_bins))
+        for bin_id, chunks in sorted(ref_bins.items()):
+            out += struct.pack("<Ii", bin_id, len(chunks))
+            for chunk_beg, chunk_end in chunks:
+                out += struct.pack("<QQ", chunk_beg, chunk_end)
+        out += struct.pack("<i", len(ioffs))
+        out += struct.pack(f"<{len(ioffs)}Q", *ioffs)
+
+    compressed = io.BytesIO()
+    for start in range(0, len(out), BGZF_BLOCK_DATA_SIZE):
+        compressed.write(_bgzf_block(bytes(out[start:start + BGZF_BLOCK_DATA_SIZE])))
+    compressed.write(BGZF_EOF)
+    return compressed.getvalue()
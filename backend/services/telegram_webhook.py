@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import asyncio
+import logging
+import secrets
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Webhook Configuration (env overridable)
+# -----------------------------
+# Public https base URL of this API; set it to run the bot as a webhook
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "").rstrip("/")
+TELEGRAM_WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
+
+# Sent back by Telegram in SECRET_HEADER on every update. Required: without
+# it anyone could POST updates posing as any user (and read their reports)
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+
+# Replicas behind one URL: one registration is enough, the rest may set 0
+TELEGRAM_WEBHOOK_REGISTER = os.getenv("TELEGRAM_WEBHOOK_REGISTER", "1").lower() not in ("0", "false", "no")
+
+# Updates accepted but not yet handled; past this Telegram gets 503 and redelivers
+TELEGRAM_UPDATE_QUEUE_SIZE = int(os.getenv("TELEGRAM_UPDATE_QUEUE_SIZE", "1000"))
+
+# Parallel connections Telegram opens to the webhook (1-100)
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Characters and length Telegram accepts for secret_token
+SECRET_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+class WebhookConfigError(RuntimeError):
+    """
+    Raised when webhook mode is enabled without a usable secret.
+    """
+
+
+class InvalidUpdateError(ValueError):
+    """
+    Raised for a webhook body that is not a Telegram update.
+    """
+
+
+def require_secret(secret: Optional[str]) -> str:
+    """
+    The webhook secret, or WebhookConfigError when it is missing or not
+    something Telegram would accept as secret_token.
+    """
+    if not SECRET_PATTERN.fullmatch(secret or ""):
+        raise WebhookConfigError(
+            "TELEGRAM_WEBHOOK_SECRET must be set (1-256 characters: A-Z, a-z, 0-9, _ or -) "
+            "to run the bot as a webhook."
+        )
+    return secret
+
+
+class TelegramWebhook:
+    """
+    Runs the bot inside the API process: Telegram POSTs updates to
+    TELEGRAM_WEBHOOK_PATH, the route only verifies and enqueues them, and
+    the application's own update loop handles them (concurrently, see
+    TELEGRAM_CONCURRENT_UPDATES). No long-polling connection is held, and
+    any replica behind the webhook URL can take any update.
+    """
+
+    def __init__(self, application, secret: str = TELEGRAM_WEBHOOK_SECRET):
+        self.application = application
+        self.secret = require_secret(secret)
+        self.accepted = 0
+        self.rejected = 0
+        self.invalid = 0
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    @classmethod
+    def create(cls, queue_size: int = TELEGRAM_UPDATE_QUEUE_SIZE,
+               secret: str = TELEGRAM_WEBHOOK_SECRET) -> "TelegramWebhook":
+        require_secret(secret)
+
+        # Same import path as main_telegram.py; telegram is only needed here
+        from services.telegram_bot import create_telegram_bot
+
+        return cls(create_telegram_bot(update_queue=asyncio.Queue(maxsize=queue_size)), secret)
+
+    async def start(self, url: str = TELEGRAM_WEBHOOK_URL, register: bool = TELEGRAM_WEBHOOK_REGISTER) -> None:
+        await self.application.initialize()
+        await self.application.start()
+
+        if register:
+            from telegram import Update
+
+            await self.application.bot.set_webhook(
+                url=url + TELEGRAM_WEBHOOK_PATH,
+                secret_token=self.secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+            )
+        logger.info("🤖 Telegram webhook active at %s%s", url, TELEGRAM_WEBHOOK_PATH)
+
+    async def stop(self) -> None:
+        # The webhook stays registered: other replicas keep serving it
+        await self.application.stop()
+        await self.application.shutdown()
+
+    # -----------------------------
+    # Updates
+    # -----------------------------
+    def verify(self, token: Optional[str]) -> bool:
+        return secrets.compare_digest((token or "").encode(), self.secret.encode())
+
+    def enqueue(self, body: bytes) -> bool:
+        """
+        Queues one raw update body. False when the queue is full, so the
+        caller can ask Telegram to redeliver it later; InvalidUpdateError
+        when the body is not an update (nothing malformed reaches the bot).
+        """
+        from telegram import Update
+
+        try:
+            payload = json.loads(body)
+            if not isinstance(payload, dict) or not isinstance(payload.get("update_id"), int):
+                raise ValueError("not an update object")
+            update = Update.de_json(payload, self.application.bot)
+        except Exception as e:
+            self.invalid += 1
+            raise InvalidUpdateError(f"Malformed Telegram update: {e}") from e
+
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+        self.accepted += 1
+        return True
+
+    def stats(self) -> Dict:
+        queue = self.application.update_queue
+        return {
+            "queued": queue.qsize(),
+            "max_queued": queue.maxsize,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+        }
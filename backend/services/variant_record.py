@@ -0,0 +1,84 @@
+import sys
+from typing import Dict, List, Optional
+
+
+class VariantRecord:
+    """
+    One detected pharmacogenomic variant, as produced by the VCF parser
+    and consumed by the rule engine and response builder.
+
+    Slotted, with interned gene / star / chromosome strings (a handful of
+    distinct values shared by every record) and an integer position, so
+    a record costs a fraction of the equivalent dict. Convert with
+    to_dict() only at the API boundary.
+    """
+
+    __slots__ = (
+        "primary_gene",
+        "star_allele",
+        "rsid",
+        "chromosome",
+        "position",
+        "raw_info",
+        "genotypes",
+        "genotype",
+    )
+
+    # Public fields, in DetectedVariant order
+    FIELDS = ("primary_gene", "star_allele", "rsid", "chromosome", "position", "raw_info")
+
+    def __init__(
+        self,
+        primary_gene: str,
+        star_allele: Optional[str],
+        rsid: str,
+        chromosome: str,
+        position: Optional[int],
+        raw_info: Optional[str] = None,
+        genotypes: Optional[List[str]] = None,
+        genotype: Optional[str] = None,
+    ):
+        intern = sys.intern
+        self.primary_gene = intern(primary_gene)
+        self.star_allele = intern(star_allele) if star_allele else None
+        self.rsid = rsid
+        self.chromosome = intern(chromosome)
+        self.position = position
+
+        # INFO column, kept only when the caller asked for debug output
+        self.raw_info = raw_info
+
+        # Multi-sample parse: GT per sample column; otherwise the sample's own GT
+        self.genotypes = genotypes
+        self.genotype = intern(genotype) if genotype else genotype
+
+    def to_dict(self) -> Dict:
+        """
+        DetectedVariant-shaped dict (position as a string, as before).
+        """
+        return {
+            "primary_gene": self.primary_gene,
+            "star_allele": self.star_allele,
+            "rsid": self.rsid,
+            "chromosome": self.chromosome,
+            "position": str(self.position) if self.position is not None else None,
+            "raw_info": self.raw_info,
+        }
+
+    def __reduce__(self):
+        # Re-run __init__ on unpickle so records parsed in worker processes
+        # share the parent's interned strings
+        return (VariantRecord, tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, VariantRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"VariantRecord({self.primary_gene} {self.star_allele} {self.rsid} "
+            f"{self.chromosome}:{self.position})"
+        )
@@ -1,4 +1,71 @@
 import os
+import json
+import codecs
+import asyncio
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.variant_record import VariantRecord
+
+
+# Longest line the stream parser buffers while waiting for its newline
+# (characters); real rows, even with thousands of samples, are far shorter
+VCF_MAX_LINE_LENGTH = int(os.getenv("VCF_MAX_LINE_KB", "4096")) * 1024
+
+
+class VCFFileTooLargeError(ValueError):
+    """
+    Raised when a streamed VCF upload grows past the allowed byte limit.
+    """
+
+
+class VCFLineTooLongError(ValueError):
+    """
+    Raised when a line grows past VCF_MAX_LINE_LENGTH without a newline.
+    """
+
+
+def _build_region_index(pgx_loci: Dict) -> Dict[str, Tuple[List[int], List[Tuple[int, str]]]]:
+    """
+    Turns the locus table into chrom -> (sorted starts, [(end, gene)]) so a
+    position can be resolved with a single bisect. Both "22" and "chr22"
+    spellings are indexed to avoid normalizing CHROM on every line.
+    """
+    flank = pgx_loci.get("flank", 0)
+    per_chrom = {}
+
+    for gene, locus in pgx_loci["genes"].items():
+        per_chrom.setdefault(locus["chrom"], []).append(
+            (locus["start"] - flank, locus["end"] + flank, gene)
+        )
+
+    index = {}
+    for chrom, regions in per_chrom.items():
+        regions.sort()
+        entry = ([start for start, _, _ in regions], [(end, gene) for _, end, gene in regions])
+        for alias in (chrom, f"chr{chrom}", f"CHR{chrom}"):
+            index[alias] = entry
+
+    return index
+
+
+def _build_star_lookups(pgx_loci: Dict) -> Tuple[Dict[str, str], Dict[Tuple[str, int], str]]:
+    """
+    Star-defining variants keyed by rsID and by (gene, position), used when
+    the VCF carries no STAR annotation.
+    """
+    by_rsid = {}
+    by_position = {}
+
+    for gene, locus in pgx_loci["genes"].items():
+        for allele in locus.get("star_alleles", []):
+            by_rsid[allele["rsid"]] = allele["star"]
+            by_position[(gene, allele["position"])] = allele["star"]
+
+    return by_rsid, by_position
+
 
 class PharmaGuardVCFParser:
     """
@@ -7,65 +74,501 @@ class PharmaGuardVCFParser:
     # The 6 critical genes required for the RIFT 2026 hackathon
     TARGET_GENES = {"CYP2D6", "CYP2C19", "CYP2C9", "SLCO1B1", "TPMT", "DPYD"}
 
+    # -----------------------------
+    # GRCh38 locus table for the positional pre-filter
+    # -----------------------------
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    DATA_DIR = os.path.join(BASE_DIR, "data")
+
+    try:
+        with open(os.path.join(DATA_DIR, "pgx_loci.json"), "r") as f:
+            PGX_LOCI = json.load(f)
+    except Exception as e:
+        raise RuntimeError(f"Failed to load PGx locus table: {e}")
+
+    REGION_INDEX = _build_region_index(PGX_LOCI)
+    STAR_BY_RSID, STAR_BY_POSITION = _build_star_lookups(PGX_LOCI)
+
+    # Header markers of assemblies the locus table does NOT apply to
+    OTHER_BUILD_MARKERS = ("grch37", "hg19", "b37", "hs37", "ncbi36", "hg18")
+
+    # Bytes pulled from an upload per read when streaming
+    STREAM_CHUNK_SIZE = 64 * 1024
+
     @staticmethod
-    def parse_vcf(file_path: str) -> list[dict]:
+    def parse_vcf(file_path: str, with_raw_info: bool = True) -> List[VariantRecord]:
         """
-        Reads a VCF file and returns a list of dictionaries containing
-        the parsed target variants.
+        Reads a VCF file and returns a VariantRecord for every parsed
+        target variant.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"VCF file not found at: {file_path}")
 
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return PharmaGuardVCFParser.parse_lines(file, with_raw_info=with_raw_info)
+
+    @staticmethod
+    def parse_bytes(data: bytes, max_bytes: Optional[int] = None,
+                    with_raw_info: bool = True) -> List[VariantRecord]:
+        """
+        Parses a VCF already held in memory (e.g. a chat attachment)
+        without writing it to disk.
+        """
+        stream_parser = VCFStreamParser(max_bytes=max_bytes, with_raw_info=with_raw_info)
+        stream_parser.feed(bytes(data))
+        return stream_parser.close()
+
+    @staticmethod
+    async def parse_upload(
+        upload,
+        max_bytes: Optional[int] = None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        stream_parser: Optional["VCFStreamParser"] = None,
+    ) -> List[VariantRecord]:
+        """
+        Streams an uploaded file (anything with an async `read(size)`,
+        e.g. FastAPI's UploadFile) through the parser chunk by chunk.
+        Starlette has already spooled the request body (memory, then a
+        temp file past 1 MB); this adds no copy of its own and never
+        holds the whole file as one bytes object.
+        Pass a preconfigured stream_parser to read back header state
+        such as sample_ids afterwards.
+        """
+        if stream_parser is None:
+            stream_parser = VCFStreamParser()
+        stream_parser.max_bytes = max_bytes
+
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            await stream_parser.afeed(chunk)
+
+        return await stream_parser.aclose()
+
+    @staticmethod
+    def parse_lines(lines: Iterable[str], use_positions: bool = True,
+                    with_raw_info: bool = True) -> List[VariantRecord]:
+        """
+        Parses an iterable of raw VCF lines (file object, list, generator).
+        The positional pre-filter is switched off automatically when the
+        header declares a reference build other than GRCh38.
+        """
         detected_variants = []
+        parse_line = PharmaGuardVCFParser.parse_line
 
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                # 1. Skip metadata and header lines
-                if line.startswith('#'):
-                    continue
-
-                # 2. Split the data row by tabs (VCFs are tab-delimited)
-                columns = line.strip().split('\t')
-
-                # Ensure the row has at least the 8 standard columns (up to INFO)
-                if len(columns) < 8:
-                    continue
-
-                # 3. Isolate the 8th column (index 7), which is the INFO column
-                info_column = columns[7]
-
-                # 4. Parse the INFO column into a dictionary
-                # INFO tags are separated by semicolons (e.g., GENE=CYP2C19;STAR=*2)
-                info_dict = {}
-                for item in info_column.split(';'):
-                    if '=' in item:
-                        key, value = item.split('=', 1)
-                        info_dict[key] = value
-                    else:
-                        # Handle boolean flags in INFO (tags without an '=' sign)
-                        info_dict[item] = True
-
-                # 5. Extract our specific target tags
-                gene = info_dict.get('GENE')
-                star_allele = info_dict.get('STAR')
-
-                # If RS tag isn't in INFO, fallback to the 3rd column (ID)
-                rsid = info_dict.get('RS') or columns[2]
-
-                # 6. Filter only the genes we care about
-                if gene in PharmaGuardVCFParser.TARGET_GENES:
-                    variant_data = {
-                        "primary_gene": gene,
-                        "star_allele": star_allele,
-                        "rsid": rsid if rsid != "." else "Unknown",
-                        "chromosome": columns[0],
-                        "position": columns[1],
-                        "raw_info": info_column # Helpful for debugging
-                    }
-                    detected_variants.append(variant_data)
+        for line in lines:
+            if line.startswith('##'):
+                if use_positions and PharmaGuardVCFParser.declares_other_build(line):
+                    use_positions = False
+                continue
+
+            variant_data = parse_line(line, use_positions, False, with_raw_info)
+            if variant_data is not None:
+                detected_variants.append(variant_data)
 
         return detected_variants
 
+    @staticmethod
+    def declares_other_build(header_line: str) -> bool:
+        """
+        True when a ## meta line names a non-GRCh38 reference assembly.
+        """
+        lowered = header_line.lower()
+        if not lowered.startswith(("##reference", "##assembly", "##contig")):
+            return False
+        return any(marker in lowered for marker in PharmaGuardVCFParser.OTHER_BUILD_MARKERS)
+
+    @staticmethod
+    def locate_gene(chrom: str, pos: int) -> Optional[str]:
+        """
+        Resolves CHROM/POS to one of the target genes using the GRCh38
+        locus table, or None when the position is outside every locus.
+        """
+        regions = PharmaGuardVCFParser.REGION_INDEX.get(chrom)
+        if regions is None:
+            return None
+
+        starts, entries = regions
+        i = bisect_right(starts, pos) - 1
+        if i < 0:
+            return None
+
+        end, gene = entries[i]
+        return gene if pos <= end else None
+
+    @staticmethod
+    def parse_line(line: str, use_positions: bool = True, with_genotypes: bool = False,
+                   with_raw_info: bool = True) -> Optional[VariantRecord]:
+        """
+        Parses a single VCF line. Returns None for headers, malformed
+        rows and variants outside the target genes. With with_genotypes,
+        the GT of every sample column is kept in `genotypes`; without
+        with_raw_info the INFO column is not retained.
+        """
+        # 1. Skip metadata and header lines
+        if line.startswith('#'):
+            return None
+
+        # 2. Fast path: reject from CHROM/POS alone before touching INFO
+        locus_gene = None
+        if use_positions:
+            head = line.split('\t', 2)
+            if len(head) < 3:
+                return None
+
+            try:
+                locus_gene = PharmaGuardVCFParser.locate_gene(head[0], int(head[1]))
+            except ValueError:
+                return None
+            if locus_gene is None:
+                return None
+
+        # 3. Split the data row by tabs (VCFs are tab-delimited)
+        columns = line.strip().split('\t')
+
+        # Ensure the row has at least the 8 standard columns (up to INFO)
+        if len(columns) < 8:
+            return None
+
+        # 4. Isolate the 8th column (index 7), which is the INFO column
+        info_column = columns[7]
+
+        # 5. Parse the INFO column into a dictionary
+        # INFO tags are separated by semicolons (e.g., GENE=CYP2C19;STAR=*2)
+        info_dict = {}
+        for item in info_column.split(';'):
+            if '=' in item:
+                key, value = item.split('=', 1)
+                info_dict[key] = value
+            else:
+                # Handle boolean flags in INFO (tags without an '=' sign)
+                info_dict[item] = True
+
+        # 6. Extract our specific target tags
+        gene = info_dict.get('GENE')
+        star_allele = info_dict.get('STAR')
+
+        # If RS tag isn't in INFO, fallback to the 3rd column (ID)
+        rsid = info_dict.get('RS') or columns[2]
+
+        # Unannotated VCFs: take the gene from the locus table
+        if gene not in PharmaGuardVCFParser.TARGET_GENES:
+            gene = locus_gene
+
+        # 7. Filter only the genes we care about
+        if gene is None:
+            return None
+
+        try:
+            position = int(columns[1])
+        except ValueError:
+            position = None
+
+        # ...and the star allele from the known star-defining variants
+        if not star_allele:
+            star_allele = PharmaGuardVCFParser.lookup_star(gene, rsid, position)
+
+        # 8. GT values (column 9 is FORMAT, samples follow): every sample's
+        # for cohorts, otherwise the patient's own (first) sample column
+        genotypes = genotype = None
+        if with_genotypes:
+            genotypes = PharmaGuardVCFParser.extract_genotypes(columns)
+        else:
+            genotype = PharmaGuardVCFParser.first_genotype(columns)
+
+        return VariantRecord(
+            gene,
+            star_allele,
+            rsid if rsid != "." else "Unknown",
+            columns[0],
+            position,
+            info_column if with_raw_info else None,  # Helpful for debugging
+            genotypes,
+            genotype,
+        )
+
+    @staticmethod
+    def first_genotype(columns: List[str]) -> Optional[str]:
+        """
+        GT of the first sample column, or None for sites-only rows and
+        FORMATs without GT.
+        """
+        if len(columns) < 10:
+            return None
+
+        format_keys = columns[8].split(':')
+        if format_keys[0] == 'GT':
+            return columns[9].split(':', 1)[0]
+        if 'GT' not in format_keys:
+            return None
+
+        fields = columns[9].split(':')
+        gt_index = format_keys.index('GT')
+        return fields[gt_index] if gt_index < len(fields) else None
+
+    @staticmethod
+    def extract_genotypes(columns: List[str]) -> List[str]:
+        """
+        GT string for every sample column ('./.' when GT is absent).
+        """
+        if len(columns) < 10:
+            return []
+
+        format_keys = columns[8].split(':')
+        if 'GT' not in format_keys:
+            return ['./.'] * (len(columns) - 9)
+
+        gt_index = format_keys.index('GT')
+        if gt_index == 0:
+            return [sample.split(':', 1)[0] for sample in columns[9:]]
+
+        genotypes = []
+        for sample in columns[9:]:
+            fields = sample.split(':')
+            genotypes.append(fields[gt_index] if gt_index < len(fields) else './.')
+        return genotypes
+
+    @staticmethod
+    def lookup_star(gene: str, rsid: str, position: Optional[int]) -> Optional[str]:
+        """
+        Star allele for a known star-defining variant, matched on rsID
+        first and on (gene, position) for VCFs with an empty ID column.
+        """
+        star_allele = PharmaGuardVCFParser.STAR_BY_RSID.get(rsid)
+        if star_allele is not None:
+            return star_allele
+
+        return PharmaGuardVCFParser.STAR_BY_POSITION.get((gene, position))
+
+
+class VCFStreamParser:
+    """
+    Incremental VCF parser fed with raw bytes.
+    Keeps only the trailing partial line between chunks, so memory stays
+    bounded by the chunk size plus the detected target variants.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, use_positions: bool = True,
+                 with_genotypes: bool = False, with_raw_info: bool = True,
+                 max_line_length: int = VCF_MAX_LINE_LENGTH):
+        self.max_bytes = max_bytes
+        self.max_line_length = max_line_length
+        self.bytes_read = 0
+        self.variants: List[VariantRecord] = []
+        self.with_genotypes = with_genotypes
+        self.with_raw_info = with_raw_info
+
+        # Header state must survive chunk boundaries
+        self.use_positions = use_positions
+        self.sample_ids: List[str] = []
+        self.header_done = False
+
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending = ""
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Consumes the next chunk of bytes and parses every complete line.
+        """
+        text = self.take_text(chunk)
+        if text:
+            self.parse_complete_lines(text.split('\n'))
+
+    def take_text(self, chunk: bytes) -> str:
+        """
+        Decodes the next chunk and returns the text of every line it
+        completes (without the final newline); the incomplete remainder is
+        kept for the next chunk. Lets callers parse the text elsewhere,
+        e.g. in a worker process, once the header is done.
+        """
+        self.bytes_read += len(chunk)
+
+        # Enforce the size limit as bytes arrive, not after the fact
+        if self.max_bytes is not None and self.bytes_read > self.max_bytes:
+            raise VCFFileTooLargeError(
+                f"VCF upload exceeds the {self.max_bytes} byte limit."
+            )
+
+        text = self._pending + self._decoder.decode(chunk)
+        cut = text.rfind('\n')
+
+        # No complete line yet — keep everything for later
+        if cut < 0:
+            self._pending = text
+            pending = text
+        else:
+            self._pending = pending = text[cut + 1:]
+
+        # A newline-free stream would otherwise pile up here without bound
+        if len(pending) > self.max_line_length:
+            raise VCFLineTooLongError(
+                f"VCF line exceeds {self.max_line_length} characters."
+            )
+
+        return text[:cut] if cut >= 0 else ""
+
+    def close(self) -> List[VariantRecord]:
+        """
+        Flushes the final (unterminated) line and returns all variants.
+        """
+        tail = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+
+        if tail:
+            self.parse_complete_lines([tail])
+
+        return self.variants
+
+    async def afeed(self, chunk: bytes) -> None:
+        """
+        Awaitable feed() used by the upload readers; subclasses that parse
+        elsewhere apply backpressure here.
+        """
+        self.feed(chunk)
+
+    async def aclose(self) -> List[VariantRecord]:
+        return self.close()
+
+    def cancel(self) -> None:
+        """
+        Abandons any parsing still in progress (nothing to do inline).
+        """
+
+    def parse_complete_lines(self, lines: List[str]) -> None:
+        """
+        Parses whole lines in order, tracking header state.
+        """
+        parse_line = PharmaGuardVCFParser.parse_line
+
+        for line in lines:
+            if not line.startswith('#'):
+                self.header_done = True
+
+            elif line.startswith('##'):
+                if self.use_positions and PharmaGuardVCFParser.declares_other_build(line):
+                    self.use_positions = False
+                continue
+
+            if line.startswith('#CHROM'):
+                self.sample_ids = line.rstrip('\r\n').split('\t')[9:]
+                continue
+
+            variant_data = parse_line(line, self.use_positions, self.with_genotypes, self.with_raw_info)
+            if variant_data is not None:
+                self.variants.append(variant_data)
+
+
+def parse_text_block(text: str, use_positions: bool = True, with_genotypes: bool = False,
+                     with_raw_info: bool = True) -> List[VariantRecord]:
+    """
+    Parses a block of complete data lines. Module-level so it can be
+    shipped to a worker process; header state is passed in explicitly.
+    """
+    parse_line = PharmaGuardVCFParser.parse_line
+    detected_variants = []
+
+    for line in text.split('\n'):
+        variant_data = parse_line(line, use_positions, with_genotypes, with_raw_info)
+        if variant_data is not None:
+            detected_variants.append(variant_data)
+
+    return detected_variants
+
+
+class PooledVCFStreamParser(VCFStreamParser):
+    """
+    Stream parser that keeps only the header on the caller's thread and
+    ships data lines, in blocks of about block_bytes, to a pool through
+    `submit(parse_text_block, text, use_positions, with_genotypes, with_raw_info)`.
+    At most `window` blocks are in flight; afeed() waits for the oldest
+    one beyond that, which throttles reading the upload. Variants come
+    back in file order.
+    """
+
+    def __init__(self, submit: Callable[..., Future], block_bytes: int = 1024 * 1024,
+                 window: int = 4, **kwargs):
+        super().__init__(**kwargs)
+        self.submit = submit
+        self.block_bytes = block_bytes
+        self.window = window
+
+        self._block: List[str] = []
+        self._block_size = 0
+        self._in_flight: "deque[asyncio.Future]" = deque()
+
+    async def afeed(self, chunk: bytes) -> None:
+        text = self.take_text(chunk)
+        if not text:
+            return
+
+        if not self.header_done:
+            text = self._consume_header(text)
+            if not text:
+                return
+
+        self._block.append(text)
+        self._block_size += len(text)
+
+        if self._block_size >= self.block_bytes:
+            await self._submit_block()
+
+    async def aclose(self) -> List[VariantRecord]:
+        tail = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+
+        if tail and not self.header_done:
+            tail = self._consume_header(tail)
+        if tail:
+            self._block.append(tail)
+
+        try:
+            if self._block:
+                await self._submit_block()
+            while self._in_flight:
+                self.variants.extend(await self._in_flight.popleft())
+        finally:
+            self.cancel()
+
+        return self.variants
+
+    def cancel(self) -> None:
+        """
+        Drops blocks that have not started yet (e.g. the upload failed).
+        """
+        while self._in_flight:
+            self._in_flight.popleft().cancel()
+
+    def _consume_header(self, text: str) -> str:
+        """
+        Parses leading header lines inline; returns the remaining data text.
+        """
+        lines = text.split('\n')
+        data_start = next(
+            (i for i, line in enumerate(lines) if not line.startswith('#')), len(lines)
+        )
+        self.parse_complete_lines(lines[:data_start])
+
+        if data_start == len(lines):
+            return ""
+
+        self.header_done = True
+        return '\n'.join(lines[data_start:])
+
+    async def _submit_block(self) -> None:
+        # Blocks are separate lines: join them back with the newline take_text dropped
+        text = '\n'.join(self._block)
+        self._block = []
+        self._block_size = 0
+
+        future = self.submit(
+            parse_text_block, text, self.use_positions, self.with_genotypes, self.with_raw_info
+        )
+        self._in_flight.append(asyncio.wrap_future(future))
+
+        while len(self._in_flight) > self.window:
+            self.variants.extend(await self._in_flight.popleft())
+
 # --- Example Usage for Testing ---
 if __name__ == "__main__":
     # Assuming you saved the sample VCF from earlier as 'sample.vcf'
@@ -73,4 +576,4 @@ if __name__ == "__main__":
     # results = parser.parse_vcf("sample.vcf")
     # import json
     # print(json.dumps(results, indent=2))
-    pass
\ No newline at end of file
+    pass
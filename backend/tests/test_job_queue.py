@@ -0,0 +1,123 @@
+import json
+import asyncio
+
+import pytest
+
+from services import job_queue
+from services.executor import PipelineSaturatedError
+from services.job_queue import FAILED, SUCCEEDED, Job, JobManager
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BACKOFF_SECONDS", 0.01)
+
+
+class FlakyRunner:
+    """
+    Raises PipelineSaturatedError for the first `saturated` calls.
+    """
+
+    def __init__(self, saturated: int):
+        self.calls = 0
+        self.saturated = saturated
+        self.closed = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.calls <= self.saturated:
+            raise PipelineSaturatedError("Server busy")
+        return {"ok": True}
+
+    async def cleanup(self):
+        self.closed += 1
+
+
+async def wait_finished(manager: JobManager, job, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not job.finished:
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+    await manager.stop()
+
+
+def test_saturated_job_is_requeued_until_it_runs():
+    async def scenario():
+        manager = JobManager(workers=1, saturated_retries=3)
+        manager.start()
+        runner = FlakyRunner(saturated=2)
+
+        job = manager.submit(runner, cleanup=runner.cleanup)
+        await wait_finished(manager, job)
+
+        assert job.status == SUCCEEDED
+        assert job.result == {"ok": True}
+        assert runner.calls == 3
+        assert runner.closed == 1
+        assert manager.stats()["retried"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_saturated_job_fails_with_retryable_503():
+    async def scenario():
+        manager = JobManager(workers=1, saturated_retries=2)
+        manager.start()
+        runner = FlakyRunner(saturated=10)
+
+        job = manager.submit(runner, cleanup=runner.cleanup)
+        await wait_finished(manager, job)
+
+        assert job.status == FAILED
+        assert job.status_code == 503
+        assert job.retry_after > 0
+        assert runner.calls == 3
+        assert runner.closed == 1
+
+    asyncio.run(scenario())
+
+
+def test_other_errors_are_not_retried():
+    async def scenario():
+        manager = JobManager(workers=1)
+        manager.start()
+
+        async def broken():
+            raise ValueError("bad input")
+
+        job = manager.submit(broken)
+        await wait_finished(manager, job)
+
+        assert job.status == FAILED
+        assert job.status_code == 500
+        assert job.retry_after is None
+        assert job.attempts == 1
+
+    asyncio.run(scenario())
+
+
+def test_serialized_result_is_spliced_into_the_status():
+    async def runner():
+        return b'{"drug": "CODEINE", "detected_variants": [{"rsid": "rs1"}]}'
+
+    async def scenario():
+        manager = JobManager(workers=1)
+        manager.start()
+        job = manager.submit(runner, meta={"drugs": ["CODEINE"]})
+        await wait_finished(manager, job)
+        return job
+
+    job = asyncio.run(scenario())
+    status = json.loads(job.to_json())
+
+    assert job.to_json().endswith(b'"result": {"drug": "CODEINE", "detected_variants": [{"rsid": "rs1"}]}}')
+    assert status["status"] == SUCCEEDED
+    assert status["drugs"] == ["CODEINE"]
+    assert "raw_info" not in status["result"]["detected_variants"][0]
+
+
+def test_unfinished_job_status_has_a_null_result():
+    status = json.loads(Job(runner=None, meta={"drugs": []}).to_json())
+
+    assert status["result"] is None
+    assert status["status"] == "queued"
@@ -0,0 +1,133 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import llm_service
+from services.explanation_cache import ExplanationCache
+from services.llm_service import PharmaGuardLLMService, close_llm_service, get_llm_service
+
+
+RULE_ENGINE_OUTPUT = {
+    "drug": "CODEINE",
+    "evaluations": [{
+        "gene": "CYP2D6",
+        "diplotype": "*1/*4",
+        "phenotype": "IM",
+        "risk_label": "Adjust Dosage",
+        "recommendation": "Use with caution.",
+    }],
+}
+
+ANSWER = {
+    "drug": "CODEINE",
+    "clinical_explanation": "Reduced CYP2D6 activity.",
+    "mechanism": "Less conversion of codeine to morphine.",
+    "confidence": "High",
+}
+
+
+# -----------------------------
+# Stub Client
+# -----------------------------
+class StubCompletions:
+    """
+    Stands in for client.chat.completions: counts upstream calls, holds
+    each one until `release` is set, and fails the first `failures` calls.
+    """
+
+    def __init__(self, failures: int = 0):
+        self.calls = 0
+        self.failures = failures
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await self.release.wait()
+        if self.calls <= self.failures:
+            raise RuntimeError("upstream unavailable")
+
+        message = SimpleNamespace(content=json.dumps(ANSWER))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def stub_service(completions: StubCompletions) -> PharmaGuardLLMService:
+    service = PharmaGuardLLMService(api_key=None, cache=ExplanationCache())
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service
+
+
+@pytest.fixture(autouse=True)
+def no_api_key(monkeypatch):
+    for name in ("GROQ_API_KEY", "GROQ_KEY", "GROQAPI_KEY"):
+        monkeypatch.delenv(name, raising=False)
+
+
+# -----------------------------
+# Single-flight
+# -----------------------------
+def test_concurrent_identical_prompts_share_one_call():
+    async def scenario():
+        completions = StubCompletions()
+        service = stub_service(completions)
+
+        tasks = [asyncio.ensure_future(service.generate_explanation(RULE_ENGINE_OUTPUT)) for _ in range(10)]
+        await asyncio.sleep(0)
+        completions.release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert completions.calls == 1
+        assert service._inflight.stats()["shared"] == 9
+        assert all(result == ANSWER for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_not_cached():
+    async def scenario():
+        completions = StubCompletions(failures=1)
+        completions.release.set()
+        service = stub_service(completions)
+
+        first = await service.generate_explanation(RULE_ENGINE_OUTPUT)
+        assert first["confidence"] == "Low"
+        assert "upstream unavailable" in first["error"]
+        assert service.cache.get(service.cache_key(RULE_ENGINE_OUTPUT)) is None
+
+        # ttl=0: the failure is not replayed, the next caller goes upstream
+        second = await service.generate_explanation(RULE_ENGINE_OUTPUT)
+        assert second == ANSWER
+        assert completions.calls == 2
+
+        # Only the good answer is cached
+        assert await service.generate_explanation(RULE_ENGINE_OUTPUT) == ANSWER
+        assert completions.calls == 2
+
+    asyncio.run(scenario())
+
+
+# -----------------------------
+# Per-loop Instances
+# -----------------------------
+def test_each_event_loop_gets_its_own_service():
+    async def current():
+        service = get_llm_service()
+        assert get_llm_service() is service
+        return service
+
+    first = asyncio.run(current())
+    second = asyncio.run(current())
+
+    assert first is not second
+    assert first._semaphore is not second._semaphore
+
+
+def test_close_drops_the_loop_service():
+    async def scenario():
+        service = get_llm_service()
+        await close_llm_service()
+        assert asyncio.get_running_loop() not in llm_service._services
+        assert get_llm_service() is not service
+
+    asyncio.run(scenario())
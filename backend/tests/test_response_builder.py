@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from models import PharmaGuardMultiDrugResponse, PharmaGuardResponse
+from services.response_builder import PharmaGuardResponseBuilder
+from services.rule_engine import CPICRuleEngine
+from services.vcf_parcer import PharmaGuardVCFParser
+from benchmarks.synthetic_vcf import generate_vcf_text
+
+
+@pytest.fixture(scope="module")
+def parsed_variants():
+    return PharmaGuardVCFParser.parse_lines(generate_vcf_text(100).splitlines(keepends=True))
+
+
+@pytest.mark.parametrize("llm_output", [
+    {"clinical_explanation": "Reduced activity.", "mechanism": "Less active metabolite.", "confidence": "High"},
+    {"summary": {"text": "x"}, "confidence": 0.9},
+    {"clinical_explanation": ["a", "b"], "mechanism": None},
+    {},
+    [],
+])
+def test_any_llm_json_builds_a_valid_report(parsed_variants, llm_output):
+    engine_output = CPICRuleEngine.evaluate(parsed_variants, "CLOPIDOGREL")
+    report = PharmaGuardResponseBuilder.build_model("PATIENT_TEST", parsed_variants, engine_output, llm_output)
+
+    # What /analyze sends must be accepted back by /reports/pdf
+    body = PharmaGuardResponseBuilder.render_json(report)
+    round_tripped = PharmaGuardResponse.model_validate_json(body)
+
+    explanation = round_tripped.llm_generated_explanation
+    assert all(isinstance(value, str) for value in (explanation.summary, explanation.mechanism, explanation.confidence))
+    assert round_tripped.quality_metrics.llm_explanation_generated == bool(explanation.summary)
+
+
+def test_non_string_fields_become_json_text(parsed_variants):
+    engine_output = CPICRuleEngine.evaluate(parsed_variants, "CLOPIDOGREL")
+    report = PharmaGuardResponseBuilder.build_model(
+        "PATIENT_TEST", parsed_variants, engine_output,
+        {"clinical_explanation": {"text": "x"}, "confidence": 0.9},
+    )
+
+    assert json.loads(report.llm_generated_explanation.summary) == {"text": "x"}
+    assert report.llm_generated_explanation.confidence == "0.9"
+    assert report.llm_generated_explanation.mechanism == ""
+
+
+def test_multi_drug_report_validates(parsed_variants):
+    drugs = CPICRuleEngine.resolve_drugs("ALL")
+    engine_outputs = CPICRuleEngine.evaluate_many(parsed_variants, drugs)
+    llm_outputs = [{"confidence": 1} for _ in engine_outputs]
+
+    report = PharmaGuardResponseBuilder.build_multi_drug_model("PATIENT_TEST", parsed_variants, engine_outputs, llm_outputs)
+    round_tripped = PharmaGuardMultiDrugResponse.model_validate_json(PharmaGuardResponseBuilder.render_json(report))
+
+    assert round_tripped.drugs == drugs
@@ -0,0 +1,64 @@
+import time
+import pickle
+
+import pytest
+
+from services.session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore, VCFSession
+from services.variant_record import VariantRecord
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"))
+    return InMemorySessionStore()
+
+
+def test_each_report_keeps_its_own_pages(store):
+    session = VCFSession("file", "a.vcf", [])
+    session.add_pages("first", ["first 1", "first 2"])
+    session.add_pages("second", ["second 1"])
+    store.put(1, session)
+
+    pages = store.get(1).pages
+    assert pages["first"] == ["first 1", "first 2"]
+    assert pages["second"] == ["second 1"]
+
+
+def test_oldest_reports_are_dropped():
+    session = VCFSession("file", "a.vcf", [])
+    for i in range(4):
+        session.add_pages(f"r{i}", [str(i)], max_reports=2)
+
+    assert list(session.pages) == ["r2", "r3"]
+
+
+def test_variants_round_trip_through_the_store(store):
+    variants = [
+        VariantRecord("CYP2D6", "*4", "rs3892097", "chr22", 42128945, "GENE=CYP2D6;STAR=*4",
+                      genotypes=["0/1", "1/1"], genotype="0/1"),
+        VariantRecord("DPYD", None, "rs3918290", "chr1", None),
+    ]
+    store.put(1, VCFSession("file", "a.vcf", variants, created_at=1.0, drugs=["CODEINE"]))
+
+    session = store.get(1)
+    assert session.variants == variants
+    assert (session.file_id, session.file_name, session.created_at, session.drugs) == (
+        "file", "a.vcf", 1.0, ["CODEINE"]
+    )
+
+
+def test_pickled_blobs_are_never_unpickled(store):
+    class Boom:
+        def __reduce__(self):
+            return (pytest.fail, ("pickle payload was executed",))
+
+    store._put("1", pickle.dumps(Boom()), time.time() + 60)
+
+    assert store.get(1) is None
+    assert store._get("1", time.time()) is None
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
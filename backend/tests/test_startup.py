@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from services import startup
+from services.startup import StartupWarmup
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(startup, "STARTUP_RETRY_SECONDS", 0.001)
+
+
+def failing(times: int):
+    calls = {"n": 0}
+
+    async def step():
+        calls["n"] += 1
+        if calls["n"] <= times:
+            raise OSError("not yet")
+
+    return step
+
+
+def test_required_step_is_retried_until_ready():
+    warmup = StartupWarmup()
+    asyncio.run(warmup.run([("knowledge_base", failing(3))]))
+
+    assert warmup.ready
+    assert warmup.error is None
+    assert warmup.attempts == {"knowledge_base": 4}
+    assert "knowledge_base" in warmup.steps
+
+
+def test_required_step_failing_keeps_not_ready():
+    warmup = StartupWarmup()
+
+    async def scenario():
+        task = asyncio.create_task(warmup.run([("knowledge_base", failing(10 ** 6))]))
+        await asyncio.sleep(0.05)
+        status = warmup.status()
+        task.cancel()
+        return status
+
+    status = asyncio.run(scenario())
+    assert status["status"] == "starting"
+    assert status["error"] == "knowledge_base: not yet"
+    assert not warmup.ready
+
+
+def test_best_effort_failure_does_not_block_readiness():
+    warmup = StartupWarmup()
+    asyncio.run(warmup.run(
+        [("knowledge_base", failing(0)), ("llm_client", failing(1))],
+        best_effort=("llm_client",),
+    ))
+
+    assert warmup.ready
+    assert warmup.degraded == {"llm_client": "not yet"}
+    assert warmup.attempts["llm_client"] == 1
@@ -0,0 +1,209 @@
+import io
+import gzip
+import asyncio
+
+import pytest
+
+from benchmarks.synthetic_vcf import generate_vcf_text
+from services.tabix_reader import (
+    BGZF_BLOCK_DATA_SIZE,
+    BGZFError,
+    PharmaGuardTabixReader,
+    build_tabix_index,
+    write_bgzf_vcf,
+)
+from services.vcf_parcer import PharmaGuardVCFParser, VCFFileTooLargeError, VCFLineTooLongError, VCFStreamParser
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def sort_key(variant):
+    return (variant.chromosome, variant.position, variant.rsid, variant.star_allele,
+            variant.primary_gene, variant.raw_info or "")
+
+
+def plain(text: str):
+    return sorted(PharmaGuardVCFParser.parse_lines(text.splitlines(keepends=True)), key=sort_key)
+
+
+def bgzip(text: str):
+    """
+    (vcf bytes, tbi bytes, records) for a VCF text, as bgzip + tabix -p vcf.
+    """
+    vcf = io.BytesIO()
+    records, end_voffset = write_bgzf_vcf(text.splitlines(), vcf)
+    return vcf.getvalue(), build_tabix_index(records, end_voffset), records
+
+
+def indexed(text: str):
+    vcf, tbi, _ = bgzip(text)
+    variants = PharmaGuardTabixReader.parse_indexed_vcf(io.BytesIO(vcf), io.BytesIO(tbi))
+    return sorted(variants, key=sort_key)
+
+
+class FakeUpload:
+    """
+    Minimal async stand-in for UploadFile.
+    """
+
+    def __init__(self, data: bytes):
+        self._file = io.BytesIO(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+
+def off_locus_row(chrom: str = "chr1", pos: int = 5000) -> str:
+    # GENE-annotated but nowhere near a PGx locus
+    return f"{chrom}\t{pos}\trs999\tA\tG\t100\tPASS\tGENE=CYP2D6;STAR=*4\tGT\t0/1"
+
+
+def insert_row(text: str, row: str) -> str:
+    lines = text.splitlines()
+    first_record = next(i for i, line in enumerate(lines) if not line.startswith("#"))
+    lines.insert(first_record, row)
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Region Fetch
+# -----------------------------
+def test_region_fetch_matches_plain_parser():
+    text = generate_vcf_text(2_000, seed=1)
+    expected = plain(text)
+
+    assert expected
+    assert indexed(text) == expected
+
+
+def test_region_fetch_with_dense_pgx_records():
+    text = generate_vcf_text(2_000, seed=2, pgx_fraction=0.5)
+
+    assert indexed(text) == plain(text)
+
+
+def test_region_fetch_missing_contig_returns_nothing():
+    text = "\n".join(
+        line for line in generate_vcf_text(500, seed=3).splitlines()
+        if line.startswith("#") or line.startswith(("chr2\t", "chr3\t"))
+    ) + "\n"
+
+    assert indexed(text) == plain(text) == []
+
+
+# -----------------------------
+# BGZF Block Boundaries
+# -----------------------------
+def test_records_spread_over_many_blocks():
+    text = generate_vcf_text(40_000, seed=4)
+    _, _, records = bgzip(text)
+
+    blocks = {voffset >> 16 for _, _, _, voffset in records}
+    assert len(blocks) > 10
+    assert indexed(text) == plain(text)
+
+
+def test_record_spanning_a_block_boundary():
+    text = generate_vcf_text(2_000, seed=5)
+    lines = text.splitlines()
+
+    # Pad every PGx record so each one straddles at least one block edge
+    padding = "X" * BGZF_BLOCK_DATA_SIZE
+    lines = [
+        line.replace("\tGENE=", f"\tPAD={padding};GENE=") if "\tGENE=" in line else line
+        for line in lines
+    ]
+    text = "\n".join(lines) + "\n"
+
+    expected = plain(text)
+    assert expected
+    assert all(len(variant.raw_info) > BGZF_BLOCK_DATA_SIZE for variant in expected)
+    assert indexed(text) == expected
+
+
+# -----------------------------
+# Gzip Without an Index
+# -----------------------------
+@pytest.mark.parametrize("chunk_size", [1_000, 64 * 1024])
+def test_plain_gzip_upload_streams_without_index(chunk_size):
+    text = generate_vcf_text(5_000, seed=6)
+    upload = FakeUpload(gzip.compress(text.encode("utf-8")))
+
+    variants = asyncio.run(PharmaGuardTabixReader.parse_gzip_upload(upload, chunk_size=chunk_size))
+
+    assert sorted(variants, key=sort_key) == plain(text)
+
+
+@pytest.mark.parametrize("chunk_size", [1_000, 64 * 1024])
+def test_bgzf_upload_restarts_at_every_member(chunk_size):
+    text = generate_vcf_text(20_000, seed=7)
+    vcf, _, records = bgzip(text)
+    assert len({voffset >> 16 for _, _, _, voffset in records}) > 1
+
+    variants = asyncio.run(PharmaGuardTabixReader.parse_gzip_upload(FakeUpload(vcf), chunk_size=chunk_size))
+
+    assert sorted(variants, key=sort_key) == plain(text)
+
+
+def test_gzip_bomb_is_rejected_while_inflating():
+    # ~100 KB on the wire, 100 MB once inflated
+    bomb = gzip.compress(b"#" * (100 * 1024 * 1024), compresslevel=9)
+    assert len(bomb) < 200 * 1024
+
+    with pytest.raises(VCFFileTooLargeError):
+        asyncio.run(PharmaGuardTabixReader.parse_gzip_upload(
+            FakeUpload(bomb), max_bytes=len(bomb), max_inflated_bytes=1024 * 1024
+        ))
+
+
+def test_truncated_gzip_is_rejected():
+    data = gzip.compress(generate_vcf_text(2_000, seed=8).encode("utf-8"))
+
+    with pytest.raises(BGZFError):
+        asyncio.run(PharmaGuardTabixReader.parse_gzip_upload(FakeUpload(data[:len(data) // 2])))
+
+
+def test_line_without_newline_is_capped():
+    upload = FakeUpload(gzip.compress(b"chr1\t" + b"A" * 10_000))
+
+    with pytest.raises(VCFLineTooLongError):
+        asyncio.run(PharmaGuardTabixReader.parse_gzip_upload(
+            upload, chunk_size=1_000, stream_parser=VCFStreamParser(max_line_length=4_000)
+        ))
+
+
+# -----------------------------
+# Locus Pre-filter
+# -----------------------------
+def test_prefilter_keeps_every_annotated_pgx_record():
+    text = generate_vcf_text(5_000, seed=8)
+    filtered = plain(text)
+    annotated = PharmaGuardVCFParser.parse_lines(text.splitlines(keepends=True), use_positions=False)
+
+    assert all(variant in filtered for variant in annotated)
+    # Anything extra is unannotated background that happens to sit in a locus
+    extra = [variant for variant in filtered if variant not in annotated]
+    assert all(
+        "GENE=" not in variant.raw_info
+        and PharmaGuardVCFParser.locate_gene(variant.chromosome, variant.position) == variant.primary_gene
+        for variant in extra
+    )
+    assert indexed(text) == filtered
+
+
+def test_prefilter_drops_off_locus_rows_on_grch38():
+    text = insert_row(generate_vcf_text(500, seed=9), off_locus_row())
+    expected = plain(text)
+
+    assert all(variant.rsid != "rs999" for variant in expected)
+    assert indexed(text) == expected
+
+
+def test_prefilter_disabled_for_other_builds():
+    text = generate_vcf_text(500, seed=10).replace("##reference=GRCh38", "##reference=GRCh37")
+    text = insert_row(text, off_locus_row())
+    expected = plain(text)
+
+    assert any(variant.rsid == "rs999" for variant in expected)
+    assert indexed(text) == expected
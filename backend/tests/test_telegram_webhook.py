@@ -0,0 +1,62 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.telegram_webhook import (
+    InvalidUpdateError,
+    TelegramWebhook,
+    WebhookConfigError,
+    require_secret,
+)
+
+
+def webhook(secret: str = "s3cret_token", queue_size: int = 10) -> TelegramWebhook:
+    application = SimpleNamespace(bot=None, update_queue=asyncio.Queue(maxsize=queue_size))
+    return TelegramWebhook(application, secret)
+
+
+# -----------------------------
+# Secret
+# -----------------------------
+@pytest.mark.parametrize("secret", ["", None, "has space", "x" * 257])
+def test_webhook_refuses_to_start_without_a_valid_secret(secret):
+    with pytest.raises(WebhookConfigError):
+        require_secret(secret)
+    with pytest.raises(WebhookConfigError):
+        webhook(secret)
+
+
+@pytest.mark.parametrize("token", [None, "", "wrong", "s3cret_token "])
+def test_requests_without_the_secret_are_rejected(token):
+    assert not webhook().verify(token)
+
+
+def test_matching_secret_is_accepted():
+    assert webhook().verify("s3cret_token")
+
+
+# -----------------------------
+# Update Parsing
+# -----------------------------
+@pytest.mark.parametrize("body", [b"not json", b"[]", b"{}", b'{"update_id": "1"}', b"\xff\xfe"])
+def test_malformed_bodies_are_invalid(body):
+    pytest.importorskip("telegram")
+    hook = webhook()
+
+    with pytest.raises(InvalidUpdateError):
+        hook.enqueue(body)
+    assert hook.application.update_queue.empty()
+    assert hook.stats()["invalid"] == 1
+
+
+def test_updates_are_queued_until_full():
+    pytest.importorskip("telegram")
+    hook = webhook(queue_size=1)
+    body = json.dumps({"update_id": 1}).encode()
+
+    assert hook.enqueue(body)
+    assert not hook.enqueue(body)
+    assert hook.stats()["accepted"] == 1
+    assert hook.stats()["rejected"] == 1
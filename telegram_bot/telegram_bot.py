@@ -1,417 +1,653 @@
-import os
-import uuid
-import logging
-from datetime import datetime
-from telegram import Update, ForceReply
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    MessageHandler,
-    ConversationHandler,
-    ContextTypes,
-    filters,
-)
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Import PharmaGuard services
-from services.vcf_parcer import PharmaGuardVCFParser
-from services.rule_engine import CPICRuleEngine
-from services.llm_service import PharmaGuardLLMService
-from services.response_builder import PharmaGuardResponseBuilder
-
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Conversation states
-WAITING_FOR_DRUG = 1
-
-# Temporary upload directory
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-# Store user data temporarily
-user_sessions = {}
-
-
-# ========================================
-# Command Handlers
-# ========================================
-
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    welcome_message = f"""
-👋 Hello {user.first_name}!
-
-Welcome to **PharmaGuard** - AI-Powered Pharmacogenomics Risk Analyzer
-
-🧬 **How it works:**
-1. Send me your VCF file (.vcf format)
-2. Tell me which drug you're interested in
-3. Get personalized pharmacogenomic insights
-
-📤 **Upload your VCF file now to get started!**
-
-Use /help for more information.
-Use /cancel to cancel current analysis.
-"""
-    await update.message.reply_text(welcome_message)
-
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /help is issued."""
-    help_text = """
-🆘 **PharmaGuard Help**
-
-**Commands:**
-/start - Start the bot
-/help - Show this help message
-/cancel - Cancel current analysis
-
-**How to use:**
-1️⃣ Upload your VCF file (must be .vcf format, max 5MB)
-2️⃣ Enter the drug name you want to analyze
-3️⃣ Wait for the analysis results
-
-**Supported file format:**
-- VCF (Variant Call Format) files only
-- Maximum file size: 5MB
-
-**Example drugs:**
-- Warfarin
-- Clopidogrel
-- Codeine
-- Simvastatin
-- and many more...
-
-For technical support, contact your administrator.
-"""
-    await update.message.reply_text(help_text)
-
-
-async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Cancel and end the conversation."""
-    user_id = update.effective_user.id
-    if user_id in user_sessions:
-        del user_sessions[user_id]
-    
-    await update.message.reply_text(
-        "❌ Analysis cancelled. Send /start to begin a new analysis."
-    )
-    return ConversationHandler.END
-
-
-# ========================================
-# File and Analysis Handlers
-# ========================================
-
-async def handle_vcf_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle VCF file upload."""
-    user_id = update.effective_user.id
-    document = update.message.document
-    
-    # Validate file extension
-    if not document.file_name.endswith('.vcf'):
-        await update.message.reply_text(
-            "❌ Invalid file format. Please send a .vcf file."
-        )
-        return ConversationHandler.END
-    
-    # Check file size (5MB limit)
-    if document.file_size > 5 * 1024 * 1024:
-        await update.message.reply_text(
-            "❌ File too large. Maximum size is 5MB."
-        )
-        return ConversationHandler.END
-    
-    # Download the file
-    await update.message.reply_text("⏳ Downloading your VCF file...")
-    
-    file = await context.bot.get_file(document.file_id)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}.vcf")
-    
-    await file.download_to_drive(file_path)
-    
-    # Store file path in user session
-    user_sessions[user_id] = {
-        'file_path': file_path,
-        'file_id': file_id,
-        'file_name': document.file_name
-    }
-    
-    await update.message.reply_text(
-        "✅ File received!\n\n💊 Please enter the drug name you want to analyze:"
-    )
-    
-    return WAITING_FOR_DRUG
-
-
-async def handle_drug_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Handle drug name input and perform analysis."""
-    user_id = update.effective_user.id
-    drug = update.message.text.strip()
-    
-    if user_id not in user_sessions:
-        await update.message.reply_text(
-            "❌ No VCF file found. Please start over with /start"
-        )
-        return ConversationHandler.END
-    
-    session = user_sessions[user_id]
-    file_path = session['file_path']
-    file_id = session['file_id']
-    
-    await update.message.reply_text(
-        f"🔬 Analyzing {drug}...\nPlease wait, this may take a moment..."
-    )
-    
-    try:
-        # 1️⃣ Parse VCF
-        parsed_variants = PharmaGuardVCFParser.parse_vcf(file_path)
-        
-        if not parsed_variants:
-            await update.message.reply_text(
-                "❌ No pharmacogenomic variants detected in the VCF file."
-            )
-            cleanup_session(user_id, file_path)
-            return ConversationHandler.END
-        
-        # 2️⃣ Apply Rule Engine
-        engine_output = CPICRuleEngine.evaluate(parsed_variants, drug)
-        
-        if not engine_output.get("evaluations"):
-            await update.message.reply_text(
-                f"❌ Drug '{drug}' is not supported or no relevant genes found."
-            )
-            cleanup_session(user_id, file_path)
-            return ConversationHandler.END
-        
-        # 3️⃣ Generate LLM Explanation
-        llm_service = PharmaGuardLLMService()
-        explanation = llm_service.generate_explanation(engine_output)
-        
-        # 4️⃣ Build Final Structured Response
-        builder = PharmaGuardResponseBuilder()
-        final_response = builder.build_final_response(
-            patient_id=f"TG_{file_id[:8]}",
-            parsed_variants=parsed_variants,
-            rule_engine_output=engine_output,
-            llm_output=explanation,
-        )
-        
-        # 5️⃣ Format and send results
-        formatted_message = format_response(final_response, drug)
-        
-        # Send in chunks if too long
-        if len(formatted_message) > 4096:
-            # Split message into chunks
-            chunks = split_message(formatted_message, 4096)
-            for chunk in chunks:
-                await update.message.reply_text(chunk, parse_mode='Markdown')
-        else:
-            await update.message.reply_text(formatted_message, parse_mode='Markdown')
-        
-        await update.message.reply_text(
-            "\n✅ Analysis complete!\n\nSend another VCF file to analyze or /start to begin again."
-        )
-        
-    except Exception as e:
-        logger.error(f"Error during analysis: {str(e)}")
-        await update.message.reply_text(
-            f"❌ An error occurred during analysis:\n{str(e)}\n\nPlease try again with /start"
-        )
-    
-    finally:
-        # Cleanup
-        cleanup_session(user_id, file_path)
-    
-    return ConversationHandler.END
-
-
-# ========================================
-# Helper Functions
-# ========================================
-
-def cleanup_session(user_id: int, file_path: str):
-    """Clean up user session and temporary files."""
-    if user_id in user_sessions:
-        del user_sessions[user_id]
-    
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
-
-def format_response(response, drug: str) -> str:
-    """Format the PharmaGuard response for Telegram."""
-    risk = response.risk_assessment
-    profile = response.pharmacogenomic_profile
-    recommendation = response.clinical_recommendation
-    explanation = response.llm_generated_explanation
-    
-    # Risk emoji
-    risk_emoji = {
-        "Safe": "✅",
-        "Adjust Dosage": "⚠️",
-        "Toxic": "🔴",
-        "Ineffective": "❌",
-        "Unknown": "❓"
-    }
-    
-    message = f"""
-🧬 **PharmaGuard Analysis Report**
-
-📋 **Patient ID:** `{response.patient_id}`
-💊 **Drug:** {drug}
-⏰ **Date:** {response.timestamp}
-
-━━━━━━━━━━━━━━━━━━━━━
-🎯 **RISK ASSESSMENT**
-━━━━━━━━━━━━━━━━━━━━━
-
-{risk_emoji.get(risk.risk_label, "❓")} **Risk Level:** {risk.risk_label}
-📊 **Confidence:** {risk.confidence_score:.2%}
-🔥 **Severity:** {risk.severity.upper()}
-
-━━━━━━━━━━━━━━━━━━━━━
-🧬 **GENETIC PROFILE**
-━━━━━━━━━━━━━━━━━━━━━
-
-**Gene:** {profile.primary_gene}
-**Diplotype:** {profile.diplotype}
-**Phenotype:** {profile.phenotype}
-
-**Detected Variants:**
-"""
-    
-    for i, variant in enumerate(profile.detected_variants, 1):
-        message += f"\n{i}. {variant.primary_gene}"
-        if variant.star_allele:
-            message += f" ({variant.star_allele})"
-        if variant.rsid:
-            message += f" - {variant.rsid}"
-        if variant.chromosome and variant.position:
-            message += f"\n   Chr{variant.chromosome}:{variant.position}"
-    
-    message += f"""
-
-━━━━━━━━━━━━━━━━━━━━━
-💡 **CLINICAL RECOMMENDATION**
-━━━━━━━━━━━━━━━━━━━━━
-
-{recommendation.recommendation_text}
-
-━━━━━━━━━━━━━━━━━━━━━
-🤖 **AI EXPLANATION**
-━━━━━━━━━━━━━━━━━━━━━
-
-**Summary:**
-{explanation.summary}
-
-**Mechanism:**
-{explanation.mechanism}
-
-**Confidence:** {explanation.confidence}
-
-━━━━━━━━━━━━━━━━━━━━━
-📊 **QUALITY METRICS**
-━━━━━━━━━━━━━━━━━━━━━
-
-VCF Parsing: {'✅' if response.quality_metrics.vcf_parsing_success else '❌'}
-Gene Detection: {'✅' if response.quality_metrics.gene_detected else '❌'}
-Rule Engine: {'✅' if response.quality_metrics.rule_engine_applied else '❌'}
-LLM Explanation: {'✅' if response.quality_metrics.llm_explanation_generated else '❌'}
-
-━━━━━━━━━━━━━━━━━━━━━
-
-⚠️ **Disclaimer:** This analysis is for informational purposes only. Always consult with healthcare professionals before making any medical decisions.
-"""
-    
-    return message
-
-
-def split_message(message: str, max_length: int = 4096) -> list:
-    """Split a long message into chunks."""
-    chunks = []
-    current_chunk = ""
-    
-    lines = message.split('\n')
-    
-    for line in lines:
-        if len(current_chunk) + len(line) + 1 <= max_length:
-            current_chunk += line + '\n'
-        else:
-            if current_chunk:
-                chunks.append(current_chunk)
-            current_chunk = line + '\n'
-    
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    return chunks
-
-
-# ========================================
-# Main Bot Setup
-# ========================================
-
-def create_telegram_bot() -> Application:
-    """Create and configure the Telegram bot."""
-    
-    # Get bot token from environment
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    
-    if not token:
-        raise ValueError(
-            "TELEGRAM_BOT_TOKEN not found in environment variables. "
-            "Please set it up using BotFather."
-        )
-    
-    # Create the Application
-    application = Application.builder().token(token).build()
-    
-    # Conversation handler for VCF analysis flow
-    conv_handler = ConversationHandler(
-        entry_points=[
-            MessageHandler(filters.Document.FileExtension("vcf"), handle_vcf_file)
-        ],
-        states={
-            WAITING_FOR_DRUG: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_drug_name)
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    
-    # Add handlers
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(conv_handler)
-    
-    # Also handle VCF files outside conversation for convenience
-    # This allows files to be uploaded at any time
-    
-    logger.info("✅ Telegram bot configured successfully")
-    
-    return application
-
-
-async def run_telegram_bot():
-    """Run the Telegram bot (v20+ compatible)."""
-    application = create_telegram_bot()
-    
-    logger.info("🤖 Starting PharmaGuard Telegram Bot...")
-    logger.info("✅ Bot is running. Press Ctrl+C to stop.")
-    
-    # ✅ CORRECT for python-telegram-bot v20+
-    # run_polling() handles initialize, start, and polling automatically
-    await application.run_polling(
-        allowed_updates=Update.ALL_TYPES,
-        drop_pending_updates=True,  # Ignore old messages on restart
-    )
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update, ForceReply
+from telegram.error import BadRequest
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler,
+    MessageHandler,
+    ConversationHandler,
+    ContextTypes,
+    filters,
+)
+from services.env import load_env
+
+# Load environment variables (once per process)
+load_env()
+
+# Import PharmaGuard services
+from services.vcf_parcer import PharmaGuardVCFParser, VCFFileTooLargeError
+from services.rule_engine import CPICRuleEngine
+from services.llm_service import get_llm_service
+from services.executor import PipelineSaturatedError, get_pipeline_executor
+from services.fair_scheduler import SchedulerFullError, get_telegram_scheduler
+from services.session_store import VCFSession, get_session_store
+from services.response_builder import PharmaGuardResponseBuilder
+from services.report_renderer import render_pdf
+from models import PharmaGuardResponse
+from services import metrics
+
+# Enable logging
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Conversation states
+WAITING_FOR_DRUG = 1
+
+# Largest VCF accepted from chat (Telegram documents are downloaded into memory)
+MAX_VCF_BYTES = 5 * 1024 * 1024
+
+# Attach a PDF of every report to the chat ("0" sends the text report only)
+TELEGRAM_SEND_PDF = os.getenv("TELEGRAM_SEND_PDF", "1").lower() not in ("0", "false", "no")
+
+# Updates handled at once (downloads, replies); analyses are queued separately
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", "64"))
+
+
+# ========================================
+# Command Handlers
+# ========================================
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /start is issued."""
+    user = update.effective_user
+    welcome_message = f"""
+👋 Hello {user.first_name}!
+
+Welcome to **PharmaGuard** - AI-Powered Pharmacogenomics Risk Analyzer
+
+🧬 **How it works:**
+1. Send me your VCF file (.vcf format)
+2. Tell me which drug you're interested in
+3. Get personalized pharmacogenomic insights
+
+📤 **Upload your VCF file now to get started!**
+
+Use /help for more information.
+Use /cancel to cancel current analysis.
+"""
+    await update.message.reply_text(welcome_message)
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /help is issued."""
+    help_text = """
+🆘 **PharmaGuard Help**
+
+**Commands:**
+/start - Start the bot
+/help - Show this help message
+/cancel - Cancel current analysis
+
+**How to use:**
+1️⃣ Upload your VCF file (must be .vcf format, max 5MB)
+2️⃣ Select one or more drugs on the keyboard and press Analyze
+   (or type drug names, comma-separated)
+3️⃣ Wait for the analysis results and page through them with ◀ ▶
+4️⃣ Pick more drugs for the same file, no need to upload it again
+
+**Supported file format:**
+- VCF (Variant Call Format) files only
+- Maximum file size: 5MB
+
+**Example drugs:**
+- Warfarin
+- Clopidogrel
+- Codeine
+- Simvastatin
+- and many more...
+
+For technical support, contact your administrator.
+"""
+    await update.message.reply_text(help_text)
+
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Cancel and end the conversation."""
+    cleanup_session(update.effective_user.id)
+    
+    await update.message.reply_text(
+        "❌ Analysis cancelled. Send /start to begin a new analysis."
+    )
+    return ConversationHandler.END
+
+
+# ========================================
+# File and Analysis Handlers
+# ========================================
+
+async def handle_vcf_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Handle VCF file upload."""
+    user_id = update.effective_user.id
+    document = update.message.document
+    
+    # Validate file extension
+    if not document.file_name.endswith('.vcf'):
+        await update.message.reply_text(
+            "❌ Invalid file format. Please send a .vcf file."
+        )
+        return ConversationHandler.END
+    
+    # Check file size (5MB limit)
+    if document.file_size > MAX_VCF_BYTES:
+        await update.message.reply_text(
+            "❌ File too large. Maximum size is 5MB."
+        )
+        return ConversationHandler.END
+    
+    # Download the file into memory (nothing is written to disk)
+    await update.message.reply_text("⏳ Downloading your VCF file...")
+    
+    file = await context.bot.get_file(document.file_id)
+    
+    with metrics.stage("download", source="telegram"):
+        data = await file.download_as_bytearray()
+    
+    # Parse right away so the drug step only runs the rule engine
+    try:
+        with metrics.stage("parse", source="telegram"):
+            variants = await get_pipeline_executor().run_in_thread(
+                PharmaGuardVCFParser.parse_bytes, data, MAX_VCF_BYTES, False
+            )
+    except VCFFileTooLargeError:
+        await update.message.reply_text("❌ File too large. Maximum size is 5MB.")
+        return ConversationHandler.END
+    except Exception as e:
+        metrics.ERRORS.inc("telegram", type(e).__name__)
+        logger.error(f"Error parsing VCF: {str(e)}")
+        await update.message.reply_text(f"❌ Could not read this VCF file:\n{str(e)}")
+        return ConversationHandler.END
+    
+    if not variants:
+        metrics.ERRORS.inc("telegram", "no_variants")
+        await update.message.reply_text(
+            "❌ No pharmacogenomic variants detected in the VCF file."
+        )
+        return ConversationHandler.END
+    
+    # Only the parsed variants are kept (replacing an earlier upload, whose
+    # report pages stay navigable)
+    store = get_session_store()
+    previous = store.get(user_id)
+    store.put(user_id, VCFSession(
+        str(uuid.uuid4()), document.file_name, variants,
+        pages=previous.pages if previous is not None else None,
+    ))
+    
+    await update.message.reply_text(
+        f"✅ File received! {len(variants)} pharmacogenomic variants found.\n\n"
+        "💊 Select the drugs to analyze, then press Analyze "
+        "(or type drug names, comma-separated):",
+        reply_markup=drug_keyboard([]),
+    )
+    
+    return WAITING_FOR_DRUG
+
+
+async def handle_drug_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Handle typed drug names (one or comma-separated) and hand the analysis to the scheduler."""
+    user_id = update.effective_user.id
+    drugs = CPICRuleEngine.resolve_drugs(update.message.text)
+    
+    # The session stays: more drugs can be checked against the same VCF
+    session = get_session_store().get(user_id)
+    if session is None:
+        await update.message.reply_text(
+            "❌ No VCF file found. Please start over with /start"
+        )
+        return ConversationHandler.END
+    
+    # Runs in the background so this chat's conversation (and every other
+    # chat) keeps being served while the analysis waits or runs
+    context.application.create_task(
+        run_analysis(update.message, user_id, session, drugs), update=update
+    )
+    
+    return ConversationHandler.END
+
+
+async def handle_drug_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Toggle drugs on the selection keyboard, then analyze them all at once."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    store = get_session_store()
+    
+    session = store.get(user_id)
+    if session is None:
+        await query.answer("This upload has expired. Please send the VCF again.", show_alert=True)
+        return
+    
+    if query.data == "cancel":
+        store.delete(user_id)
+        await query.answer()
+        await query.edit_message_text("❌ Analysis cancelled. Send a VCF file to start again.")
+        return
+    
+    if query.data.startswith("pick:"):
+        drug = query.data[len("pick:"):]
+        if drug in session.drugs:
+            session.drugs.remove(drug)
+        else:
+            session.drugs.append(drug)
+        store.put(user_id, session)
+        await query.answer()
+        await query.edit_message_reply_markup(reply_markup=drug_keyboard(session.drugs))
+        return
+    
+    # Analyze
+    drugs = session.drugs
+    if not drugs:
+        await query.answer("Select at least one drug first.")
+        return
+    
+    session.drugs = []
+    store.put(user_id, session)
+    await query.answer()
+    await query.edit_message_text(f"💊 Selected: {', '.join(drugs)}")
+    
+    context.application.create_task(
+        run_analysis(query.message, user_id, session, drugs), update=update
+    )
+
+
+async def handle_report_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show another page of the consolidated report (◀ ▶ buttons)."""
+    query = update.callback_query
+    session = get_session_store().get(update.effective_user.id)
+    
+    # page:<report_id>:<n> — each report message pages through its own pages
+    _, report_id, page = (query.data.split(":") + ["", ""])[:3]
+    pages = session.pages.get(report_id) if session is not None else None
+    if not pages or not page.isdigit():
+        await query.answer("This report has expired.", show_alert=True)
+        return
+    
+    page = min(int(page), len(pages) - 1)
+    await query.answer()
+    try:
+        await query.edit_message_text(
+            pages[page], parse_mode='Markdown', reply_markup=page_keyboard(report_id, page, len(pages))
+        )
+    except BadRequest:
+        # Already on that page (◀ on the first page, ▶ on the last)
+        pass
+
+
+async def run_analysis(message: Message, user_id: int, session: VCFSession, drugs: List[str]) -> None:
+    """
+    Run one analysis of one or more drugs under the fair scheduler,
+    reporting progress in one message and sending one paginated report.
+    """
+    parsed_variants = session.variants
+    file_id = session.file_id
+    drug_label = metrics.drug_label(drugs, CPICRuleEngine.supported_drugs())
+    title = ", ".join(drugs) if len(drugs) <= 3 else f"{len(drugs)} drugs"
+    executor = get_pipeline_executor()
+    scheduler = get_telegram_scheduler()
+    
+    status = await message.reply_text(f"🔬 Analyzing {title}...")
+    
+    async def progress(text: str) -> None:
+        try:
+            await status.edit_text(f"🔬 Analyzing {title}...\n{text}")
+        except Exception as e:
+            # Progress is cosmetic; a failed edit must not fail the analysis
+            logger.debug(f"Progress update failed: {e}")
+    
+    async def on_queued(ahead: int) -> None:
+        await progress(f"⏳ Queued — {ahead} analyses ahead of you.")
+    
+    try:
+        with metrics.stage("queue", drug_label, source="telegram"):
+            await scheduler.acquire(user_id, on_queued)
+    except SchedulerFullError as e:
+        metrics.ERRORS.inc("telegram", "scheduler_full")
+        await progress(f"❌ {e}")
+        return
+    
+    try:
+        with executor.admit():
+            # 1️⃣ Apply Rule Engine (the VCF was parsed on upload)
+            await progress("1/3 🧮 Applying CPIC rules...")
+            # All drugs in one batch: variants are called once, one KB snapshot
+            with metrics.stage("rule_engine", drug_label, source="telegram"):
+                engine_outputs = await executor.run_in_thread(
+                    CPICRuleEngine.evaluate_many, parsed_variants, drugs
+                )
+            
+            unsupported = [output["drug"] for output in engine_outputs if not output.get("evaluations")]
+            engine_outputs = [output for output in engine_outputs if output.get("evaluations")]
+            if unsupported:
+                metrics.ERRORS.inc("telegram", "unsupported_drug")
+            if not engine_outputs:
+                await progress(f"❌ Not supported or no relevant genes found: {', '.join(unsupported)}")
+                return
+            
+            # 2️⃣ Generate LLM Explanations concurrently (async client, bounded by its semaphore)
+            await progress(f"2/3 🤖 Generating {len(engine_outputs)} explanations...")
+            with metrics.stage("llm", drug_label, source="telegram"):
+                llm_service = get_llm_service()
+                explanations = await asyncio.gather(*(
+                    llm_service.generate_explanation(output) for output in engine_outputs
+                ))
+            
+            # 3️⃣ Build Final Structured Responses
+            await progress("3/3 📋 Building report...")
+            with metrics.stage("build", drug_label, source="telegram"):
+                reports = await executor.run_in_thread(
+                    build_reports, f"TG_{file_id[:8]}", parsed_variants, engine_outputs, explanations
+                )
+        
+        # 4️⃣ Format and send one paginated report (outside the pipeline slot: I/O only)
+        with metrics.stage("send", drug_label, source="telegram"):
+            pages = paginate(reports, engine_outputs, unsupported)
+            report_id = uuid.uuid4().hex[:12]
+            save_pages(user_id, report_id, pages)
+            await message.reply_text(
+                pages[0], parse_mode='Markdown', reply_markup=page_keyboard(report_id, 0, len(pages))
+            )
+        
+        # 5️⃣ The same reports as one PDF (rendered in memory by the backend renderer)
+        if TELEGRAM_SEND_PDF:
+            with metrics.stage("render_pdf", drug_label, source="telegram"):
+                pdf = await executor.run_in_thread(
+                    render_pdf, [report.model_dump() for report in reports]
+                )
+            await message.reply_document(pdf, filename=f"pharmaguard_report_{file_id[:8]}.pdf")
+        
+        await progress("✅ Done.")
+        await message.reply_text(
+            "✅ Analysis complete!\n\nPick more drugs for this VCF, or send another VCF file.",
+            reply_markup=drug_keyboard([]),
+        )
+    
+    except PipelineSaturatedError:
+        metrics.ERRORS.inc("telegram", "saturated")
+        await progress("❌ The server is busy right now. Please try again in a minute with /start")
+        
+    except Exception as e:
+        metrics.ERRORS.inc("telegram", type(e).__name__)
+        logger.error(f"Error during analysis: {str(e)}")
+        await message.reply_text(
+            f"❌ An error occurred during analysis:\n{str(e)}\n\nPlease try again with /start"
+        )
+    
+    finally:
+        scheduler.release(user_id)
+
+
+# ========================================
+# Helper Functions
+# ========================================
+
+def cleanup_session(user_id: int):
+    """Drop a user session and its parsed VCF."""
+    get_session_store().delete(user_id)
+
+
+def build_reports(patient_id: str, parsed_variants: list, engine_outputs: list, explanations: list) -> list:
+    """Build one PharmaGuardResponse per evaluated drug."""
+    builder = PharmaGuardResponseBuilder()
+    return [
+        builder.build_model(
+            patient_id=patient_id,
+            parsed_variants=parsed_variants,
+            rule_engine_output=engine_output,
+            llm_output=explanation,
+        )
+        for engine_output, explanation in zip(engine_outputs, explanations)
+    ]
+
+
+def paginate(reports: list, engine_outputs: list, unsupported: list) -> List[str]:
+    """One page per drug (long reports over several pages), within Telegram's 4096 limit."""
+    pages = []
+    for report, engine_output in zip(reports, engine_outputs):
+        pages.extend(split_message(format_response(report, engine_output["drug"]), 4096))
+    
+    if unsupported:
+        note = f"\n❓ Not supported or no relevant genes: {', '.join(unsupported)}"
+        if len(pages[-1]) + len(note) <= 4096:
+            pages[-1] += note
+        else:
+            pages.append(note)
+    
+    return pages
+
+
+def save_pages(user_id: int, report_id: str, pages: List[str]):
+    """Keep the report pages with the session so any process can page through them."""
+    store = get_session_store()
+    
+    # Re-read: the user may have changed the drug selection meanwhile
+    session = store.get(user_id)
+    if session is not None:
+        session.add_pages(report_id, pages)
+        store.put(user_id, session)
+
+
+def drug_keyboard(selected: List[str]) -> InlineKeyboardMarkup:
+    """Every supported drug as a toggle button, two per row, plus Analyze / Cancel."""
+    drugs = sorted(CPICRuleEngine.supported_drugs())
+    buttons = [
+        InlineKeyboardButton(f"✅ {drug}" if drug in selected else drug, callback_data=f"pick:{drug}")
+        for drug in drugs
+    ]
+    rows = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+    rows.append([
+        InlineKeyboardButton(f"🔬 Analyze ({len(selected)})", callback_data="run"),
+        InlineKeyboardButton("❌ Cancel", callback_data="cancel"),
+    ])
+    return InlineKeyboardMarkup(rows)
+
+
+def page_keyboard(report_id: str, page: int, total: int) -> Optional[InlineKeyboardMarkup]:
+    """◀ page/total ▶ navigation for one report; none for a single page."""
+    if total <= 1:
+        return None
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("◀", callback_data=f"page:{report_id}:{max(page - 1, 0)}"),
+        InlineKeyboardButton(f"{page + 1}/{total}", callback_data=f"page:{report_id}:{page}"),
+        InlineKeyboardButton("▶", callback_data=f"page:{report_id}:{min(page + 1, total - 1)}"),
+    ]])
+
+
+def format_response(response: PharmaGuardResponse, drug: str) -> str:
+    """Format the PharmaGuard response for Telegram."""
+    risk = response.risk_assessment
+    profile = response.pharmacogenomic_profile
+    recommendation = response.clinical_recommendation
+    explanation = response.llm_generated_explanation
+    
+    # Risk emoji
+    risk_emoji = {
+        "Safe": "✅",
+        "Adjust Dosage": "⚠️",
+        "Toxic": "🔴",
+        "Ineffective": "❌",
+        "Unknown": "❓"
+    }
+    
+    message = f"""
+🧬 **PharmaGuard Analysis Report**
+
+📋 **Patient ID:** `{response.patient_id}`
+💊 **Drug:** {drug}
+⏰ **Date:** {response.timestamp}
+
+━━━━━━━━━━━━━━━━━━━━━
+🎯 **RISK ASSESSMENT**
+━━━━━━━━━━━━━━━━━━━━━
+
+{risk_emoji.get(risk.risk_label, "❓")} **Risk Level:** {risk.risk_label}
+📊 **Confidence:** {risk.confidence_score:.2%}
+🔥 **Severity:** {risk.severity.upper()}
+
+━━━━━━━━━━━━━━━━━━━━━
+🧬 **GENETIC PROFILE**
+━━━━━━━━━━━━━━━━━━━━━
+
+**Gene:** {profile.primary_gene}
+**Diplotype:** {profile.diplotype}
+**Phenotype:** {profile.phenotype}
+
+**Detected Variants:**
+"""
+    
+    for i, variant in enumerate(profile.detected_variants, 1):
+        message += f"\n{i}. {variant.primary_gene}"
+        if variant.star_allele:
+            message += f" ({variant.star_allele})"
+        if variant.rsid:
+            message += f" - {variant.rsid}"
+        if variant.chromosome and variant.position:
+            message += f"\n   Chr{variant.chromosome}:{variant.position}"
+    
+    message += f"""
+
+━━━━━━━━━━━━━━━━━━━━━
+💡 **CLINICAL RECOMMENDATION**
+━━━━━━━━━━━━━━━━━━━━━
+
+{recommendation.recommendation_text}
+
+━━━━━━━━━━━━━━━━━━━━━
+🤖 **AI EXPLANATION**
+━━━━━━━━━━━━━━━━━━━━━
+
+**Summary:**
+{explanation.summary}
+
+**Mechanism:**
+{explanation.mechanism}
+
+**Confidence:** {explanation.confidence}
+
+━━━━━━━━━━━━━━━━━━━━━
+📊 **QUALITY METRICS**
+━━━━━━━━━━━━━━━━━━━━━
+
+VCF Parsing: {'✅' if response.quality_metrics.vcf_parsing_success else '❌'}
+Gene Detection: {'✅' if response.quality_metrics.gene_detected else '❌'}
+Rule Engine: {'✅' if response.quality_metrics.rule_engine_applied else '❌'}
+LLM Explanation: {'✅' if response.quality_metrics.llm_explanation_generated else '❌'}
+
+━━━━━━━━━━━━━━━━━━━━━
+
+⚠️ **Disclaimer:** This analysis is for informational purposes only. Always consult with healthcare professionals before making any medical decisions.
+"""
+    
+    return message
+
+
+def split_message(message: str, max_length: int = 4096) -> list:
+    """Split a long message into chunks."""
+    chunks = []
+    current_chunk = ""
+    
+    lines = message.split('\n')
+    
+    for line in lines:
+        if len(current_chunk) + len(line) + 1 <= max_length:
+            current_chunk += line + '\n'
+        else:
+            if current_chunk:
+                chunks.append(current_chunk)
+            current_chunk = line + '\n'
+    
+    if current_chunk:
+        chunks.append(current_chunk)
+    
+    return chunks
+
+
+# ========================================
+# Main Bot Setup
+# ========================================
+
+def create_telegram_bot(update_queue: Optional[asyncio.Queue] = None) -> Application:
+    """
+    Create and configure the Telegram bot. Given an update_queue, the bot
+    runs in webhook mode: updates are pushed into that queue and no
+    polling Updater is built.
+    """
+    
+    # Get bot token from environment
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    
+    if not token:
+        raise ValueError(
+            "TELEGRAM_BOT_TOKEN not found in environment variables. "
+            "Please set it up using BotFather."
+        )
+    
+    # Create the Application. Updates are handled concurrently (bounded);
+    # analyses themselves are throttled by the fair scheduler.
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(TELEGRAM_CONCURRENT_UPDATES)
+    )
+    if update_queue is not None:
+        builder = builder.update_queue(update_queue).updater(None)
+    application = builder.build()
+    
+    # Conversation handler for VCF analysis flow
+    conv_handler = ConversationHandler(
+        entry_points=[
+            MessageHandler(filters.Document.FileExtension("vcf"), handle_vcf_file)
+        ],
+        states={
+            WAITING_FOR_DRUG: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_drug_name)
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    
+    # Add handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("cancel", cancel))
+    application.add_handler(conv_handler)
+    
+    # Selection keyboard and report pages (state lives in the session store)
+    application.add_handler(
+        CallbackQueryHandler(handle_drug_selection, pattern=r"^(pick:.+|run|cancel)$")
+    )
+    application.add_handler(CallbackQueryHandler(handle_report_page, pattern=r"^page:"))
+    
+    # Drug names that reach a process without this user's conversation
+    # state (restart, another worker): the session store still has the VCF
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, handle_drug_name)
+    )
+    
+    # Also handle VCF files outside conversation for convenience
+    # This allows files to be uploaded at any time
+    
+    logger.info("✅ Telegram bot configured successfully")
+    
+    return application
+
+
+async def run_telegram_bot():
+    """Run the Telegram bot (v20+ compatible)."""
+    application = create_telegram_bot()
+    
+    logger.info("🤖 Starting PharmaGuard Telegram Bot...")
+    logger.info("✅ Bot is running. Press Ctrl+C to stop.")
+    
+    # ✅ CORRECT for python-telegram-bot v20+
+    # run_polling() handles initialize, start, and polling automatically
+    await application.run_polling(
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=True,  # Ignore old messages on restart
+    )